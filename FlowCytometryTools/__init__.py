@@ -3,9 +3,17 @@ from ._version import version as __version__
 from ._doc import __doc__
 
 from .core.containers import FCMeasurement, FCCollection, FCOrderedCollection, FCPlate
-from .core.gates import ThresholdGate, IntervalGate, QuadGate, PolyGate
-from .core import graph
-from .core.graph import plotFCM
+from .core.gates import (
+    ThresholdGate,
+    IntervalGate,
+    QuadGate,
+    PolyGate,
+    RectangleGate,
+    EllipseGate,
+)
+from .core.cache import ResultCache, transform_cache
+from .core.memory import MemoryBudget
+from .core.profiling import profile
 
 from fcsparser.api import parse as parse_fcs
 
@@ -20,6 +28,16 @@ def _get_paths():
 
 test_data_dir, test_data_file = _get_paths()
 
+
+def __getattr__(name):
+    # The plotting module imports matplotlib, so it is only imported when first used.
+    if name in ("graph", "plotFCM"):
+        from .core import graph
+
+        return graph if name == "graph" else graph.plotFCM
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
 __all__ = [
     "test_data_dir",
     "test_data_file",
@@ -36,4 +54,10 @@ __all__ = [
     "IntervalGate",
     "QuadGate",
     "PolyGate",
+    "RectangleGate",
+    "EllipseGate",
+    "ResultCache",
+    "transform_cache",
+    "MemoryBudget",
+    "profile",
 ]
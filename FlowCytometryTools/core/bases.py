@@ -4,14 +4,16 @@ from collections import abc
 import decorator
 import inspect
 import os
-import pylab as pl
 import six
 from numpy import nan, unravel_index
 from pandas import DataFrame as DF
 
-from . import graph
+from .cache import data_fingerprint, file_fingerprint, func_fingerprint, get_cache
 from .common_doc import doc_replacer
-from .utils import get_tag_value, get_files, save, load, to_list
+from .compression import CompressedFrame, can_compress
+from .memory import MemoryBudget, frame_nbytes
+from .profiling import stage
+from .utils import get_tag_value, get_files, save, load, to_list, fingerprint
 
 
 @doc_replacer
@@ -97,13 +99,18 @@ def queueable(fun, *args, **kwargs):
             '"%s" must be a parameter of queued function "%s"' % (_now, fun.__name__)
         )
     f_name = fun.__name__
-    kw_name = inspect.getargspec(fun).keywords
+    kw_name = inspect.getfullargspec(fun).varkw
     kws = params.pop(kw_name, {})
     params.update(kws)
     if params[_now]:
+        source = params.pop("self")
+        # Before calling fun, which may modify source (e.g., transform(inplace=True))
+        replay = source._derived_replay(source.queue + [(f_name, params)])
         out = fun(*args, **kwargs)
         out.queue = []
         out.history.append((f_name, params))
+        out._replay = replay
+        out._evicted = False
         return out
     else:
         new = params["self"].copy()
@@ -136,6 +143,7 @@ class BaseObject(object):
     def _constructor(self):
         return self.__class__
 
+    @stage("copy")
     def copy(self, deep=True):
         """
         Make a copy of this object
@@ -163,6 +171,12 @@ class Measurement(BaseObject):
     a single well or a single tube.
     """
 
+    #: Attributes holding derived (cached) state.
+    #: They are neither copied nor pickled, and are recomputed on demand.
+    #: (_budget is the memory budget of the collection holding the measurement,
+    #: _data_token identifies its data, see _get_data_token.)
+    _transient_attrs = ("_queued_cache", "_histogram_cache", "_budget", "_data_token")
+
     def __init__(
         self,
         ID,
@@ -178,6 +192,20 @@ class Measurement(BaseObject):
         self.metafile = metafile
         self._data = None
         self._meta = None
+        self._queued_cache = None
+        self._histogram_cache = None
+        self._summary = None
+        self._shared = None
+        #: Actions that reproduce the data from the datafile (None if unknown).
+        self._replay = None
+        #: Whether the data was dropped to save memory (see core.memory).
+        self._evicted = False
+        #: The data, when held compressed to save memory (see core.memory).
+        self._compressed = None
+        #: (number of events, {gate fingerprint: packed membership}) (see membership).
+        self._membership = None
+        self._budget = None
+        self._data_token = None
         self.readdata_kwargs = readdata_kwargs
         self.readmeta_kwargs = readmeta_kwargs
         if readdata:
@@ -188,6 +216,24 @@ class Measurement(BaseObject):
         self.history = []
         self.queue = []
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for attr in self._transient_attrs:
+            state.pop(attr, None)
+        if state.get("_shared") is not None:
+            # Data held in shared memory is represented by its handle
+            state["_data"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        optional = ("_summary", "_shared", "_replay", "_compressed", "_membership")
+        for attr in self._transient_attrs + optional:
+            self.__dict__.setdefault(attr, None)
+        self.__dict__.setdefault("_evicted", False)
+        if self._shared is not None:
+            self._data = self._shared.attach()
+
     def _set_position(self, orderedcollection_id, pos):
         self.position[orderedcollection_id] = pos
 
@@ -199,13 +245,171 @@ class Measurement(BaseObject):
             return self.data.shape
 
     def apply_queued(self):
+        """
+        Return a measurement with all queued actions applied.
+
+        The result is memoized on this measurement, keyed by the contents
+        of the queue (and the datafile), so repeated data access does not
+        replay the queue. The memoized result is discarded whenever the
+        queue changes or new data is set.
+
+        .. note::
+
+            The returned measurement is shared by subsequent calls;
+            copy it before modifying it in place.
+        """
+        key = self._queue_key()
+        cached = self._queued_cache
+        if key is not None and cached is not None and cached[0] == key:
+            return cached[1]
+        new = self._execute_queue()
+        if key is not None:
+            self._queued_cache = (key, new)
+        return new
+
+    def _queue_key(self):
+        """
+        Key identifying the result of the queued actions.
+        None if the queue cannot be fingerprinted (e.g., holds a lambda).
+        """
+        queue_fingerprint = fingerprint(self.queue)
+        if queue_fingerprint is None:
+            return None
+        return (queue_fingerprint, self.datafile)
+
+    @stage("queue", measurement=True)
+    def _execute_queue(self):
+        """Replay the queued actions one by one on a copy of self."""
+        from copy import deepcopy
+
         new = self.copy()
         new.queue = []
         for a in self.queue:
             name, params = a
-            new = getattr(new, name)(**params)
+            # Copy the parameters so that replaying doesn't modify the queue
+            # (e.g., by fitting a spline on a queued Transformation).
+            new = getattr(new, name)(**deepcopy(params))
+        return new
+
+    def _copy_without_data(self):
+        """
+        Make a deep copy of this object without copying its data.
+        The data of the copy is set to None.
+        """
+        from copy import deepcopy
+
+        memo = {}
+        if self._data is not None:
+            memo[id(self._data)] = None
+        if self._compressed is not None:
+            memo[id(self._compressed)] = None
+        if self._membership is not None:
+            memo[id(self._membership)] = None
+        new = deepcopy(self, memo)
+        new._data = None
+        new._compressed = None
+        new._shared = None
+        new._summary = None
+        new._membership = None
+        new._evicted = False
         return new
 
+    def _derived_replay(self, actions):
+        """
+        Return the actions that reproduce, from the datafile, the data of self
+        followed by the given actions; None if the data cannot be reproduced.
+        """
+        for name, params in actions:
+            if name == "subsample" and params.get("order") not in ("start", "end"):
+                if params.get("seed") is None or params.get("rng") is not None:
+                    return None
+        if self._data is None and self._compressed is None and not self._evicted:
+            base = [] if self.datafile is not None else None
+        else:
+            base = self._replay
+        if base is None:
+            return None
+        return base + list(actions)
+
+    def memory_usage(self):
+        """
+        Number of bytes of event data held in memory by the measurement
+        (including the memoized result of the queued actions).
+        """
+        nbytes = frame_nbytes(self._data)
+        if self._compressed is not None:
+            nbytes += self._compressed.nbytes
+        if self._queued_cache is not None:
+            nbytes += frame_nbytes(self._queued_cache[1]._data)
+        return nbytes
+
+    def _evict(self):
+        """
+        Drop the data if it can be read again from the datafile (it is read
+        again, replaying the applied actions, the next time it is needed).
+        Memoized results are always dropped.
+
+        Returns
+        -------
+        True if the data was dropped.
+        """
+        self._queued_cache = None
+        self._histogram_cache = None
+        held = self._data is not None or self._compressed is not None
+        if held and self._replay is not None and self._shared is None:
+            self._data = None
+            self._compressed = None
+            self._evicted = True
+            return True
+        return False
+
+    def _compress(self, codec="zlib", level=None):
+        """
+        Hold the data compressed (see core.compression). It is decompressed
+        the next time it is needed; single channels are decompressed on their own
+        (see __getitem__). Memoized results are dropped.
+
+        Returns
+        -------
+        The compressed data, or None if the data cannot be compressed.
+        """
+        self._queued_cache = None
+        self._histogram_cache = None
+        data = self._data
+        if data is None or self._shared is not None or not can_compress(data):
+            return None
+        compressed = CompressedFrame(data, codec, level)
+        self._compressed = compressed
+        self._data = None
+        return compressed
+
+    def _get_data_token(self):
+        """
+        Return an object identifying the current data of the measurement
+        (e.g., to key caches of results derived from it, see core.cache.TransformCache).
+        A new token is made whenever data is set; copies get their own token.
+        """
+        if self._data_token is None:
+            self._data_token = object()
+        return self._data_token
+
+    def _count(self, name):
+        """Increment a counter of the memory budget (if any)."""
+        if self._budget is not None:
+            self._budget.count(name)
+
+    def _reload_data(self):
+        """Read again the data dropped by _evict, and return it."""
+        source = self._copy_without_data()
+        source.history = []
+        source.queue = source._replay
+        source._replay = None
+        data = source.get_data()
+        self._data = data
+        self._evicted = False
+        # The data may be evicted again (by another thread) before it is used.
+        return data
+
     #     # An example for how to write a queueable function
     #     @queueable
     #     def fake_action(self, a, b='!', apply_now=False, **kws):
@@ -225,9 +429,21 @@ class Measurement(BaseObject):
     # Methods of exposing underlying data
     # ----------------------
     def __contains__(self, key):
+        compressed = self._compressed
+        if compressed is not None and not self.queue:
+            return key in compressed.columns
         return self.data.__contains__(key)
 
     def __getitem__(self, key):
+        compressed = self._compressed
+        if compressed is not None and not self.queue:
+            # Decompress only the requested channels
+            if isinstance(key, list) and all(k in compressed.columns for k in key):
+                self._count("compressed_hits")
+                return compressed.to_frame(key)
+            if not isinstance(key, list) and key in compressed.columns:
+                self._count("compressed_hits")
+                return compressed.column(key)
         return self.data.__getitem__(key)
 
     # ----------------------
@@ -253,10 +469,24 @@ class Measurement(BaseObject):
         Additionally, update queue and history.
         """
         if data is None:
+            replay = None if kwargs else self._derived_replay(self.queue)
             data = self.get_data(**kwargs)
+        else:
+            replay = None
         setattr(self, "_data", data)
+        self._compressed = None
         self.history += self.queue
         self.queue = []
+        self._queued_cache = None
+        self._histogram_cache = None
+        self._data_token = None
+        self._summary = None
+        self._membership = None
+        self._shared = None
+        self._replay = replay
+        self._evicted = False
+        if self._budget is not None:
+            self._budget.touch(self)
 
     def set_meta(self, meta=None, **kwargs):
         """
@@ -280,6 +510,19 @@ class Measurement(BaseObject):
             named: '[attr name]file'. (e.g. for an attribute named
             'meta' a 'metafile' attribute will be created).
         """
+        if name == "data":
+            if self._evicted:
+                self._count("misses")
+                return self._reload_data()
+            compressed = self._compressed
+            if compressed is not None:
+                self._count("compressed_hits")
+                data = compressed.to_frame()
+                self._data = data
+                self._compressed = None
+                return data
+            if self._data is not None:
+                self._count("hits")
         current_value = getattr(self, "_" + name)
         if current_value is not None:
             value = current_value
@@ -295,9 +538,12 @@ class Measurement(BaseObject):
         """
         if self.queue:
             new = self.apply_queued()
-            return new.get_data()
+            data = new.get_data()
         else:
-            return self._get_attr_from_file("data", **kwargs)
+            data = self._get_attr_from_file("data", **kwargs)
+        if self._budget is not None:
+            self._budget.touch(self)
+        return data
 
     def get_meta(self, **kwargs):
         """
@@ -328,7 +574,9 @@ class Measurement(BaseObject):
         """
         pass
 
-    def apply(self, func, applyto="measurement", noneval=nan, setdata=False):
+    @stage("apply", measurement=True)
+    @doc_replacer
+    def apply(self, func, applyto="measurement", noneval=nan, setdata=False, cache=None):
         """
         Apply func either to self or to associated data.
         If data is not already parsed, try and read it.
@@ -347,25 +595,61 @@ class Measurement(BaseObject):
             Used only if data is not already set.
             If true parsed data will be assigned to self.data
             Otherwise data will be discarded at end of apply.
+        {bases_apply_cache_par}
         """
         applyto = applyto.lower()
+        cache = get_cache(cache)
+        key = self._apply_key(func, applyto) if cache is not None else None
+        if key is not None:
+            found, result = cache.get(key)
+            if found:
+                return result
+
         if applyto == "data":
-            if self.data is not None:
-                data = self.data
-            elif self.datafile is None:
+            data = self.data
+            if data is None:
                 return noneval
-            else:
-                data = self.read_data()
-                if setdata:
-                    self.data = data
-            return func(data)
+            if setdata and self._data is None:
+                replay = self._derived_replay(self.queue)
+                self.set_data(data=data)
+                self._replay = replay
+            result = func(data)
         elif applyto == "measurement":
-            return func(self)
+            result = func(self)
         else:
             raise ValueError(
                 'Encountered unsupported value "%s" for applyto parameter.' % applyto
             )
 
+        if key is not None:
+            cache.set(key, result)
+        return result
+
+    def _apply_key(self, func, applyto):
+        """
+        Key under which the result of apply(func, applyto) is stored in a cache.
+
+        Combines the fingerprints of func, of the source data (the data in memory,
+        or the datafile), and of the queued actions.
+        None if any of these cannot be fingerprinted.
+        """
+        func_key = func_fingerprint(func)
+        queue_key = fingerprint(self.queue)
+        if self._data is not None or self._compressed is not None:
+            source_key = data_fingerprint(self._get_attr_from_file("data"))
+        elif self._evicted:
+            source_key = fingerprint((file_fingerprint(self.datafile), self._replay))
+            source_key = fingerprint((source_key, self.readdata_kwargs))
+        elif self.datafile is not None and os.path.exists(self.datafile):
+            source_key = file_fingerprint(self.datafile)
+            source_key = fingerprint((source_key, self.readdata_kwargs))
+        else:
+            source_key = None
+        if None in (func_key, queue_key, source_key):
+            return None
+        ID = self.ID if applyto == "measurement" else None
+        return fingerprint((func_key, applyto, source_key, queue_key, ID))
+
 
 Well = Measurement
 
@@ -377,7 +661,10 @@ class MeasurementCollection(abc.MutableMapping, BaseObject):
 
     _measurement_class = Measurement  # to be replaced when inheriting
 
-    def __init__(self, ID, measurements):
+    _budget = None
+
+    @doc_replacer
+    def __init__(self, ID, measurements, memory_budget=None):
         """
         A dictionary-like container for holding multiple Measurements.
 
@@ -390,6 +677,7 @@ class MeasurementCollection(abc.MutableMapping, BaseObject):
             Collection ID
         measurements : mappable | iterable
             values are measurements of appropriate type (type is explicitly check for).
+        {_bases_memory_budget}
         """
         self.ID = ID
         self.data = {}
@@ -398,11 +686,71 @@ class MeasurementCollection(abc.MutableMapping, BaseObject):
         else:
             for m in measurements:
                 self[m.ID] = m
+        self.memory_budget = memory_budget
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # The measurements don't keep a reference to the budget when copied or pickled.
+        if self._budget is not None:
+            for measurement in self.data.values():
+                if measurement is not None:
+                    measurement._budget = self._budget
+
+    @property
+    def memory_budget(self):
+        """
+        Maximal number of bytes of event data held in memory by the measurements
+        (None if unlimited). See memory_usage.
+        """
+        return None if self._budget is None else self._budget.max_bytes
+
+    @memory_budget.setter
+    def memory_budget(self, value):
+        if value is not None and not isinstance(value, MemoryBudget):
+            value = MemoryBudget(value)
+        self._budget = value
+        for measurement in self.values():
+            measurement._budget = None
+            self._track(measurement)
+
+    def memory_stats(self):
+        """
+        Return the counters of the memory budget (hits, compressed_hits, misses,
+        compressions, evictions) and the number of bytes it accounts for.
+        See MemoryBudget.stats. None if the collection has no memory budget.
+        """
+        if self._budget is None:
+            return None
+        return self._budget.stats()
+
+    def _track(self, measurement):
+        """Account for the data of measurement in the memory budget (if any)."""
+        if self._budget is not None:
+            measurement._budget = self._budget
+            self._budget.touch(measurement)
+
+    def _copy_without_measurements(self):
+        """
+        Make a deep copy of this object without copying its measurements.
+        The keys of the copy map to None, and should be assigned new measurements.
+        The copy shares the memory budget of this object.
+        """
+        from copy import deepcopy
+
+        memo = {id(m): None for m in self.data.values()}
+        return deepcopy(self, memo)
 
     @classmethod
     @doc_replacer
     def from_files(
-        cls, ID, datafiles, parser, readdata_kwargs={}, readmeta_kwargs={}, **ID_kwargs
+        cls,
+        ID,
+        datafiles,
+        parser,
+        readdata_kwargs={},
+        readmeta_kwargs={},
+        dtype=None,
+        **ID_kwargs
     ):
         """
         Create a Collection of measurements from a set of data files.
@@ -412,8 +760,11 @@ class MeasurementCollection(abc.MutableMapping, BaseObject):
         {_bases_ID}
         {_bases_data_files}
         {_bases_filename_parser}
+        {_bases_dtype}
         {_bases_ID_kwargs}
         """
+        if dtype is not None:
+            readdata_kwargs = dict(readdata_kwargs, dtype=dtype)
         d = _assign_IDS_to_datafiles(
             datafiles, parser, cls._measurement_class, **ID_kwargs
         )
@@ -444,6 +795,7 @@ class MeasurementCollection(abc.MutableMapping, BaseObject):
         recursive=False,
         readdata_kwargs={},
         readmeta_kwargs={},
+        dtype=None,
         **ID_kwargs
     ):
         """
@@ -460,6 +812,7 @@ class MeasurementCollection(abc.MutableMapping, BaseObject):
         recursive : bool
             Recursively look for files matching pattern in subdirectories.
         {_bases_filename_parser}
+        {_bases_dtype}
         {_bases_ID_kwargs}
         """
         datafiles = get_files(datadir, pattern, recursive)
@@ -469,6 +822,7 @@ class MeasurementCollection(abc.MutableMapping, BaseObject):
             parser,
             readdata_kwargs=readdata_kwargs,
             readmeta_kwargs=readmeta_kwargs,
+            dtype=dtype,
             **ID_kwargs
         )
 
@@ -489,6 +843,7 @@ class MeasurementCollection(abc.MutableMapping, BaseObject):
             ) + "Encountered type %s." % type(value)
             raise TypeError(msg)
         self.data[key] = value
+        self._track(value)
 
     def __delitem__(self, key):
         del self.data[key]
@@ -502,6 +857,7 @@ class MeasurementCollection(abc.MutableMapping, BaseObject):
     # ----------------------
     # User methods
     # ----------------------
+    @doc_replacer
     def apply(
         self,
         func,
@@ -511,6 +867,7 @@ class MeasurementCollection(abc.MutableMapping, BaseObject):
         setdata=False,
         output_format="dict",
         ID=None,
+        cache=None,
         **kwargs
     ):
         """
@@ -535,6 +892,8 @@ class MeasurementCollection(abc.MutableMapping, BaseObject):
             * collection : keeps result as collection
             WARNING: For collection, func should return a copy of the measurement instance rather
             than the original measurement instance.
+        {bases_apply_cache_par}
+
         Returns
         -------
         Dictionary keyed by measurement keys containing the corresponding output of func
@@ -544,7 +903,13 @@ class MeasurementCollection(abc.MutableMapping, BaseObject):
             ids = self.keys()
         else:
             ids = to_list(ids)
-        result = dict((i, self[i].apply(func, applyto, noneval, setdata)) for i in ids)
+        cache = get_cache(cache)
+        result = {}
+        for i in ids:
+            result[i] = self[i].apply(func, applyto, noneval, setdata, cache=cache)
+            if isinstance(result[i], Measurement):
+                # Keep the memory used by new measurements within the budget
+                self._track(result[i])
 
         if output_format == "collection":
             can_keep_as_collection = all(
@@ -557,7 +922,7 @@ class MeasurementCollection(abc.MutableMapping, BaseObject):
                     )
                 )
 
-            new_collection = self.copy()
+            new_collection = self._copy_without_measurements()
             # Locate IDs to remove
             ids_to_remove = [x for x in self.keys() if x not in ids]
             # Remove data for these IDs
@@ -581,20 +946,51 @@ class MeasurementCollection(abc.MutableMapping, BaseObject):
         self.apply(fun, ids=ids, applyto="measurement")
 
     def _clear_measurement_attr(self, attr, ids=None):
-        fun = lambda x: setattr(x, attr, None)
+        def fun(measurement):
+            if attr == "data":
+                measurement._evict()
+                if measurement._data is None and measurement._compressed is None:
+                    return
+                # The data cannot be read again; the datafile will be used instead.
+                measurement._compressed = None
+                measurement._shared = None
+                measurement._summary = None
+            setattr(measurement, "_" + attr, None)
+
         self.apply(fun, ids=ids, applyto="measurement")
 
     def clear_measurement_data(self, ids=None):
         """
         Clear the data in all specified measurements (all if None given).
+
+        Data that was read from a datafile (and transformed, gated, ... since)
+        is read again from the datafile when needed.
         """
-        self._clear_measurement_attr("data", ids=None)
+        self._clear_measurement_attr("data", ids=ids)
 
     def clear_measurement_meta(self, ids=None):
         """
         Clear the metadata in all specified measurements (all if None given).
         """
-        self._clear_measurement_attr("meta", ids=None)
+        self._clear_measurement_attr("meta", ids=ids)
+
+    def memory_usage(self, ids=None, output_format="DataFrame"):
+        """
+        Number of bytes of event data held in memory by each of the specified
+        measurements (all if None given).
+
+        Parameters
+        ----------
+        ids : hashable | iterable of hashables | None
+        output_format : 'DataFrame' | 'dict'
+
+        Returns
+        -------
+        DataFrame | dict
+        """
+        return self.apply(
+            lambda x: x.memory_usage(), ids=ids, output_format=output_format
+        )
 
     def get_measurement_metadata(
         self, fields, ids=None, noneval=nan, output_format="DataFrame"
@@ -751,6 +1147,7 @@ class OrderedCollection(MeasurementCollection):
         positions=None,
         row_labels=None,
         col_labels=None,
+        memory_budget=None,
     ):
         """
         A dictionary-like container for holding multiple Measurements in a 2D array.
@@ -774,9 +1171,10 @@ class OrderedCollection(MeasurementCollection):
             If None is given, rows will be labeled 'A','B','C', ...
         col_labels : iterable of str
             If None is given, columns will be labeled 1,2,3, ...
+        {_bases_memory_budget}
         """
         ## init the collection
-        super(OrderedCollection, self).__init__(ID, measurements)
+        super(OrderedCollection, self).__init__(ID, measurements, memory_budget)
         ## set shape-related attributes
         if row_labels is None:
             row_labels = self._default_labels("rows", shape)
@@ -812,6 +1210,7 @@ class OrderedCollection(MeasurementCollection):
         readdata_kwargs={},
         readmeta_kwargs={},
         ID_kwargs={},
+        dtype=None,
         **kwargs
     ):
         """
@@ -824,9 +1223,12 @@ class OrderedCollection(MeasurementCollection):
         {_bases_filename_parser}
         {_bases_position_mapper}
         {_bases_ID_kwargs}
+        {_bases_dtype}
         kwargs : dict
             Additional key word arguments to be passed to constructor.
         """
+        if dtype is not None:
+            readdata_kwargs = dict(readdata_kwargs, dtype=dtype)
         if position_mapper is None:
             if isinstance(parser, six.string_types):
                 position_mapper = parser
@@ -865,6 +1267,7 @@ class OrderedCollection(MeasurementCollection):
         readdata_kwargs={},
         readmeta_kwargs={},
         ID_kwargs={},
+        dtype=None,
         **kwargs
     ):
         """
@@ -882,6 +1285,7 @@ class OrderedCollection(MeasurementCollection):
         {_bases_filename_parser}
         {_bases_position_mapper}
         {_bases_ID_kwargs}
+        {_bases_dtype}
         kwargs : dict
             Additional key word arguments to be passed to constructor.
         """
@@ -894,6 +1298,7 @@ class OrderedCollection(MeasurementCollection):
             readdata_kwargs=readdata_kwargs,
             readmeta_kwargs=readmeta_kwargs,
             ID_kwargs=ID_kwargs,
+            dtype=dtype,
             **kwargs
         )
 
@@ -1019,7 +1424,7 @@ class OrderedCollection(MeasurementCollection):
         df = DF(noneval, index=self.row_labels, columns=self.col_labels, dtype=object)
         for k, res in d.items():
             i, j = self._positions[k]
-            df[j][i] = res
+            df.at[i, j] = res
         try:
             df = df.astype(float)
         except:
@@ -1048,6 +1453,7 @@ class OrderedCollection(MeasurementCollection):
     def shape(self):
         return (len(self.row_labels), len(self.col_labels))
 
+    @doc_replacer
     def apply(
         self,
         func,
@@ -1058,6 +1464,7 @@ class OrderedCollection(MeasurementCollection):
         setdata=False,
         dropna=False,
         ID=None,
+        cache=None,
     ):
         """
         Apply func to each of the specified measurements.
@@ -1084,6 +1491,7 @@ class OrderedCollection(MeasurementCollection):
             ID is used as the new ID for the collection.
             If None, then the old ID is retained.
             Note: Only applicable when output is a collection.
+        {bases_apply_cache_par}
 
         Returns
         -------
@@ -1091,7 +1499,7 @@ class OrderedCollection(MeasurementCollection):
         """
         _output = "collection" if output_format == "collection" else "dict"
         result = super(OrderedCollection, self).apply(
-            func, ids, applyto, noneval, setdata, output_format=_output
+            func, ids, applyto, noneval, setdata, output_format=_output, cache=cache
         )
 
         # Note: result should be of type dict or collection for the code
@@ -1184,6 +1592,10 @@ class OrderedCollection(MeasurementCollection):
         callArgs["rowNum"] = self.shape[0]
         callArgs["colNum"] = self.shape[1]
 
+        import pylab as pl
+
+        from . import graph
+
         subplots_adjust_args = {}
         subplots_adjust_args.setdefault("right", 0.85)
         subplots_adjust_args.setdefault("top", 0.85)
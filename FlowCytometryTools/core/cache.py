@@ -0,0 +1,278 @@
+"""
+Persistent memoization of the results of apply.
+
+Results are pickled to a directory on local disk, one file per result, keyed by
+a fingerprint of the function and of the data it was applied to.
+Files are written atomically (to a temporary file that is then renamed), so
+several processes can share the same cache directory.
+
+Transformed channels are also cached in memory (see TransformCache).
+"""
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import types
+from collections import OrderedDict
+
+import numpy as np
+
+from .utils import fingerprint
+
+_suffix = ".pkl"
+
+
+def _code_state(code):
+    """Picklable state of a code object (including nested code objects)."""
+    consts = tuple(
+        _code_state(c) if isinstance(c, types.CodeType) else c for c in code.co_consts
+    )
+    return (code.co_code, code.co_names, code.co_varnames, consts)
+
+
+def func_fingerprint(func):
+    """
+    Fingerprint of a function, derived from its bytecode, constants, default
+    values and the contents of its closure.
+
+    Globals referenced by the function are not included.
+    Returns None if the function cannot be fingerprinted.
+    """
+    if isinstance(func, functools.partial):
+        state = (func_fingerprint(func.func), func.args, func.keywords)
+        if state[0] is None:
+            return None
+        return fingerprint(state)
+    code = getattr(func, "__code__", None)
+    if code is None:
+        # e.g., a builtin or a callable object
+        return fingerprint(func)
+    closure = tuple(
+        func_fingerprint(c.cell_contents)
+        if isinstance(c.cell_contents, types.FunctionType)
+        else c.cell_contents
+        for c in (func.__closure__ or ())
+    )
+    return fingerprint((_code_state(code), func.__defaults__, func.__kwdefaults__, closure))
+
+
+def data_fingerprint(data):
+    """Fingerprint of the contents of data (a DataFrame or any picklable object)."""
+    values = getattr(data, "values", None)
+    if not isinstance(values, np.ndarray) or values.dtype == object:
+        return fingerprint(data)
+    sha = hashlib.sha1()
+    sha.update(pickle.dumps((list(data.columns), values.dtype.str, values.shape)))
+    sha.update(np.ascontiguousarray(values).data)
+    return sha.hexdigest()
+
+
+def file_fingerprint(path):
+    """Fingerprint of a file based on its path, size and modification time."""
+    stat = os.stat(path)
+    return fingerprint((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+
+
+class ResultCache(object):
+    """
+    A directory of pickled results, limited in total size.
+
+    When the total size exceeds max_size, the least recently used
+    results are removed.
+    """
+
+    def __init__(self, path, max_size=2**30):
+        """
+        Parameters
+        ----------
+        path : str
+            Directory in which the results are stored. Created if it doesn't exist.
+        max_size : int
+            Maximum total size of the stored results (in bytes).
+        """
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.max_size = max_size
+        os.makedirs(self.path, exist_ok=True)
+
+    def __repr__(self):
+        return "ResultCache({!r}, max_size={})".format(self.path, self.max_size)
+
+    def _filename(self, key):
+        return os.path.join(self.path, key + _suffix)
+
+    def _entries(self):
+        """Return a list of (mtime, size, filename) of the stored results."""
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(_suffix):
+                continue
+            filename = os.path.join(self.path, name)
+            try:
+                stat = os.stat(filename)
+            except OSError:  # Removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+        return entries
+
+    def get(self, key):
+        """
+        Return (True, result) if a result is stored under key, otherwise (False, None).
+        """
+        filename = self._filename(key)
+        try:
+            with open(filename, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False, None
+        try:
+            os.utime(filename)  # Mark as recently used
+        except OSError:
+            pass
+        return True, value
+
+    def set(self, key, value):
+        """
+        Store the result under key. Results that cannot be pickled are not stored.
+        """
+        try:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, self._filename(key))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, filename in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            total -= size
+
+    @property
+    def size(self):
+        """Total size of the stored results (in bytes)."""
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        """Remove all stored results."""
+        for _, _, filename in self._entries():
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+
+def get_cache(cache):
+    """Return a ResultCache given a ResultCache, a directory or None."""
+    if cache is None or isinstance(cache, ResultCache):
+        return cache
+    return ResultCache(cache)
+
+
+class TransformCache(object):
+    """
+    In-memory cache of transformed channels, limited in total size.
+
+    FCMeasurement.transform stores the channels it transformed under a key made of
+    the identity of the data of the measurement (which changes whenever new data
+    is set) and of the fingerprint of the transformation (see
+    Transformation.fingerprint), so transforming the same data in the same way
+    again copies the cached channels instead of computing them.
+    When the total size exceeds max_bytes, the least recently used entries are dropped.
+
+    .. note::
+
+        Data modified in place outside of the API of the measurement
+        (e.g., ``sample.data['FSC-A'] *= 2``) is not detected.
+    """
+
+    #: Names of the counters (see stats).
+    _counters = ("hits", "misses", "evictions")
+
+    def __init__(self, max_bytes="256MB"):
+        """
+        Parameters
+        ----------
+        max_bytes : int | str
+            E.g., 2**28 or '256MB'. 0 disables the cache.
+        """
+        from .memory import parse_size
+
+        self.max_bytes = parse_size(max_bytes)
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.RLock()
+        self.reset_stats()
+
+    def __repr__(self):
+        return "TransformCache({} of {} bytes used)".format(self.used, self.max_bytes)
+
+    @property
+    def used(self):
+        """Total number of bytes of the cached channels."""
+        with self._lock:
+            return sum(nbytes for _, nbytes in self._entries.values())
+
+    def get(self, key):
+        """Return the value stored under key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def set(self, key, value, nbytes):
+        """Store value (of size nbytes) under key, dropping the least recently used entries."""
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            self._entries[key] = (value, nbytes)
+            self._entries.move_to_end(key)
+            total = self.used
+            while total > self.max_bytes:
+                _, (_, dropped) = self._entries.popitem(last=False)
+                total -= dropped
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        """Drop all the entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def reset_stats(self):
+        """Set all the counters to 0."""
+        with self._lock:
+            self._stats = dict.fromkeys(self._counters, 0)
+
+    def stats(self):
+        """
+        Return a dict with the counters hits, misses and evictions (entries dropped
+        to stay within max_bytes), and the number of entries, used and max_bytes.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["used"] = self.used
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+#: The cache of transformed channels used by FCMeasurement.transform.
+transform_cache = TransformCache()
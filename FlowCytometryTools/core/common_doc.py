@@ -81,9 +81,28 @@ ID_kwargs: dict
     Additional parameters to be used when assigning IDs.
     Passed to '_assign_IDS_to_datafiles' method.""",
 
+_bases_dtype="""\
+dtype : None | 'native' | 'float32' | 'float64'
+    Type in which the event data is held (set as readdata_kwargs['dtype']).
+    'native' keeps the type in which the values are stored in the datafiles
+    (e.g., 16 bit integers). If None, readdata_kwargs decides (float32 by default).
+    The type is kept by gating and subsampling. Transformed channels are
+    float32 if the data was float32 or integers (of at most 24 bits), float64 otherwise.""",
+
+_bases_memory_budget="""\
+memory_budget : None | int | str | MemoryBudget
+    Maximal number of bytes of event data held in memory by the measurements
+    (e.g., 2**30 or '1GB'). When exceeded, the data of the least recently used
+    measurements is dropped, and read again from the datafiles (replaying the
+    actions applied to it) when needed. Data that cannot be read again
+    (e.g., set by the user) is kept. None for no limit.
+    Use a :class:`~FlowCytometryTools.MemoryBudget` to hold the data of the least
+    recently used measurements compressed before dropping it.""",
+
 _gate_available_classes="""\
 [:class:`~FlowCytometryTools.ThresholdGate` | :class:`~FlowCytometryTools.IntervalGate` | \
 :class:`~FlowCytometryTools.QuadGate` | :class:`~FlowCytometryTools.PolyGate` | \
+:class:`~FlowCytometryTools.RectangleGate` | :class:`~FlowCytometryTools.EllipseGate` | \
 :class:`~FlowCytometryTools.core.gates.CompositeGate`]
 """,
 
@@ -124,6 +143,15 @@ get_transformer : bool
     If True the transformer is returned in addition to the new Measurement.
 args :
     Additional positional arguments to be passed to the Transformation.
+dtype : None | 'float32' | 'float64'
+    Type of the transformed channels. If None, float32 (or integer) data is
+    transformed in float32 (see Transformation.transform for the accuracy),
+    and other data in float64. Inverse transformations always return float64
+    (their values may exceed the range of float32).
+    Use 'float64' to up-cast where precision matters.
+n_jobs : int | None
+    Number of threads transforming blocks of events and channels.
+    If None, the number of CPUs is used.
 kwargs :
     Additional keyword arguments to be passed to the Transformation.""",
 
@@ -149,11 +177,17 @@ key : [int | float | tuple | slice]
 
         When key is a tuple (2 floats) or a slice, the 'order' parameter is irrelevant.
 
-order : ['random' | 'start' | 'end']
+order : ['random' | 'reservoir' | 'density' | 'start' | 'end']
     Specifies which events to choose. This is only relevant
     when key is either an int or a float.
 
     * 'random' : chooses the events randomly (without replacement)
+    * 'reservoir' : chooses the events randomly (without replacement) using
+      reservoir sampling. When the data isn't loaded, the datafile is read
+      block by block, so the complete data is never held in memory.
+    * 'density' : density dependent downsampling. Events in sparse regions
+      are more likely to be kept than events in dense regions, which
+      preserves rare populations. See density_channels and density_bins.
     * 'start' : subsamples starting from the start
     * 'end' : subsamples starting from the end
 
@@ -162,18 +196,39 @@ auto_resize : [False | True]
     For example, if there are only 1000 events in the fcs sample,
     but the key is set to subsample 2000 events, then an error will be raised.
     However, with auto_resize set to True, the key will be adjusted
-    to 1000 events.""",
+    to 1000 events.
+seed : [None | int]
+    Seed for the random number generator (used only when order='random').
+    Use it to make random subsampling reproducible.
+rng : [None | numpy.random.Generator]
+    Random number generator to use (used only when order='random').
+    If given, seed is ignored.
+keep_order : [False | True]
+    If True, randomly chosen events are returned in acquisition order.
+    Otherwise they are returned in random order.
+density_channels : [None | str | list of str]
+    Channels used to estimate the local density (order='density' only).
+    If None, all channels are used.
+density_bins : int
+    Number of bins per channel of the grid used to
+    estimate the local density (order='density' only).""",
 
 graph_plotFCM_pars = """\
 channel_names : [str | iterable of str]
     The name (or names) of the channels to plot.
     When one channel is specified, then a 1d histogram is plotted.
-kind : ['scatter' | 'histogram']
+kind : ['scatter' | 'density_scatter' | 'histogram']
     Specifies the kind of plot to use for plotting the data (only applies to 2D plots).
+
+    * 'density_scatter' : the events are aggregated onto a grid with one cell per pixel,
+      which is drawn as a single image. Much faster than 'scatter' for many events.
+      Pixels are colored by the number of events, by the mean of channel `color_by`
+      (e.g., color_by='FSC-A') or with a single `color`.
+      Equivalent to kind='scatter' with rasterize=True.
 autolabel : [False | True]
     If True the x and y axes are labeled automatically.
 colorbar : [False | True]
-    Adds a colorbar. Only relevant when plotting a 2d histogram.
+    Adds a colorbar. Only relevant when plotting a 2d histogram or a density_scatter.
 xlabel_kwargs : dict
     kwargs to be passed to the xlabel() command
 ylabel_kwargs : dict
@@ -218,6 +273,39 @@ ylim : 2-tuple
     min and max y value for each subplot
     if None, the limits are automatically determined for each subplot""",
 
+bases_apply_cache_par="""\
+cache : [None | str | ResultCache]
+    If given, results are memoized on disk, in the given directory
+    (or ResultCache), and reused by later calls (including in other
+    sessions and processes).
+    Results are keyed by the bytecode, constants, default values and closure
+    of func, the datafile (path, size and modification time) or the data in
+    memory, and the queued actions. Globals used by func are not part of the key.
+    Results that cannot be pickled, and functions that cannot be fingerprinted
+    (e.g., with an unpicklable closure) are not cached.""",
+
+FCCollection_stats_pars="""\
+channels : [None | str | list of str]
+    Channels for which to compute the statistics. If None, all channels are used.
+stats : list of str
+    Statistics to compute:
+
+    * 'count' : number of (non-NaN) events
+    * 'mean', 'std', 'min', 'max'
+    * 'median'
+    * 'geomean' : geometric mean of the positive values
+    * 'cv' : coefficient of variation, 100 * std / mean
+    * 'rCV' : robust coefficient of variation, 100 * 0.5 * (p84.13 - p15.87) / median
+    * 'p<q>' : the q-th percentile, e.g., 'p1', 'p99', 'p99.5'
+gate : [None | Gate]
+    If given, statistics are computed on the gated events.
+ids : [hashable | iterable of hashables | None]
+    Keys of measurements for which to compute statistics.
+    If None is given use all measurements.
+n_jobs : [None | int]
+    Number of threads used to process the measurements.
+    If None, the number of CPUs is used.""",
+
 _containers_held_in_memory_warning="""\
 .. warning::
     The new Collection will hold the data for **ALL** Measurements in memory!
@@ -0,0 +1,182 @@
+"""
+Compressed in-memory storage of event data.
+
+Each column of a DataFrame is byte-shuffled (the first bytes of all values,
+then the second bytes, ...), which groups the slowly varying high-order bytes
+of the values together, and compressed with a codec of the standard library.
+Columns are compressed separately, so a single channel can be decompressed
+without decompressing the others. Floating point columns holding integer
+values are stored as integers of the smallest type that holds them.
+"""
+import lzma
+import zlib
+
+import numpy as np
+from pandas import DataFrame, Index, RangeIndex, Series
+
+#: (compress, decompress) functions of the supported codecs, given a level.
+_codecs = {
+    "zlib": (
+        lambda data, level: zlib.compress(data, 1 if level is None else level),
+        zlib.decompress,
+    ),
+    "lzma": (
+        lambda data, level: lzma.compress(data, preset=0 if level is None else level),
+        lzma.decompress,
+    ),
+}
+
+
+def _shuffle(values):
+    values = np.ascontiguousarray(values)
+    return values.view(np.uint8).reshape(-1, values.dtype.itemsize).T.tobytes()
+
+
+def _unshuffle(data, dtype, size):
+    dtype = np.dtype(dtype)
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, size)
+    return np.ascontiguousarray(planes.T).view(dtype).reshape(size)
+
+
+def _narrow(values):
+    """
+    Return values stored in the smallest integer type that holds them exactly
+    if they are integers (as is common for data stored as integers in FCS files),
+    otherwise values.
+    """
+    if values.dtype.kind != "f" or not len(values):
+        return values
+    low, high = values.min(), values.max()
+    if not (np.isfinite(low) and np.isfinite(high)) or low < -(2**31) or high >= 2**31:
+        return values
+    for dtype in (np.uint8, np.uint16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            break
+    narrowed = values.astype(dtype)
+    if not np.array_equal(narrowed, values):
+        return values
+    return narrowed
+
+
+def can_compress(frame):
+    """True if all the columns and the index of frame are numeric (or boolean)."""
+    dtypes = list(frame.dtypes) + [frame.index.dtype]
+    return all(isinstance(dtype, np.dtype) and dtype.kind in "biuf" for dtype in dtypes)
+
+
+class CompressedFrame(object):
+    """
+    A DataFrame of numeric columns, compressed column by column.
+
+    Attributes
+    ----------
+    columns : list
+    nbytes : int
+        Size of the compressed data.
+    raw_nbytes : int
+        Size of the uncompressed values (and index).
+    """
+
+    def __init__(self, frame, codec="zlib", level=None):
+        """
+        Parameters
+        ----------
+        frame : DataFrame
+            Columns and index must be numeric (see can_compress).
+        codec : 'zlib' | 'lzma'
+        level : int | None
+            Compression level (preset for lzma). If None, the fastest level is used.
+        """
+        if codec not in _codecs:
+            raise ValueError(
+                "codec must be one of {}. Got {!r}.".format(sorted(_codecs), codec)
+            )
+        compress = _codecs[codec][0]
+        self.codec = codec
+        self.columns = list(frame.columns)
+        self.size = len(frame)
+        self._dtypes = []
+        self._stored_dtypes = []
+        self._blocks = []
+        self.raw_nbytes = 0
+        for i in range(len(self.columns)):
+            values = frame.iloc[:, i].values
+            stored = _narrow(values)
+            self._dtypes.append(values.dtype.str)
+            self._stored_dtypes.append(stored.dtype.str)
+            self._blocks.append(compress(_shuffle(stored), level))
+            self.raw_nbytes += values.nbytes
+
+        index = frame.index
+        if isinstance(index, RangeIndex):
+            self._index = ("range", index.start, index.step)
+        else:
+            values = np.asarray(index)
+            if values.dtype.kind in "iu" and len(values):
+                # Indexes of gated data are increasing: their differences compress well.
+                values = np.diff(values, prepend=values.dtype.type(0))
+                self._index = ("diff", values.dtype.str, compress(_shuffle(values), level))
+            else:
+                self._index = ("array", values.dtype.str, compress(_shuffle(values), level))
+            self.raw_nbytes += values.nbytes
+        self.nbytes = sum(len(block) for block in self._blocks)
+        if self._index[0] != "range":
+            self.nbytes += len(self._index[2])
+
+    def __repr__(self):
+        return "<CompressedFrame {} x {} ({}, {} -> {} bytes)>".format(
+            self.size, len(self.columns), self.codec, self.raw_nbytes, self.nbytes
+        )
+
+    @property
+    def ratio(self):
+        """Compression ratio (uncompressed size / compressed size)."""
+        return self.raw_nbytes / float(max(self.nbytes, 1))
+
+    def _decompress(self, data, dtype):
+        return _unshuffle(_codecs[self.codec][1](data), dtype, self.size)
+
+    def index(self):
+        """Return the index of the frame."""
+        if self._index[0] == "range":
+            _, start, step = self._index
+            return RangeIndex(start, start + step * self.size, step)
+        kind, dtype, data = self._index
+        values = self._decompress(data, dtype)
+        if kind == "diff":
+            values = np.cumsum(values, dtype=values.dtype)
+        return Index(values)
+
+    def _column_values(self, position):
+        values = self._decompress(self._blocks[position], self._stored_dtypes[position])
+        return values.astype(self._dtypes[position], copy=False)
+
+    def column(self, name):
+        """Return a column as a Series (only this column is decompressed)."""
+        position = self.columns.index(name)
+        return Series(self._column_values(position), index=self.index(), name=name)
+
+    def to_frame(self, columns=None):
+        """
+        Return the DataFrame (or only the given columns).
+        """
+        positions = (
+            range(len(self.columns))
+            if columns is None
+            else [self.columns.index(c) for c in columns]
+        )
+        names = [self.columns[i] for i in positions]
+        if not names:
+            return DataFrame(index=self.index(), columns=names)
+        dtypes = set(self._dtypes[p] for p in positions)
+        if len(dtypes) == 1:
+            # Decompress into a single (column major) block, as pandas stores it.
+            values = np.empty((self.size, len(names)), dtype=dtypes.pop(), order="F")
+            for i, p in enumerate(positions):
+                values[:, i] = self._column_values(p)
+            return DataFrame(values, index=self.index(), columns=names, copy=False)
+        values = {i: self._column_values(p) for i, p in enumerate(positions)}
+        frame = DataFrame(values, index=self.index(), copy=False)
+        frame.columns = names
+        return frame
@@ -1,20 +1,71 @@
-import collections
+import collections.abc
 import inspect
+import os
 import warnings
 from itertools import cycle
-from random import sample
 
-import matplotlib
 import numpy as np
 from fcsparser import parse as parse_fcs
-from pandas import DataFrame
+from pandas import DataFrame, option_context
 
-from . import graph
+from . import histograms
 from .bases import Measurement, MeasurementCollection, OrderedCollection, queueable
+from .cache import transform_cache
 from .common_doc import doc_replacer
-from .graph import plot_ndpanel
-from .transforms import Transformation
-from .utils import to_list
+from .eventstore import EventStore
+from .fcsio import iter_fcs_blocks
+from .membership import Membership, pack
+from .pipeline import execute_queue
+from .profiling import add_bytes, record, stage
+from .sampling import (
+    get_rng,
+    reservoir_sample,
+    resolve_key,
+    spawn_seeds,
+    subsample_data,
+)
+from .shared import SharedFrame
+from .stats import compute_stats, default_stats
+from .transforms import Transformation, _evaluate, result_dtype
+from .utils import fingerprint, parallel_map, to_list
+
+
+def _plot_gates(gates, channel_names, ax=None, gate_colors=None, gate_lw=1):
+    """Draw the gates on the axis (see FCMeasurement.plot for the parameters)."""
+    gates = to_list(gates)
+    if gates is None:
+        return
+    if gate_colors is None:
+        gate_colors = cycle(("b", "g", "r", "m", "c", "y"))
+
+    if not isinstance(gate_lw, collections.abc.Iterable):
+        gate_lw = [gate_lw]
+
+    gate_lw = cycle(gate_lw)
+
+    for (g, c, lw) in zip(gates, gate_colors, gate_lw):
+        g.plot(ax=ax, ax_channels=channel_names, color=c, lw=lw)
+
+
+def _summarize(data, channel_names=None):
+    """Compute the statistics returned by FCMeasurement.channel_summary."""
+    index = ["count", "min", "max", "p1", "p99"]
+    if data is None:
+        return DataFrame(np.nan, index=index, columns=list(channel_names or []))
+    result = compute_stats(data.values, index)
+    return DataFrame([result[s] for s in index], index=index, columns=data.columns)
+
+
+def _check_dtype(dtype):
+    """Return dtype as a readdata_kwargs['dtype'] value ('native' or a float type name)."""
+    if dtype == "native":
+        return dtype
+    dtype = np.dtype(dtype)
+    if dtype.kind != "f":
+        raise ValueError(
+            "dtype must be 'native' or a floating point type. Got {}.".format(dtype)
+        )
+    return dtype.name
 
 
 class FCMeasurement(Measurement):
@@ -23,6 +74,61 @@ class FCMeasurement(Measurement):
     a single well or a single tube.
     """
 
+    @doc_replacer
+    def __init__(
+        self,
+        ID,
+        datafile=None,
+        readdata=False,
+        readdata_kwargs={},
+        metafile=None,
+        readmeta=True,
+        readmeta_kwargs={},
+        dtype=None,
+    ):
+        """
+        Parameters
+        ----------
+        ID : hashable
+            Measurement ID
+        datafile : str | None
+            Path of the FCS file.
+        readdata : bool
+            If True, the data is read right away (otherwise, when first needed).
+        readdata_kwargs : dict
+            Keyword arguments passed to fcsparser when reading the data.
+        metafile : str | None
+        readmeta : bool
+            If True, the metadata is read right away.
+        readmeta_kwargs : dict
+            Keyword arguments passed to fcsparser when reading the metadata.
+        {_bases_dtype}
+        """
+        if dtype is not None:
+            readdata_kwargs = dict(readdata_kwargs, dtype=_check_dtype(dtype))
+        super(FCMeasurement, self).__init__(
+            ID,
+            datafile=datafile,
+            readdata=readdata,
+            readdata_kwargs=readdata_kwargs,
+            metafile=metafile,
+            readmeta=readmeta,
+            readmeta_kwargs=readmeta_kwargs,
+        )
+
+    @property
+    def dtype(self):
+        """
+        Type in which the data is read from the datafile:
+        'native' or the name of a floating point type (see __init__).
+        """
+        return _check_dtype(self.readdata_kwargs.get("dtype", "float32"))
+
+    def _read_dtype(self):
+        """The dtype argument of fcsparser (None for the native type)."""
+        dtype = self.dtype
+        return None if dtype == "native" else dtype
+
     @property
     def channels(self):
         """A DataFrame containing complete channel information"""
@@ -35,6 +141,7 @@ class FCMeasurement(Measurement):
         if self.meta is not None:
             return self.meta["_channel_names_"]
 
+    @stage("read", measurement=True)
     def read_data(self, **kwargs):
         """
         Read the datafile specified in Sample.datafile and
@@ -44,9 +151,18 @@ class FCMeasurement(Measurement):
         It's advised not to use this method, but instead to access
         the data through the FCMeasurement.data attribute.
         """
+        if kwargs.get("dtype") == "native":
+            kwargs["dtype"] = None
         meta, data = parse_fcs(self.datafile, **kwargs)
+        add_bytes(os.path.getsize(self.datafile))
+        swapped = {
+            c: t.newbyteorder("=") for c, t in data.dtypes.items() if not t.isnative
+        }
+        if swapped:
+            data = data.astype(swapped)
         return data
 
+    @stage("read_meta", measurement=True)
     def read_meta(self, **kwargs):
         """
         Read only the annotation of the FCS file (without reading DATA segment).
@@ -63,8 +179,115 @@ class FCMeasurement(Measurement):
         meta = parse_fcs(
             self.datafile, reformat_meta=True, meta_data_only=True, **kwargs
         )
+        add_bytes(meta["__header__"]["text end"] + 1)
         return meta
 
+    def _can_stream(self):
+        """
+        True if the data can be read from the datafile block by block, i.e.,
+        the data is not in memory, no actions are queued and the only
+        parsing options are ones that iter_fcs_blocks supports.
+        """
+        return not self.queue and self._can_stream_source()
+
+    def _can_stream_source(self):
+        """True if the data before the queued actions can be read block by block."""
+        return (
+            self._data is None
+            and self._compressed is None
+            and not (self._evicted and self._replay)
+            and self.datafile is not None
+            and set(self.readdata_kwargs) <= {"dtype"}
+        )
+
+    def _stream_blocks(self, chunksize):
+        """Read the datafile one block at a time (see _can_stream_source)."""
+        return iter_fcs_blocks(
+            self.datafile,
+            self.channel_names,
+            chunksize,
+            dtype=self._read_dtype(),
+        )
+
+    def iter_data(self, chunksize=2**16, channels=None):
+        """
+        Iterate over the data in blocks of events.
+
+        If the data is not in memory, the datafile is read one block at a time
+        (when the file layout allows it), so the complete data is never
+        held in memory.
+
+        Parameters
+        ----------
+        chunksize : int
+            Number of events in each block.
+        channels : None | str | list of str
+            Channels to return. If None, all channels are returned.
+
+        Yields
+        ------
+        DataFrame
+        """
+        channels = to_list(channels)
+        if self._can_stream():
+            blocks = self._stream_blocks(chunksize)
+        else:
+            data = self.get_data()
+            blocks = (
+                data.iloc[start : start + chunksize]
+                for start in range(0, data.shape[0], chunksize)
+            )
+        blocks = iter(blocks)
+        while True:
+            # The block is read within the record; it is yielded outside of it.
+            with record("read", self.ID):
+                block = next(blocks, None)
+            if block is None:
+                return
+            yield block if channels is None else block[channels]
+
+    def channel_summary(self, channels=None):
+        """
+        Summary statistics of each channel: the number of (non-NaN) events,
+        the minimum, the maximum and the 1st and 99th percentiles.
+
+        The statistics of all channels are computed together the first time
+        they are needed and stored with the measurement (they are kept by
+        copies and pickles), so they are reused by later calls (e.g., to set up
+        a shared transformation or the bins and limits of plots).
+        The stored statistics are discarded whenever new data is set or the
+        queue changes.
+
+        Parameters
+        ----------
+        channels : None | str | list of str
+            Channels to return. If None, all channels are returned.
+
+        Returns
+        -------
+        DataFrame indexed by ('count', 'min', 'max', 'p1', 'p99'), with a column per channel.
+        """
+        summary = self._get_summary()
+        if channels is None:
+            return summary.copy()
+        return summary[to_list(channels)]
+
+    def _get_summary(self, data=None):
+        """
+        Return the stored summary, computing it if needed from data
+        (if given, it must be the data of the measurement) or from self.data.
+        """
+        key = self._queue_key()
+        if key is not None and self._summary is not None and self._summary[0] == key:
+            return self._summary[1]
+        if data is None:
+            data = self.data
+        # The channel names are read from the meta only when there is no data.
+        summary = _summarize(data, self.channel_names if data is None else None)
+        if key is not None:
+            self._summary = (key, summary)
+        return summary
+
     def get_meta_fields(self, fields, kwargs={}):
         """
         Return a dictionary of metadata fields
@@ -86,6 +309,7 @@ class FCMeasurement(Measurement):
             msg = msg.format(ID_field, self.datafile)
             raise Exception(msg)
 
+    @stage("plot", measurement=True)
     @doc_replacer
     def plot(
         self,
@@ -129,22 +353,13 @@ class FCMeasurement(Measurement):
         channel_names = to_list(channel_names)
         gates = to_list(gates)
 
-        plot_output = graph.plotFCM(self.data, channel_names, kind=kind, **kwargs)
-
-        if gates is not None:
-            if gate_colors is None:
-                gate_colors = cycle(("b", "g", "r", "m", "c", "y"))
-
-            if not isinstance(gate_lw, collections.Iterable):
-                gate_lw = [gate_lw]
-
-            gate_lw = cycle(gate_lw)
-
-            for (g, c, lw) in zip(gates, gate_colors, gate_lw):
-                g.plot(ax=ax, ax_channels=channel_names, color=c, lw=lw)
+        from . import graph
 
+        plot_output = graph.plotFCM(self.data, channel_names, kind=kind, **kwargs)
+        _plot_gates(gates, channel_names, ax, gate_colors, gate_lw)
         return plot_output
 
+    @stage("plot", measurement=True)
     def view(
         self,
         channel_names="auto",
@@ -152,48 +367,64 @@ class FCMeasurement(Measurement):
         diag_kw={},
         offdiag_kw={},
         gate_colors=None,
+        bins=200,
+        n_jobs=None,
         **kwargs
     ):
         """
         Generates a matrix of subplots allowing for a quick way
         to examine how the sample looks in different channels.
 
+        All the histograms are computed in a single pass over the data,
+        and the panels are drawn from the computed counts.
+
         Parameters
         ----------
         channel_names : [list | 'auto']
             List of channel names to plot.
-        offdiag_plot : ['histogram' | 'scatter']
-            Specifies the type of plot for the off-diagonal elements.
         diag_kw : dict
-            Not implemented
+            kwargs passed to graph.plot_histogram_counts for the (1d) diagonal panels.
+        offdiag_kw : dict
+            kwargs passed to graph.plot_histogram_counts for the (2d) off-diagonal panels.
+        bins : int
+            Number of bins used for each channel.
+        n_jobs : int | None
+            Number of threads used to compute the histograms.
+            If None, the number of CPUs is used.
 
         Returns
         ------------
 
         axes references
         """
+        from . import graph
+
         if channel_names == "auto":
             channel_names = list(self.channel_names)
+        channel_names = list(channel_names)
+
+        lo, hi = histograms.data_range(self, channel_names)
+        edges = [histograms.range_edges([l, h], bins) for l, h in zip(lo, hi)]
+        counts = histograms.pairwise_histograms(self, channel_names, edges, n_jobs)
+        position = {c: i for i, c in enumerate(channel_names)}
 
         def plot_region(channels, **kwargs):
-            if channels[0] == channels[1]:
+            i, j = position[channels[0]], position[channels[1]]
+            if i == j:
+                graph.plot_histogram_counts(counts[i], [edges[i]], **diag_kw)
                 channels = channels[0]
-            kind = "histogram"
-
-            self.plot(
-                channels,
-                kind=kind,
-                gates=gates,
-                gate_colors=gate_colors,
-                autolabel=False,
-            )
+            elif i < j:
+                graph.plot_histogram_counts(counts[(i, j)], [edges[i], edges[j]], **offdiag_kw)
+            else:
+                graph.plot_histogram_counts(counts[(j, i)].T, [edges[i], edges[j]], **offdiag_kw)
+            _plot_gates(gates, to_list(channels), gate_colors=gate_colors)
 
-        channel_list = np.array(list(channel_names), dtype=object)
+        channel_list = np.array(channel_names, dtype=object)
         channel_mat = [[(x, y) for x in channel_list] for y in channel_list]
         channel_mat = DataFrame(channel_mat, columns=channel_list, index=channel_list)
         kwargs.setdefault("wspace", 0.1)
         kwargs.setdefault("hspace", 0.1)
-        return plot_ndpanel(channel_mat, plot_region, **kwargs)
+        return graph.plot_ndpanel(channel_mat, plot_region, **kwargs)
 
     def view_interactively(self, backend="wx"):
         """Loads the current sample in a graphical interface for drawing gates.
@@ -204,6 +435,8 @@ class FCMeasurement(Measurement):
             Specifies which backend should be used to view the sample.
         """
         if backend == "auto":
+            import matplotlib
+
             if matplotlib.__version__ >= "1.4.3":
                 backend = "WebAgg"
             else:
@@ -218,6 +451,7 @@ class FCMeasurement(Measurement):
 
         gui.GUILauncher(measurement=self)
 
+    @stage("transform", measurement=True)
     @queueable
     @doc_replacer
     def transform(
@@ -232,6 +466,9 @@ class FCMeasurement(Measurement):
         ID=None,
         apply_now=True,
         args=(),
+        dtype=None,
+        inplace=False,
+        n_jobs=None,
         **kwargs
     ):
         """
@@ -241,11 +478,20 @@ class FCMeasurement(Measurement):
         If different parameters need to be applied to different channels,
         use several calls to `transform`.
 
+        The transformed channels are cached in memory (see
+        FlowCytometryTools.transform_cache), so transforming the same data
+        in the same way again only copies them. Transforms in place (see inplace)
+        and channels larger than the cache are not cached.
+
         Parameters
         ----------
         {FCMeasurement_transform_pars}
         ID : hashable | None
             ID for the resulting collection. If None is passed, the original ID is used.
+        inplace : bool
+            If True, the channels of this measurement are overwritten (without
+            allocating memory for channels whose type doesn't change), and it is returned
+            instead of a new measurement. The measurement must not have queued actions.
 
         Returns
         -------
@@ -259,52 +505,54 @@ class FCMeasurement(Measurement):
         --------
         {FCMeasurement_transform_examples}
         """
-        # Create new measurement
-        new = self.copy()
+        if inplace:
+            if self.queue:
+                raise ValueError(
+                    "Measurement {} has queued actions; it cannot be transformed "
+                    "in place.".format(repr(self.ID))
+                )
+            new = self
+        else:
+            # Create new measurement (its data is a copy, transformed in place below)
+            new = self.copy()
         data = new.data
 
         channels = to_list(channels)
         if channels is None:
             channels = data.columns
         ## create transformer
-        if isinstance(transform, Transformation):
-            transformer = transform
-        else:
-            if auto_range:  # determine transformation range
-                if "d" in kwargs:
-                    warnings.warn(
-                        "Encountered both auto_range=True and user-specified range value in "
-                        "parameter d.\n Range value specified in parameter d is used."
-                    )
-                else:
-                    channel_meta = self.channels
-                    # the -1 below because the channel numbers begin from 1 instead of 0
-                    # (this is fragile code)
-                    ranges = [
-                        float(r["$PnR"])
-                        for i, r in channel_meta.iterrows()
-                        if self.channel_names[i - 1] in channels
-                    ]
-                    if not np.allclose(ranges, ranges[0]):
-                        raise Exception(
-                            """Not all specified channels have the same data range,
-                            therefore they cannot be transformed together.\n
-                            HINT: Try transforming one channel at a time.
-                            You'll need to provide the name of the channel in the transform."""
-                        )
-
-                    if transform in {"hlog", "tlog", "hlog_inv", "tlog_inv"}:
-                        # Hacky fix to make sure that 'd' is provided only
-                        # for hlog / tlog transformations
-                        kwargs["d"] = np.log10(ranges[0])
-            transformer = Transformation(transform, direction, args, **kwargs)
+        transformer = self._get_transformer(
+            transform, direction, channels, auto_range, args, kwargs
+        )
+        # Caching copies the channels, which in place transforms are meant to avoid.
+        key = None
+        if not inplace:
+            key = self._transform_cache_key(transformer, channels, use_spln, dtype)
+        cached = transform_cache.get(key) if key is not None else None
+        if cached is not None:
+            values, spln, spline_fit = cached
+            if use_spln:
+                transformer.spln, transformer._spline_fit = spln, spline_fit
+        elif use_spln and transformer.spln is None:
+            # The data was read above; don't read it again for the summary.
+            summary = new._get_summary(data)[list(channels)]
+            transformer.set_spline(summary.loc["min"].min(), summary.loc["max"].max())
         ## create new data
-        transformed = transformer(data[channels], use_spln)
         if return_all:
             new_data = data
         else:
             new_data = data.filter(channels)
-        new_data[channels] = transformed
+        if cached is not None:
+            for channel in channels:
+                new_data[channel] = values[channel].copy()
+        else:
+            self._transform_channels(new_data, channels, transformer, use_spln, dtype, n_jobs)
+            nbytes = sum(new_data[channel].values.nbytes for channel in channels)
+            if key is not None and nbytes <= transform_cache.max_bytes:
+                # Copies: the channels of new may be modified in place later on.
+                values = {channel: new_data[channel].values.copy() for channel in channels}
+                cached = (values, transformer.spln, transformer._spline_fit)
+                transform_cache.set(key, cached, nbytes)
         ## update new Measurement
         new.data = new_data
 
@@ -315,8 +563,143 @@ class FCMeasurement(Measurement):
         else:
             return new
 
+    def _transform_cache_key(self, transformer, channels, use_spln, dtype):
+        """
+        Key of the channels transformed by transform in the transform cache
+        (see core.cache.TransformCache); None if the result cannot be cached.
+        """
+        if self.queue or transform_cache.max_bytes <= 0:
+            return None
+        transform_key = transformer.fingerprint(spline=use_spln)
+        if transform_key is None:
+            return None
+        # A spline fitted by transform depends on the range of all the channels.
+        fitted = use_spln and transformer.spln is None
+        dtype = None if dtype is None else np.dtype(dtype).str
+        return (self._get_data_token(), transform_key, tuple(channels), use_spln, fitted, dtype)
+
+    def _transform_dtype(self, channel, dtype, direction="forward"):
+        """
+        Type in which a channel holding values of type dtype is transformed by default
+        (see transforms.result_dtype).
+        Integer data read in its native type is transformed in float32
+        when its values (at most $PnR) are exactly representable in float32.
+        """
+        if direction == "forward" and dtype.kind in "iu" and self.meta is not None:
+            ranges = dict(zip(self.channel_names, self.channels["$PnR"]))
+            if channel in ranges and float(ranges[channel]) <= 2**24:
+                return np.dtype(np.float32)
+        return result_dtype(dtype, direction)
+
+    def _transform_channels(
+        self, data, channels, transformer, use_spln, dtype=None, n_jobs=None
+    ):
+        """
+        Transform channels of data (events of this measurement) in place.
+
+        Channels held in a writable array of the type of the result are overwritten
+        block by block, without allocating memory. Other channels (e.g., integer
+        channels, or data in read-only shared memory) are replaced.
+        The blocks of all the channels are transformed by n_jobs threads.
+
+        Parameters
+        ----------
+        data : DataFrame
+        channels : list of str
+        transformer : Transformation
+        use_spln : bool
+        dtype : None | str | numpy dtype
+            Type of the transformed channels (see transform).
+        n_jobs : int | None
+        """
+        tasks = []
+        replaced = {}
+        # Channels are only overwritten if data owns their buffer: a view of
+        # another frame (e.g., a slice) must not modify that frame.
+        owns_values = not data._is_view
+        for channel in channels:
+            values = data[channel].values
+            if dtype is None:
+                target = self._transform_dtype(channel, values.dtype, transformer.direction)
+            else:
+                target = np.dtype(dtype)
+            root = values
+            while isinstance(root.base, np.ndarray):
+                root = root.base
+            in_place = owns_values and values.flags.writeable and root.size <= data.size
+            if values.dtype == target and in_place:
+                out = values
+            else:
+                out = replaced[channel] = np.empty(values.shape, dtype=target)
+            task = transformer._task(values, use_spln, out)
+            if task is None:
+                transformer(values, use_spln, out=out)
+            else:
+                tasks.append(task)
+        _evaluate(tasks, n_jobs)
+        # The columns of a view are replaced on purpose (its parent is left as is).
+        with option_context("mode.chained_assignment", None):
+            for channel, values in replaced.items():
+                data[channel] = values
+
+    def _get_transformer(self, transform, direction, channels, auto_range, args, kwargs):
+        """
+        Create the Transformation used by `transform`.
+
+        If transform is already a Transformation it is returned as is.
+        Note that kwargs may be updated with the automatically determined range.
+        """
+        if isinstance(transform, Transformation):
+            return transform
+        if auto_range:  # determine transformation range
+            if "d" in kwargs:
+                warnings.warn(
+                    "Encountered both auto_range=True and user-specified range value in "
+                    "parameter d.\n Range value specified in parameter d is used."
+                )
+            else:
+                channel_meta = self.channels
+                # the -1 below because the channel numbers begin from 1 instead of 0
+                # (this is fragile code)
+                ranges = [
+                    float(r["$PnR"])
+                    for i, r in channel_meta.iterrows()
+                    if self.channel_names[i - 1] in channels
+                ]
+                if not np.allclose(ranges, ranges[0]):
+                    raise Exception(
+                        """Not all specified channels have the same data range,
+                        therefore they cannot be transformed together.\n
+                        HINT: Try transforming one channel at a time.
+                        You'll need to provide the name of the channel in the transform."""
+                    )
+
+                if transform in {"hlog", "tlog", "hlog_inv", "tlog_inv"}:
+                    # Hacky fix to make sure that 'd' is provided only
+                    # for hlog / tlog transformations
+                    kwargs["d"] = np.log10(ranges[0])
+        return Transformation(transform, direction, args, **kwargs)
+
+    @stage("queue", measurement=True)
+    def _execute_queue(self):
+        """Run the queued actions as a single fused pipeline (see core.pipeline)."""
+        return execute_queue(self)
+
+    @stage("subsample", measurement=True)
+    @queueable
     @doc_replacer
-    def subsample(self, key, order="random", auto_resize=False):
+    def subsample(
+        self,
+        key,
+        order="random",
+        auto_resize=False,
+        seed=None,
+        rng=None,
+        keep_order=False,
+        density_channels=None,
+        density_bins=32,
+        apply_now=True,
+    ):
         """
         Allows arbitrary slicing (subsampling) of the data.
 
@@ -329,60 +712,32 @@ class FCMeasurement(Measurement):
         FCMeasurement
             Sample with subsampled data.
         """
-
-        data = self.get_data()
-        num_events = data.shape[0]
-
-        if isinstance(key, float):
-            if (key > 1.0) or (key < 0.0):
-                raise ValueError("If float, key must be between 0.0 and 1.0")
-            key = int(num_events * key)
-        elif isinstance(key, tuple):
-            all_float = all([isinstance(x, float) for x in key])
-            if (len(key) > 2) or (not all_float):
-                raise ValueError(
-                    "Tuple must consist of two floats, each between 0.0 and 1.0"
-                )
-            start = int(num_events * key[0])
-            stop = int(num_events * key[1])
-            key = slice(start, stop)  # Convert to a slice
-
-        try:
-            if isinstance(key, slice):
-                if auto_resize:
-                    stop = key.stop if key.stop < num_events else num_events
-                    start = key.start if key.start < num_events else num_events
-                    key = slice(start, stop, key.step)  # Generate new slice
-                newdata = data.iloc[key]
-            elif isinstance(key, int):
-                if auto_resize:
-                    if key > num_events:
-                        key = num_events
-                if key < 1:
-                    # EDGE CAES: Must return an empty sample
-                    order = "start"
-                if order == "random":
-                    newdata = data.loc[
-                        sample(list(data.index), key)
-                    ]  # Use loc not iloc here!!
-                elif order == "start":
-                    newdata = data.iloc[:key]
-                elif order == "end":
-                    newdata = data.iloc[-key:]
-                else:
-                    raise ValueError("order must be in ('random', 'start', 'end')")
+        if order == "reservoir" and self._can_stream():
+            num_events = int(self.get_meta()["$TOT"])
+            size = resolve_key(key, num_events, auto_resize)
+            if isinstance(size, slice) or size < 1:
+                newdata = subsample_data(self.get_data(), key, order, auto_resize)
             else:
-                raise TypeError("'key' must be of type int, float, tuple or slice.")
-        except IndexError:
-            print(
-                "If you're encountering an out-of-bounds error, "
-                "try to setting 'auto_resize' to True."
+                newdata = reservoir_sample(
+                    self.iter_data(), size, get_rng(seed, rng), keep_order
+                )
+        else:
+            newdata = subsample_data(
+                self.get_data(),
+                key,
+                order,
+                auto_resize,
+                seed,
+                rng,
+                keep_order,
+                density_channels,
+                density_bins,
             )
-            raise
-        newsample = self.copy()
+        newsample = self._copy_without_data()
         newsample.set_data(data=newdata)
         return newsample
 
+    @stage("gate", measurement=True)
     @queueable
     @doc_replacer
     def gate(self, gate, apply_now=True):
@@ -401,16 +756,107 @@ class FCMeasurement(Measurement):
         """
         data = self.get_data()
         newdata = gate(data)
-        newsample = self.copy()
+        newsample = self._copy_without_data()
         newsample.data = newdata
         return newsample
 
+    @doc_replacer
+    def membership(self, gates, n_jobs=None):
+        """
+        Return the membership of the events in the given gates, as a bit-packed
+        matrix of events x gates (see core.membership.Membership).
+
+        Counts, intersections and combinations of the gates are then computed
+        from the bits, without gating the data again. The bits of each gate
+        are also kept on the measurement (and pickled with it): gates that were
+        already evaluated on the current data are not evaluated again.
+
+        Parameters
+        ----------
+        gates : {_gate_available_classes} | list of gates
+            The names of the gates must be unique.
+        n_jobs : int | None
+            Number of threads evaluating the gates. If None, the number of CPUs is used.
+
+        Returns
+        -------
+        Membership
+
+        Examples
+        --------
+        >>> membership = sample.membership([cd3, cd4, cd8])
+        >>> membership.counts()
+        >>> membership.count(cd3 & cd4 & ~cd8)
+        >>> membership.intersections()
+        """
+        gates = to_list(gates)
+        # The membership depends on the data after the queued actions:
+        # it is only kept for measurements without queued actions.
+        keys = [None if self.queue else fingerprint(gate) for gate in gates]
+        num_events, known = self._membership or (None, {})
+        missing = [i for i, key in enumerate(keys) if key is None or key not in known]
+        computed = {}
+        if missing or num_events is None:
+            data = self.get_data()
+            num_events = len(data)
+            rows = parallel_map(lambda i: pack(gates[i]._identify(data)), missing, n_jobs)
+            computed = dict(zip(missing, rows))
+            if not self.queue:
+                known = dict(known)
+                known.update((keys[i], row) for i, row in computed.items() if keys[i] is not None)
+                self._membership = (num_events, known)
+        bits = np.empty((len(gates), -(-num_events // 8)), dtype=np.uint8)
+        for i, key in enumerate(keys):
+            bits[i] = computed[i] if i in computed else known[key]
+        return Membership([gate.name for gate in gates], bits, num_events)
+
     @property
     def counts(self):
         """Returns total number of events."""
         data = self.get_data()
         return data.shape[0]
 
+    def share(self):
+        """
+        Return a copy of the measurement whose data is held in shared memory.
+
+        The data (with all queued actions applied) is copied once into a
+        shared memory block. When the new measurement is pickled (e.g., to be
+        sent to a worker of a multiprocessing pool), only a handle to the block is
+        pickled, and the unpickled measurement uses the block without copying it.
+        A worker can send a result back the same way, by sharing the measurement
+        it returns.
+
+        The shared data is read-only. Call release() when the data is no
+        longer needed by any process.
+
+        Returns
+        -------
+        FCMeasurement
+        """
+        data = self.get_data()
+        if data is None:
+            raise ValueError("Measurement {} has no data to share.".format(repr(self.ID)))
+        handle = SharedFrame.from_frame(data)
+        new = self._copy_without_data()
+        new.set_data(data=handle.attach())
+        new._shared = handle
+        return new
+
+    def release(self):
+        """
+        Free the shared memory block holding the data (see share).
+
+        The measurement keeps a private copy of the data. Other measurements
+        using the same block (e.g., in other processes) must not be used afterwards.
+        """
+        if self._shared is None:
+            return
+        handle = self._shared
+        self._data = self._data.copy()
+        self._shared = None
+        handle.release()
+
 
 class FCCollection(MeasurementCollection):
     """
@@ -433,6 +879,8 @@ class FCCollection(MeasurementCollection):
         ID=None,
         apply_now=True,
         args=(),
+        dtype=None,
+        n_jobs=None,
         **kwargs
     ):
         """
@@ -460,7 +908,8 @@ class FCCollection(MeasurementCollection):
         --------
         {FCMeasurement_transform_examples}
         """
-        new = self.copy()
+        # The measurements are replaced by their transformed copies.
+        new = self._copy_without_measurements()
         if share_transform:
 
             channel_meta = list(self.values())[0].channels
@@ -501,28 +950,25 @@ class FCCollection(MeasurementCollection):
                             kwargs["d"] = np.log10(ranges[0])
                 transformer = Transformation(transform, direction, args, **kwargs)
                 if use_spln:
-                    xmax = (
-                        self.apply(lambda x: x[channels].max().max(), applyto="data")
-                        .max()
-                        .max()
-                    )
-                    xmin = (
-                        self.apply(lambda x: x[channels].min().min(), applyto="data")
-                        .min()
-                        .min()
+                    summaries = parallel_map(
+                        lambda m: m.channel_summary(channels), self.values()
                     )
+                    xmax = np.nanmax([s.loc["max"].max() for s in summaries])
+                    xmin = np.nanmin([s.loc["min"].min() for s in summaries])
                     transformer.set_spline(xmin, xmax)
             ## transform all measurements
-            for k, v in new.items():
+            for k, v in self.items():
                 new[k] = v.transform(
                     transformer,
                     channels=channels,
                     return_all=return_all,
                     use_spln=use_spln,
                     apply_now=apply_now,
+                    dtype=dtype,
+                    n_jobs=n_jobs,
                 )
         else:
-            for k, v in new.items():
+            for k, v in self.items():
                 new[k] = v.transform(
                     transform,
                     direction=direction,
@@ -533,6 +979,8 @@ class FCCollection(MeasurementCollection):
                     use_spln=use_spln,
                     apply_now=apply_now,
                     args=args,
+                    dtype=dtype,
+                    n_jobs=n_jobs,
                     **kwargs
                 )
         if ID is not None:
@@ -562,8 +1010,78 @@ class FCCollection(MeasurementCollection):
 
         return self.apply(func, output_format="collection", ID=ID)
 
+    def concat(self, channels=None, ids=None):
+        """
+        Pool the events of the measurements into a single contiguous array.
+
+        The events of each measurement occupy a consecutive run of rows of a
+        column major (events x channels) array, located through a table of offsets.
+        Use it for analyses of the pooled events (e.g., clustering or gating
+        of all the wells together). Per-event results on the pooled events map
+        back to the measurements through EventStore.split and EventStore.to_collection.
+
+        Parameters
+        ----------
+        channels : None | str | list of str
+            Channels to pool. If None, all channels are pooled.
+        ids : hashable | iterable of hashables | None
+            Keys of the measurements to pool. If None, all measurements are pooled.
+
+        Returns
+        -------
+        EventStore
+
+        Examples
+        --------
+        >>> events = plate.concat(['FSC-A', 'SSC-A'])
+        >>> mask = events.values[:, 0] > 1000  # Any analysis of the pooled events
+        >>> gated = events.to_collection(mask)
+        """
+        return EventStore.from_collection(self, to_list(channels), to_list(ids))
+
+    def share(self, ID=None):
+        """
+        Return a new collection whose measurements hold their data in shared memory.
+
+        Pickling a shared measurement (e.g., to send it to a worker of a
+        multiprocessing pool) only pickles a handle to its data, and workers
+        use the data without copying it. See FCMeasurement.share for details.
+
+        Call release() when the shared data is no longer needed.
+
+        Parameters
+        ----------
+        ID : hashable | None
+            ID for the resulting collection. If None is passed, the original ID is used.
+
+        Examples
+        --------
+        >>> shared = plate.share()
+        >>> with multiprocessing.Pool() as pool:
+        ...     medians = pool.map(median_of_well, shared.values())
+        >>> shared.release()
+        """
+        return self.apply(lambda x: x.share(), output_format="collection", ID=ID)
+
+    def release(self):
+        """Free the shared memory blocks of the measurements (see share)."""
+        for measurement in self.values():
+            measurement.release()
+
     @doc_replacer
-    def subsample(self, key, order="random", auto_resize=False, ID=None):
+    def subsample(
+        self,
+        key,
+        order="random",
+        auto_resize=False,
+        ID=None,
+        seed=None,
+        rng=None,
+        keep_order=False,
+        density_channels=None,
+        density_bins=32,
+        apply_now=True,
+    ):
         """
         Allows arbitrary slicing (subsampling) of the data.
 
@@ -571,6 +1089,9 @@ class FCCollection(MeasurementCollection):
 
             When using order='random', the sampling is random
             for each of the measurements in the collection.
+            Each measurement gets an independent random stream that is
+            derived from the seed and its key, so results are reproducible
+            when a seed is given.
 
         Parameters
         ----------
@@ -582,10 +1103,94 @@ class FCCollection(MeasurementCollection):
             new collection of subsampled event data.
         """
 
-        def func(well):
-            return well.subsample(key=key, order=order, auto_resize=auto_resize)
+        seeds = spawn_seeds(self.keys(), seed, rng)
+        new = self.copy()
+        for k, v in new.items():
+            new[k] = v.subsample(
+                key=key,
+                order=order,
+                auto_resize=auto_resize,
+                seed=seeds[k],
+                keep_order=keep_order,
+                density_channels=density_channels,
+                density_bins=density_bins,
+                apply_now=apply_now,
+            )
+        if ID is not None:
+            new.ID = ID
+        return new
 
-        return self.apply(func, output_format="collection", ID=ID)
+    def _stats_dict(self, channels, stats, gate, ids, n_jobs):
+        """Compute stats for each measurement. Return a dict of key:DataFrame (stat x channel)."""
+        stats = list(stats)
+        ids = list(self.keys()) if ids is None else to_list(ids)
+        channels = to_list(channels)
+
+        def compute(key):
+            measurement = self[key]
+            if gate is not None:
+                measurement = measurement.gate(gate)
+            data = measurement.get_data()
+            columns = channels
+            if columns is None:
+                columns = list(data.columns) if data is not None else []
+            if data is None:
+                values = np.empty((0, len(columns)))
+            else:
+                values = data[columns].values
+            result = compute_stats(values, stats)
+            return DataFrame([result[s] for s in stats], index=stats, columns=columns)
+
+        return dict(zip(ids, parallel_map(compute, ids, n_jobs)))
+
+    @doc_replacer
+    def stats(
+        self,
+        channels=None,
+        stats=default_stats,
+        gate=None,
+        ids=None,
+        n_jobs=None,
+        output_format="DataFrame",
+    ):
+        """
+        Compute summary statistics of each of the specified measurements.
+
+        All the statistics of all the channels of a measurement are computed
+        together, in a single pass over its data. Measurements are processed in parallel.
+
+        Parameters
+        ----------
+        {FCCollection_stats_pars}
+        output_format : ['DataFrame' | 'dict']
+            * 'DataFrame' : a long DataFrame with columns key, channel, stat and value.
+            * 'dict' : dictionary keyed by measurement keys of DataFrames (stats x channels).
+
+        Returns
+        -------
+        [DataFrame | Dictionary]
+
+        Examples
+        --------
+        >>> collection.stats(['FSC-A', 'Y2-A'], stats=['count', 'median', 'rCV'])
+        """
+        result = self._stats_dict(channels, stats, gate, ids, n_jobs)
+        if output_format == "dict":
+            return result
+        elif output_format == "DataFrame":
+            records = [
+                (key, channel, stat, value)
+                for key, df in result.items()
+                for stat, row in df.iterrows()
+                for channel, value in row.items()
+            ]
+            return DataFrame(records, columns=["key", "channel", "stat", "value"])
+        else:
+            msg = (
+                "output_format must be either 'dict' or 'DataFrame'. "
+                + "Encountered unsupported value %s." % repr(output_format)
+            )
+            raise Exception(msg)
 
     def counts(self, ids=None, setdata=False, output_format="DataFrame"):
         """
@@ -617,6 +1222,7 @@ class FCOrderedCollection(OrderedCollection, FCCollection):
     A dict-like class for holding flow cytometry samples that are arranged in a matrix.
     """
 
+    @stage("plot")
     @doc_replacer
     def plot(
         self,
@@ -630,6 +1236,7 @@ class FCOrderedCollection(OrderedCollection, FCCollection):
         xlim="auto",
         ylim="auto",
         autolabel=True,
+        n_jobs=None,
         **kwargs
     ):
         """
@@ -640,6 +1247,9 @@ class FCOrderedCollection(OrderedCollection, FCCollection):
         {FCMeasurement_plot_pars}
         {graph_plotFCM_pars}
         {_graph_grid_layout}
+        n_jobs : int | None
+            Number of threads used to compute the histograms of the wells.
+            If None, the number of CPUs is used.
 
         Returns
         -------
@@ -672,7 +1282,7 @@ class FCOrderedCollection(OrderedCollection, FCCollection):
         # be sent to grid_plot instead of two sample.plot
         # (May not be a robust solution, we'll see as the code evolves
 
-        grid_arg_list = inspect.getargspec(OrderedCollection.grid_plot).args
+        grid_arg_list = inspect.getfullargspec(OrderedCollection.grid_plot).args
 
         grid_plot_kwargs = {
             "ids": ids,
@@ -685,57 +1295,83 @@ class FCOrderedCollection(OrderedCollection, FCCollection):
                 kwargs.pop(key)
                 grid_plot_kwargs[key] = value
 
+        from . import graph
+
         ##
         # Make sure channel names is a list to make the code simpler below
         channel_names = to_list(channel_names)
 
         ##
-        # Determine data limits for binning
-        #
+        # Histograms are computed against bin edges shared by all the wells
+        # (see core.histograms), and drawn directly from the counts.
+
+        if ids is None:
+            measurements = self
+        else:
+            measurements = {k: self[k] for k in to_list(ids)}
 
         if kind == "histogram":
-            nbins = kwargs.get("bins", 200)
-
-            if isinstance(nbins, int):
-                min_list = []
-                max_list = []
-                for sample in self:
-                    min_list.append(self[sample].data[channel_names].min().values)
-                    max_list.append(self[sample].data[channel_names].max().values)
-
-                min_list = list(zip(*min_list))
-                max_list = list(zip(*max_list))
-
-                bins = []
-
-                for i, c in enumerate(channel_names):
-                    min_v = min(min_list[i])
-                    max_v = max(max_list[i])
-                    bins.append(np.linspace(min_v, max_v, nbins))
-
-                # Check if 1d
-                if len(channel_names) == 1:
-                    bins = bins[0]  # bins should be an ndarray, not a list of ndarrays
-
-                kwargs["bins"] = bins
-
-        ##########
-        # Defining the plotting function that will be used.
-        # At the moment grid_plot handles the labeling
-        # (rather than sample.plot or the base function
-        # in GoreUtilities.graph
-
-        def plot_sample(sample, ax):
-            return sample.plot(
-                channel_names,
-                ax=ax,
-                gates=gates,
-                gate_colors=gate_colors,
-                colorbar=False,
-                kind=kind,
-                autolabel=False,
-                **kwargs
+            bins = kwargs.pop("bins", 200)
+            grid = kwargs.pop("grid", False)
+            for key in ("xlabel_kwargs", "ylabel_kwargs"):
+                kwargs.pop(key, None)
+
+            # Only a list or tuple holds one bins spec per channel;
+            # an int or an array of edges applies to every channel.
+            if len(channel_names) == 1 or not isinstance(bins, (list, tuple)):
+                bins = [bins] * len(channel_names)
+            edges = list(bins)
+            for i, b in enumerate(bins):
+                if isinstance(b, int):
+                    edges[i] = histograms.shared_edges(
+                        measurements.values(), [channel_names[i]], b, n_jobs
+                    )[0]
+
+            counts = histograms.collection_histograms(
+                measurements, channel_names, edges, n_jobs
             )
+            counts = {id(self[k]): c for k, c in counts.items()}
+
+            def plot_sample(sample, ax):
+                output = graph.plot_histogram_counts(
+                    counts[id(sample)], edges, ax=ax, colorbar=False, **kwargs
+                )
+                ax.grid(grid)
+                _plot_gates(gates, channel_names, ax, gate_colors)
+                return output
+
+        else:
+            ##
+            # Set the limits from the (stored) channel statistics of the wells
+            # rather than from the drawn artists.
+            if xlim == "auto" or (ylim == "auto" and len(channel_names) == 2):
+                summaries = parallel_map(
+                    lambda m: m.channel_summary(channel_names), measurements.values(), n_jobs
+                )
+                lo = np.nanmin([s.loc["min"].values for s in summaries], axis=0)
+                hi = np.nanmax([s.loc["max"].values for s in summaries], axis=0)
+                if xlim == "auto" and lo[0] < hi[0]:
+                    xlim = (lo[0], hi[0])
+                if ylim == "auto" and len(channel_names) == 2 and lo[1] < hi[1]:
+                    ylim = (lo[1], hi[1])
+
+            ##########
+            # Defining the plotting function that will be used.
+            # At the moment grid_plot handles the labeling
+            # (rather than sample.plot or the base function
+            # in GoreUtilities.graph
+
+            def plot_sample(sample, ax):
+                return sample.plot(
+                    channel_names,
+                    ax=ax,
+                    gates=gates,
+                    gate_colors=gate_colors,
+                    colorbar=False,
+                    kind=kind,
+                    autolabel=False,
+                    **kwargs
+                )
 
         xlabel, ylabel = None, None
 
@@ -754,5 +1390,52 @@ class FCOrderedCollection(OrderedCollection, FCCollection):
             **grid_plot_kwargs
         )
 
+    @doc_replacer
+    def stats(
+        self,
+        channels=None,
+        stats=default_stats,
+        gate=None,
+        ids=None,
+        n_jobs=None,
+        output_format="DataFrame",
+    ):
+        """
+        Compute summary statistics of each of the specified measurements.
+
+        All the statistics of all the channels of a measurement are computed
+        together, in a single pass over its data. Measurements are processed in parallel.
+
+        Parameters
+        ----------
+        {FCCollection_stats_pars}
+        output_format : ['DataFrame' | 'dict' | 'layout']
+            * 'DataFrame' : a long DataFrame with columns key, channel, stat and value.
+            * 'dict' : dictionary keyed by measurement keys of DataFrames (stats x channels).
+            * 'layout' : dictionary keyed by (channel, stat) of DataFrames
+              arranged like the collection (as returned by apply).
+
+        Returns
+        -------
+        [DataFrame | Dictionary]
+
+        Examples
+        --------
+        >>> plate.stats(['FSC-A', 'Y2-A'], stats=['count', 'median', 'rCV'])
+        >>> medians = plate.stats('Y2-A', stats=['median'], output_format='layout')
+        >>> medians['Y2-A', 'median']
+        """
+        if output_format != "layout":
+            return super(FCOrderedCollection, self).stats(
+                channels, stats, gate, ids, n_jobs, output_format
+            )
+        result = self._stats_dict(channels, stats, gate, ids, n_jobs)
+        layouts = {}
+        for key, df in result.items():
+            for stat, row in df.iterrows():
+                for channel, value in row.items():
+                    layouts.setdefault((channel, stat), {})[key] = value
+        return {k: self._dict2DF(d, np.nan) for k, d in layouts.items()}
+
 
 FCPlate = FCOrderedCollection
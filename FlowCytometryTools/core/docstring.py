@@ -1,6 +1,6 @@
 import string
 
-from matplotlib import inspect
+import inspect
 
 
 class FormatDict(dict):
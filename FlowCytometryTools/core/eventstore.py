@@ -0,0 +1,163 @@
+"""
+Pooled events of the measurements of a collection.
+
+The events of all the measurements are stored in a single contiguous
+(events x channels) array, in column major order, with the events of each
+measurement in a consecutive run of rows. A table of offsets (as in CSR sparse
+matrices) maps each measurement to its rows, so per-event results computed on
+the pooled events (e.g., masks or cluster labels) map back to the measurements
+as views.
+"""
+import numpy as np
+from pandas import Categorical, DataFrame
+
+
+class EventStore(object):
+    """
+    Events of several measurements, pooled into a single array.
+
+    Attributes
+    ----------
+    values : ndarray (events x channels)
+        The pooled events (column major).
+    channels : list of str
+    keys : list
+        Keys of the measurements, in the order in which they are stored.
+    offsets : ndarray of int64
+        The events of measurement keys[i] are values[offsets[i]:offsets[i + 1]].
+    index : ndarray of int64
+        The index of each event within its measurement.
+    """
+
+    def __init__(self, values, channels, keys, offsets, index, collection=None):
+        self.values = values
+        self.channels = list(channels)
+        self.keys = list(keys)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.index = index
+        self.collection = collection
+        self._positions = {k: i for i, k in enumerate(self.keys)}
+
+    def __repr__(self):
+        return "<EventStore {} events x {} channels from {} measurements>".format(
+            self.values.shape[0], self.values.shape[1], len(self.keys)
+        )
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    @classmethod
+    def from_collection(cls, collection, channels=None, ids=None):
+        """
+        Pool the events of the measurements of a collection.
+        See FCCollection.concat.
+        """
+        keys = list(collection.keys()) if ids is None else list(ids)
+        frames = []
+        for key in keys:
+            data = collection[key].get_data()
+            if channels is None:
+                channels = list(data.columns)
+            frames.append(data[channels])
+
+        counts = [len(f) for f in frames]
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        dtype = np.result_type(*[f.values.dtype for f in frames]) if frames else float
+        values = np.empty((offsets[-1], len(channels or [])), dtype=dtype, order="F")
+        index = np.empty(offsets[-1], dtype=np.int64)
+        for start, stop, frame in zip(offsets[:-1], offsets[1:], frames):
+            values[start:stop] = frame.values
+            index[start:stop] = frame.index
+        return cls(values, channels or [], keys, offsets, index, collection)
+
+    @property
+    def counts(self):
+        """Number of events of each measurement (dict)."""
+        return dict(zip(self.keys, np.diff(self.offsets)))
+
+    @property
+    def codes(self):
+        """For each event, the position in keys of its measurement."""
+        return np.repeat(np.arange(len(self.keys)), np.diff(self.offsets))
+
+    @property
+    def labels(self):
+        """Categorical with the key of the measurement of each event."""
+        return Categorical.from_codes(self.codes, categories=self.keys)
+
+    def _slice(self, key):
+        i = self._positions[key]
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def get_data(self, key):
+        """
+        Return the events of a measurement (a DataFrame that is a view of the pooled events).
+        """
+        s = self._slice(key)
+        return DataFrame(self.values[s], index=self.index[s], columns=self.channels, copy=False)
+
+    def to_frame(self, label="key"):
+        """
+        Return the pooled events as a DataFrame (a view of the pooled events),
+        along with a categorical column holding the key of each event's measurement.
+        If label is None, the column is omitted.
+        """
+        frame = DataFrame(self.values, columns=self.channels, copy=False)
+        if label is not None:
+            frame[label] = self.labels
+        return frame
+
+    def split(self, values):
+        """
+        Split per-event values (e.g., a mask or cluster labels) computed on the
+        pooled events by measurement.
+
+        Parameters
+        ----------
+        values : array-like of length len(self)
+
+        Returns
+        -------
+        dict of key:ndarray (views of values)
+        """
+        values = np.asarray(values)
+        if len(values) != len(self):
+            raise ValueError(
+                "Expected {} values (one per event). Got {}.".format(len(self), len(values))
+            )
+        return {key: values[self._slice(key)] for key in self.keys}
+
+    def to_collection(self, mask=None, ID=None):
+        """
+        Return a collection of the pooled measurements, with data taken from the pooled events.
+
+        Parameters
+        ----------
+        mask : None | boolean array-like of length len(self)
+            If given, only the events for which mask is True are kept.
+            Otherwise, the data of each measurement is a view of the pooled events.
+        ID : hashable | None
+            ID for the resulting collection. If None is passed, the original ID is used.
+
+        Returns
+        -------
+        A collection of the same type as the pooled one.
+        """
+        if self.collection is None:
+            raise ValueError("The collection from which the events were pooled is unknown.")
+        masks = self.split(mask) if mask is not None else {}
+        new = self.collection._copy_without_measurements()
+        for key in list(new.data):
+            if key not in self._positions:
+                del new.data[key]
+        for key in self.keys:
+            measurement = self.collection[key]._copy_without_data()
+            data = self.get_data(key)
+            if mask is not None:
+                data = data[masks[key].astype(bool)]
+            measurement.set_data(data=data)
+            new[key] = measurement
+        if ID is not None:
+            new.ID = ID
+        return new
@@ -0,0 +1,115 @@
+"""
+Block-wise reading of the DATA segment of FCS files.
+
+fcsparser reads the complete DATA segment into memory. For list mode files
+in which all parameters share the same storage type, the DATA segment is a
+plain (events x parameters) matrix, so it can be memory mapped and read
+one block of events at a time.
+"""
+import os
+
+import numpy as np
+from fcsparser import parse as parse_fcs
+from pandas import DataFrame
+
+from .profiling import add_bytes
+
+
+def _data_layout(meta):
+    """
+    Return (offset, dtype, shape, masks) describing the DATA segment,
+    or None if the segment cannot be read as a single matrix.
+
+    meta is the (non-reformatted) TEXT segment returned by fcsparser.
+    """
+    if meta.get("$MODE") != "L":
+        return None
+    byteord = meta["$BYTEORD"].strip()
+    if byteord in ("1,2,3,4", "1,2", "1,2,3,4,5,6,7,8"):
+        endian = "<"
+    elif byteord in ("4,3,2,1", "2,1", "8,7,6,5,4,3,2,1"):
+        endian = ">"
+    else:
+        return None
+    kind = {"F": "f", "D": "f", "I": "u"}.get(meta["$DATATYPE"])
+    if kind is None:
+        return None
+    num_pars = int(meta["$PAR"])
+    bits = set(int(meta["$P{0}B".format(i)]) for i in range(1, num_pars + 1))
+    if len(bits) != 1:
+        return None
+    nbytes = bits.pop() // 8
+    if nbytes not in (1, 2, 4, 8):
+        return None
+    dtype = np.dtype("{}{}{}".format(endian, kind, nbytes))
+
+    offset = meta["__header__"]["data start"]
+    if offset == 0:
+        offset = int(meta["$BEGINDATA"])
+
+    masks = None
+    if kind == "u":
+        masks = np.array(
+            [
+                2 ** np.ceil(np.log2(float(meta["$P{0}R".format(i)]))) - 1
+                for i in range(1, num_pars + 1)
+            ],
+            dtype=dtype.newbyteorder("="),
+        )
+    return offset, dtype, (int(meta["$TOT"]), num_pars), masks
+
+
+def iter_fcs_blocks(path, channel_names, chunksize, dtype="float32", meta=None):
+    """
+    Iterate over the events of an FCS file in blocks.
+
+    Parameters
+    ----------
+    path : str
+        Path of the FCS file.
+    channel_names : list of str
+        Names of the columns of the returned blocks (one per parameter).
+    chunksize : int
+        Number of events in each block.
+    dtype : str | numpy dtype | None
+        Type of the returned data. If None, the native type of the file is used.
+    meta : dict | None
+        The TEXT segment of the file, as returned by fcsparser (not reformatted).
+        If None, it is read from the file.
+
+    Yields
+    ------
+    DataFrame
+        Consecutive blocks of events, indexed by event number.
+    """
+    if meta is None:
+        meta = parse_fcs(path, meta_data_only=True)
+    layout = _data_layout(meta)
+
+    if layout is None:
+        # Fall back to reading everything.
+        _, data = parse_fcs(path, dtype=dtype)
+        add_bytes(os.path.getsize(path))
+        data.columns = list(channel_names)
+        for start in range(0, data.shape[0], chunksize):
+            yield data.iloc[start : start + chunksize]
+        return
+
+    offset, file_dtype, shape, masks = layout
+    if shape[0] == 0:
+        return
+    matrix = np.memmap(path, dtype=file_dtype, mode="r", offset=offset, shape=shape)
+    try:
+        for start in range(0, shape[0], chunksize):
+            block = np.asarray(matrix[start : start + chunksize]).astype(
+                file_dtype.newbyteorder("=")
+            )
+            add_bytes(block.nbytes)
+            if masks is not None:
+                block &= masks
+            if dtype is not None:
+                block = block.astype(dtype, copy=False)
+            index = np.arange(start, start + block.shape[0])
+            yield DataFrame(block, columns=list(channel_names), index=index)
+    finally:
+        del matrix
@@ -11,12 +11,13 @@ Gates:
     IntervalGate
     QuadGate
     PolyGate
+    RectangleGate
+    EllipseGate
 """
 import numpy
-import pylab as pl
-from matplotlib.path import Path
 
 from .common_doc import doc_replacer
+from .profiling import stage
 from .utils import to_list
 
 doc_replacer.update(
@@ -107,6 +108,7 @@ class Gate(_ComposableMixin):
     def __str__(self):
         return self.__repr__()
 
+    @stage("gate")
     def __call__(self, dataframe, region=None):
         """
         Filters the dataframe, keeping only events that pass the gate.
@@ -221,6 +223,8 @@ class ThresholdGate(Gate):
         {_gate_plot_doc}
         """
         if ax == None:
+            import pylab as pl
+
             ax = pl.gca()
 
         if ax_channels is not None:
@@ -274,6 +278,8 @@ class IntervalGate(Gate):
         {_gate_plot_doc}
         """
         if ax == None:
+            import pylab as pl
+
             ax = pl.gca()
 
         if ax_channels is not None:
@@ -340,6 +346,8 @@ class QuadGate(Gate):
         {_gate_plot_doc}
         """
         if ax == None:
+            import pylab as pl
+
             ax = pl.gca()
 
         kwargs.setdefault("color", "black")
@@ -384,6 +392,8 @@ class PolyGate(Gate):
         ----------
         dataframe : DataFrame
         """
+        from matplotlib.path import Path
+
         path = Path(self.vert)
         idx = path.contains_points(dataframe.filter(self.channels))
 
@@ -398,6 +408,8 @@ class PolyGate(Gate):
         {_gate_plot_doc}
         """
         if ax == None:
+            import pylab as pl
+
             ax = pl.gca()
 
         if ax_channels is not None:
@@ -408,10 +420,217 @@ class PolyGate(Gate):
             vert = self.vert
         kwargs.setdefault("fill", False)
         kwargs.setdefault("color", "black")
-        poly = pl.Polygon(vert, *args, **kwargs)
+        from matplotlib.patches import Polygon
+
+        poly = Polygon(vert, *args, **kwargs)
         return ax.add_artist(poly)
 
 
+class RectangleGate(Gate):
+    @doc_replacer
+    def __init__(self, vert, channels, region="in", name=None):
+        """
+        Passes all events that are either inside or outside the rectangle.
+
+        Cheaper than the equivalent PolyGate: events are tested with comparisons only.
+
+        Parameters
+        ----------
+        vert : list of 2-tuples
+            [(x1, y1), (x2, y2)]
+            Two opposite corners of the rectangle.
+        {_gate_pars_2_channels}
+        region : ['in', 'out']
+            If 'in', the gate only passes through data that lies inside the rectangle.
+        {_gate_pars_name}
+        """
+        self._region_options = ("in", "out")
+        super(RectangleGate, self).__init__(vert, channels, region, name)
+
+    def validate_input(self):
+        """Raise appropriate exception if gate was defined incorrectly."""
+        if len(self.vert) != 2 or any(len(v) != len(self.channels) for v in self.vert):
+            raise ValueError(
+                "vert must hold two corners with a coordinate for each of the channels "
+                "{}. Got {}.".format(self.channels, self.vert)
+            )
+
+    @property
+    def bounds(self):
+        """The (lower, upper) corners of the rectangle."""
+        vert = numpy.asarray(self.vert, dtype=float)
+        return vert.min(axis=0), vert.max(axis=0)
+
+    def _identify(self, dataframe):
+        """
+        Returns a boolean array which is True for the events that pass the gate.
+
+        Parameters
+        ----------
+        dataframe : DataFrame
+        """
+        idx = numpy.ones(len(dataframe), dtype=bool)
+        passed = numpy.empty(len(dataframe), dtype=bool)
+        for channel, lower, upper in zip(self.channels, *self.bounds):
+            values = dataframe[channel].values
+            numpy.greater_equal(values, lower, out=passed)
+            idx &= passed
+            numpy.less_equal(values, upper, out=passed)
+            idx &= passed
+
+        if self.region == "out":
+            idx = ~idx
+
+        return idx
+
+    @doc_replacer
+    def plot(self, flip=False, ax_channels=None, ax=None, *args, **kwargs):
+        """
+        {_gate_plot_doc}
+        """
+        if ax == None:
+            import pylab as pl
+
+            ax = pl.gca()
+
+        if ax_channels is not None:
+            flip = self._find_orientation(ax_channels)
+        lower, upper = self.bounds
+        if flip:
+            lower, upper = lower[::-1], upper[::-1]
+        kwargs.setdefault("fill", False)
+        kwargs.setdefault("color", "black")
+        from matplotlib.patches import Rectangle
+
+        width, height = upper - lower
+        rectangle = Rectangle(lower, width, height, *args, **kwargs)
+        return ax.add_artist(rectangle)
+
+
+class EllipseGate(Gate):
+    @doc_replacer
+    def __init__(
+        self, vert, channels, region="in", name=None, covariance=None, axes=None, angle=0.0
+    ):
+        """
+        Passes all events that are either inside or outside the ellipse.
+
+        The ellipse is given either by a covariance matrix C (an event x passes if
+        (x - center)^T C^-1 (x - center) <= 1), or by its semi-axes and angle.
+        Cheaper than a PolyGate approximating the ellipse: events are tested
+        by evaluating the quadratic form.
+
+        Parameters
+        ----------
+        vert : 2-tuple
+            (x, y), the center of the ellipse.
+        {_gate_pars_2_channels}
+        region : ['in', 'out']
+            If 'in', the gate only passes through data that lies inside the ellipse.
+        {_gate_pars_name}
+        covariance : 2 x 2 array | None
+            Symmetric positive definite matrix. E.g., for a gaussian population,
+            its covariance matrix multiplied by 5.991 (the 95% quantile of the chi-squared
+            distribution with 2 degrees of freedom) gives its 95% region.
+        axes : 2-tuple | None
+            Lengths of the semi-axes of the ellipse (used if covariance is None).
+            Before rotation, the first one is along the first channel.
+        angle : float
+            Counter-clockwise rotation of the ellipse from the first channel, in degrees
+            (used if covariance is None).
+        """
+        self._region_options = ("in", "out")
+        if covariance is None:
+            if axes is None:
+                raise ValueError("Either covariance or axes must be specified.")
+            theta = numpy.radians(angle)
+            rotation = numpy.array(
+                [[numpy.cos(theta), -numpy.sin(theta)], [numpy.sin(theta), numpy.cos(theta)]]
+            )
+            covariance = rotation.dot(numpy.diag(numpy.square(axes))).dot(rotation.T)
+        self.covariance = numpy.asarray(covariance, dtype=float)
+        super(EllipseGate, self).__init__(vert, channels, region, name)
+
+    def validate_input(self):
+        """Raise appropriate exception if gate was defined incorrectly."""
+        if len(self.channels) != 2 or len(self.vert) != 2:
+            raise ValueError("An ellipse is defined on two channels, by a center (x, y).")
+        covariance = self.covariance
+        if (
+            covariance.shape != (2, 2)
+            or not numpy.allclose(covariance, covariance.T)
+            or numpy.linalg.eigvalsh(covariance).min() <= 0
+        ):
+            raise ValueError(
+                "covariance must be a symmetric positive definite 2 x 2 matrix. "
+                "Got {}.".format(covariance.tolist())
+            )
+
+    @property
+    def axes_angle(self):
+        """
+        The (semi-axes, angle) of the ellipse: the lengths of the semi-axes (longest
+        first) and the angle of the first one from the first channel, in degrees
+        (in [-90, 90)).
+        """
+        variances, vectors = numpy.linalg.eigh(self.covariance)
+        axes = numpy.sqrt(variances[::-1])
+        angle = numpy.degrees(numpy.arctan2(vectors[1, -1], vectors[0, -1]))
+        # The sign of the eigenvector is arbitrary: return an angle in [-90, 90)
+        return tuple(axes), (angle + 90) % 180 - 90
+
+    def _identify(self, dataframe):
+        """
+        Returns a boolean array which is True for the events that pass the gate.
+
+        Parameters
+        ----------
+        dataframe : DataFrame
+        """
+        (a, b), (_, c) = numpy.linalg.inv(self.covariance)
+        dx = dataframe[self.channels[0]].values - self.vert[0]
+        dy = dataframe[self.channels[1]].values - self.vert[1]
+        # a dx^2 + 2 b dx dy + c dy^2, computed in place
+        distance = dx * dx
+        distance *= a
+        dx *= dy
+        dx *= 2 * b
+        distance += dx
+        dy *= dy
+        dy *= c
+        distance += dy
+        idx = distance <= 1
+
+        if self.region == "out":
+            idx = ~idx
+
+        return idx
+
+    @doc_replacer
+    def plot(self, flip=False, ax_channels=None, ax=None, *args, **kwargs):
+        """
+        {_gate_plot_doc}
+        """
+        if ax == None:
+            import pylab as pl
+
+            ax = pl.gca()
+
+        if ax_channels is not None:
+            flip = self._find_orientation(ax_channels)
+        center = tuple(self.vert)
+        (width, height), angle = self.axes_angle
+        if flip:
+            center = center[::-1]
+            angle = 90 - angle
+        kwargs.setdefault("fill", False)
+        kwargs.setdefault("color", "black")
+        from matplotlib.patches import Ellipse
+
+        ellipse = Ellipse(center, 2 * width, 2 * height, *args, angle=angle, **kwargs)
+        return ax.add_artist(ellipse)
+
+
 class CompositeGate(_ComposableMixin):
     """
     Defines a composite gate that is generated by the logical addition of one or more gates.
@@ -507,6 +726,7 @@ class CompositeGate(_ComposableMixin):
 
         return function(*idx)
 
+    @stage("gate")
     def __call__(self, dataframe):
         idx = self._identify(dataframe)
         return dataframe[idx]
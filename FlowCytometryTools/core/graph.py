@@ -14,6 +14,7 @@ import warnings
 from matplotlib import transforms
 from numpy import arange
 
+from . import histograms
 from .common_doc import doc_replacer
 from .utils import to_list
 
@@ -83,9 +84,18 @@ def plotFCM(
         if len(x) == 0:
             # Don't draw a plot if there's no data
             return None
+        if kind == "scatter" and kwargs.pop("rasterize", False):
+            kind = "density_scatter"
         if kind == "scatter":
             kwargs.setdefault("edgecolor", "none")
             plot_output = ax.scatter(x, y, **kwargs)
+        elif kind == "density_scatter":
+            color_by = kwargs.pop("color_by", None)
+            c = data[color_by].values if color_by is not None else None
+            plot_output = density_scatter(x, y, c=c, ax=ax, **kwargs)
+
+            if colorbar:
+                pl.colorbar(plot_output, ax=ax)
         elif kind == "histogram":
             kwargs.setdefault("bins", 200)  # Do not move above
             kwargs.setdefault("cmin", 1)
@@ -97,7 +107,9 @@ def plotFCM(
             if colorbar:
                 pl.colorbar(mappable, ax=ax)
         else:
-            raise ValueError("Not a valid plot type. Must be 'scatter', 'histogram'")
+            raise ValueError(
+                "Not a valid plot type. Must be 'scatter', 'density_scatter', 'histogram'"
+            )
     else:
         raise ValueError(
             'Received an unexpected number of channels: "{}"'.format(channel_names)
@@ -113,6 +125,154 @@ def plotFCM(
     return plot_output
 
 
+def density_scatter(
+    x, y, c=None, ax=None, resolution=None, color=None, cmap=None, norm=None, **kwargs
+):
+    """
+    Draw a scatter plot of many points as a single image.
+
+    The points are aggregated onto a grid with (roughly) one cell per pixel
+    of the axis, and the grid is drawn with imshow. Drawing time is
+    therefore roughly independent of the number of points.
+
+    Parameters
+    ----------
+    x, y : ndarray
+        Coordinates of the points.
+    c : None | ndarray
+        If given, each pixel is colored by the mean of c over the points
+        falling in it. Otherwise pixels are colored by the number of points (density).
+    ax : None | axis
+        Axis to draw on. If None, uses the current axis.
+    resolution : None | int | (int, int)
+        Number of cells along x and y. If None, the pixel size of the axis is used.
+    color : None | color
+        If given (and c is None), all occupied pixels are drawn in this color
+        (like a single colored scatter plot).
+    cmap : colormap
+    norm : Normalize
+        Defaults to a log scale for densities, and a linear scale for means of c.
+    kwargs : dict
+        Passed to imshow. Keyword arguments specific to scatter (e.g., s, marker, edgecolor)
+        are ignored.
+
+    Returns
+    -------
+    AxesImage
+    """
+    if ax is None:
+        ax = pl.gca()
+    for key in ("s", "marker", "edgecolor", "edgecolors", "linewidths"):
+        kwargs.pop(key, None)
+
+    if resolution is None:
+        bbox = ax.get_window_extent()
+        resolution = (max(int(bbox.width), 1), max(int(bbox.height), 1))
+    elif numpy.isscalar(resolution):
+        resolution = (int(resolution), int(resolution))
+
+    edges = [
+        histograms.range_edges(x, resolution[0]),
+        histograms.range_edges(y, resolution[1]),
+    ]
+    values = numpy.column_stack((x, y))
+    counts = histograms.histogram(values, edges)
+    empty = counts == 0
+
+    if c is not None:
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            image = histograms.histogram(values, edges, weights=c) / counts
+        if norm is None:
+            norm = matplotlib.colors.Normalize()
+    elif color is not None:
+        image = numpy.ones(counts.shape)
+        cmap = matplotlib.colors.ListedColormap([color])
+    else:
+        image = counts.astype(float)
+        if cmap is None:
+            cmap = pl.cm.copper
+        if norm is None:
+            norm = matplotlib.colors.LogNorm()
+
+    kwargs.setdefault("interpolation", "nearest")
+    kwargs.setdefault("aspect", "auto")
+    return ax.imshow(
+        numpy.ma.masked_array(image, empty).T,
+        origin="lower",
+        extent=(edges[0][0], edges[0][-1], edges[1][0], edges[1][-1]),
+        cmap=cmap,
+        norm=norm,
+        **kwargs
+    )
+
+
+@doc_replacer
+def plot_histogram_counts(counts, edges, ax=None, colorbar=False, **kwargs):
+    """
+    Draw precomputed histogram counts (see core.histograms).
+
+    1d histograms are drawn as a single step patch, and 2d histograms
+    as a single mesh, rather than one patch per bin.
+
+    Parameters
+    ----------
+    counts : ndarray
+        1d or 2d array of counts.
+    edges : list of ndarray
+        Bin edges for each dimension.
+    {common_plot_ax}
+    colorbar : [False | True]
+        Adds a colorbar (2d histograms only).
+    kwargs : dict
+        For 1d histograms, keyword arguments similar to those of matplotlib's hist
+        (e.g., color, alpha, histtype, density).
+        For 2d histograms, keyword arguments similar to those of matplotlib's hist2d
+        (e.g., cmap, norm, cmin, cmax, density).
+
+    Returns
+    -------
+    The created artist.
+    """
+    if ax is None:
+        ax = pl.gca()
+
+    counts = numpy.asarray(counts, dtype=float)
+    density = kwargs.pop("density", kwargs.pop("normed", False))
+    kwargs.pop("bins", None)
+
+    if density and counts.sum() > 0:
+        widths = numpy.ix_(*[numpy.diff(e) for e in edges])
+        volume = widths[0]
+        for w in widths[1:]:
+            volume = volume * w
+        counts = counts / counts.sum() / volume
+
+    if counts.ndim == 1:
+        kwargs.setdefault("color", "gray")
+        histtype = kwargs.pop("histtype", "stepfilled")
+        kwargs.setdefault("fill", histtype in ("bar", "barstacked", "stepfilled"))
+        if hasattr(ax, "stairs"):
+            return ax.stairs(counts, edges[0], **kwargs)
+        # Older versions of matplotlib: draw a one-value-per-bin histogram
+        kwargs.pop("fill")
+        return ax.hist(edges[0][:-1], bins=edges[0], weights=counts, histtype=histtype, **kwargs)
+
+    kwargs.setdefault("cmap", pl.cm.copper)
+    kwargs.setdefault("norm", matplotlib.colors.LogNorm())
+    cmin = kwargs.pop("cmin", 1)
+    cmax = kwargs.pop("cmax", None)
+    mask = numpy.zeros(counts.shape, dtype=bool)
+    if cmin is not None:
+        mask |= counts < cmin
+    if cmax is not None:
+        mask |= counts > cmax
+    counts = numpy.ma.masked_array(counts, mask)
+    mappable = ax.pcolormesh(edges[0], edges[1], counts.T, **kwargs)
+    if colorbar:
+        pl.colorbar(mappable, ax=ax)
+    return mappable
+
+
 @doc_replacer
 def create_grid_layout(
     rowNum=8,
@@ -193,9 +353,7 @@ def create_grid_layout(
     )  # This could potentially confuse a user
 
     plt.subplots_adjust(wspace=wspace, hspace=hspace)
-    _, ax_subplots = plt.subplots(
-        rowNum, colNum, squeeze=False, subplot_kw=subplot_kw, num=fig.number
-    )
+    ax_subplots = fig.subplots(rowNum, colNum, squeeze=False, subplot_kw=subplot_kw)
 
     # configure defaults for appearance of row and col labels
     row_labels_kwargs.setdefault("horizontalalignment", "right")
@@ -339,6 +497,13 @@ def scale_subplots(subplots=None, xlim="auto", ylim="auto"):
         'auto' : sets the limits according to the most
         extreme values of data encountered.
     ylim : None | 'auto' | (ymin, ymax)
+
+    Notes
+    -----
+    'auto' limits are taken from the data limits of the drawn artists, since
+    the subplots may have been drawn by any function. Callers that know the
+    plotted channels should pass explicit limits instead (FCOrderedCollection.plot
+    computes them from the stored channel summaries).
     """
     auto_axis = ""
     if xlim == "auto":
@@ -0,0 +1,264 @@
+"""
+Histogram engine for plotting collections of measurements.
+
+Histograms of all the measurements in a collection are computed against
+shared bin edges, using integer bin indexing and numpy.bincount.
+The measurements are processed in parallel (numpy releases the GIL
+in the heavy lifting), and the resulting counts are cached on each measurement,
+so redrawing a plate doesn't recompute them.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .utils import n_threads, parallel_map
+
+#: Number of histograms cached per measurement
+_CACHE_SIZE = 8
+
+
+def bin_index(values, edges):
+    """
+    Return the bin index of each value.
+
+    Values outside [edges[0], edges[-1]] get index -1.
+    As in numpy.histogram, the last bin includes its right edge.
+
+    Parameters
+    ----------
+    values : ndarray
+    edges : ndarray
+        Monotonically increasing bin edges.
+
+    Returns
+    -------
+    ndarray of intp
+    """
+    values = np.asarray(values)
+    edges = np.asarray(edges, dtype=float)
+    nbins = len(edges) - 1
+    lo, hi = edges[0], edges[-1]
+    widths = np.diff(edges)
+    if np.allclose(widths, widths[0]):
+        # Uniform bins: compute the index directly
+        scaled = (values - lo) * (nbins / (hi - lo))
+        with np.errstate(invalid="ignore"):
+            idx = np.floor(scaled).astype(np.intp)
+        # Rounding may put values just below hi in bin nbins.
+        np.minimum(idx, nbins - 1, out=idx)
+    else:
+        idx = np.searchsorted(edges, values, side="right") - 1
+    idx[values == hi] = nbins - 1
+    idx[(values < lo) | (values > hi) | np.isnan(values)] = -1
+    return idx
+
+
+def histogram(values, edges, weights=None):
+    """
+    Histogram of values along each dimension's edges.
+
+    Parameters
+    ----------
+    values : ndarray (events x dimensions), with 1 or 2 dimensions
+    edges : list of ndarray
+        Bin edges for each dimension.
+    weights : None | ndarray
+        If given, the weights of the events in each bin are summed
+        instead of counting the events.
+
+    Returns
+    -------
+    ndarray of int64 counts (float sums if weights are given)
+    with shape (len(edges[0]) - 1, ...).
+    """
+    values = np.asarray(values)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+    shape = tuple(len(e) - 1 for e in edges)
+    flat = np.zeros(values.shape[0], dtype=np.intp)
+    valid = np.ones(values.shape[0], dtype=bool)
+    for dim, e in enumerate(edges):
+        idx = bin_index(values[:, dim], e)
+        valid &= idx >= 0
+        flat = flat * shape[dim] + idx
+    if weights is not None:
+        weights = np.asarray(weights)[valid]
+    counts = np.bincount(flat[valid], weights=weights, minlength=int(np.prod(shape)))
+    return counts.reshape(shape)
+
+
+def _edges_key(edges):
+    return tuple(np.asarray(e, dtype=float).tobytes() for e in edges)
+
+
+def measurement_histogram(measurement, channels, edges):
+    """
+    Histogram of the data of a measurement in the given channels.
+
+    The data is read block by block, and the result is cached on the
+    measurement.
+
+    Parameters
+    ----------
+    measurement : FCMeasurement
+    channels : list of str
+        One or two channels.
+    edges : list of ndarray
+        Bin edges for each channel.
+
+    Returns
+    -------
+    ndarray of counts
+    """
+    queue_key = measurement._queue_key() if measurement.queue else None
+    key = None
+    if not (measurement.queue and queue_key is None):
+        key = (tuple(channels), _edges_key(edges), queue_key)
+        cache = measurement._histogram_cache
+        if cache is not None and key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+    counts = np.zeros(tuple(len(e) - 1 for e in edges), dtype=np.int64)
+    for block in measurement.iter_data(channels=channels):
+        counts += histogram(block.values, edges)
+
+    if key is not None:
+        if measurement._histogram_cache is None:
+            measurement._histogram_cache = OrderedDict()
+        cache = measurement._histogram_cache
+        cache[key] = counts
+        while len(cache) > _CACHE_SIZE:
+            cache.popitem(last=False)
+    return counts
+
+
+def pairwise_histograms(measurement, channels, edges, n_jobs=None):
+    """
+    Compute the 1d histogram of each channel and the 2d histogram of
+    each pair of channels in a single pass over the data.
+
+    The bin index of each channel is computed once per block and shared by
+    all the histograms involving that channel. The histograms are computed
+    in parallel across channels and channel pairs.
+
+    Parameters
+    ----------
+    measurement : FCMeasurement
+    channels : list of str
+    edges : list of ndarray
+        Bin edges for each channel.
+    n_jobs : int | None
+        Number of threads.
+
+    Returns
+    -------
+    dict with the 1d counts of channel i under key i, and the 2d counts
+    of channels i < j (with channel i along the first dimension) under key (i, j).
+    """
+    n = len(channels)
+    nbins = [len(e) - 1 for e in edges]
+    keys = list(range(n)) + [(i, j) for i in range(n) for j in range(i + 1, n)]
+    counts = {
+        k: np.zeros(nbins[k] if isinstance(k, int) else (nbins[k[0]], nbins[k[1]]), dtype=np.int64)
+        for k in keys
+    }
+    n_jobs = min(n_threads(n_jobs), len(keys))
+    executor = ThreadPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    map_ = executor.map if executor is not None else map
+
+    try:
+        for block in measurement.iter_data(channels=channels):
+            values = block.values
+            idx = list(map_(lambda i: bin_index(values[:, i], edges[i]), range(n)))
+
+            def count(key):
+                if isinstance(key, int):
+                    i = idx[key]
+                    return np.bincount(i[i >= 0], minlength=nbins[key])
+                i, j = idx[key[0]], idx[key[1]]
+                valid = (i >= 0) & (j >= 0)
+                flat = i[valid] * nbins[key[1]] + j[valid]
+                size = nbins[key[0]] * nbins[key[1]]
+                return np.bincount(flat, minlength=size).reshape(counts[key].shape)
+
+            for key, c in zip(keys, map_(count, keys)):
+                counts[key] += c
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return counts
+
+
+def data_range(measurement, channels):
+    """
+    Return the minimum and maximum of each channel (arrays of length len(channels)).
+    NaNs are returned for empty data.
+
+    Uses the statistics stored by FCMeasurement.channel_summary.
+    """
+    summary = measurement.channel_summary(channels)
+    return summary.loc["min"].values, summary.loc["max"].values
+
+
+def range_edges(values, nbins):
+    """
+    Return nbins + 1 equally spaced edges spanning the (finite) values.
+    Single valued data gets a unit wide range around the value.
+    """
+    values = np.asarray(values, dtype=float)
+    finite = values[np.isfinite(values)]
+    if finite.size:
+        l, h = finite.min(), finite.max()
+    else:
+        l, h = 0.0, 1.0
+    if not l < h:
+        l, h = l - 0.5, h + 0.5
+    return np.linspace(l, h, nbins + 1)
+
+
+def shared_edges(measurements, channels, nbins, n_jobs=None):
+    """
+    Compute bin edges spanning the data of all the measurements.
+
+    Parameters
+    ----------
+    measurements : iterable of FCMeasurement
+    channels : list of str
+    nbins : int
+        Number of bins in each channel (nbins + 1 edges, as in range_edges).
+    n_jobs : int | None
+        Number of threads.
+
+    Returns
+    -------
+    list of ndarray (one per channel)
+    """
+    ranges = parallel_map(lambda m: data_range(m, channels), measurements, n_jobs)
+    lo = np.nanmin([r[0] for r in ranges], axis=0)
+    hi = np.nanmax([r[1] for r in ranges], axis=0)
+    return [range_edges([l, h], nbins) for l, h in zip(lo, hi)]
+
+
+def collection_histograms(measurements, channels, edges, n_jobs=None):
+    """
+    Compute the histograms of several measurements against shared bin edges.
+
+    Parameters
+    ----------
+    measurements : dict-like of key:FCMeasurement
+    channels : list of str
+    edges : list of ndarray
+    n_jobs : int | None
+        Number of threads.
+
+    Returns
+    -------
+    dict of key:counts
+    """
+    keys = list(measurements.keys())
+    counts = parallel_map(
+        lambda k: measurement_histogram(measurements[k], channels, edges), keys, n_jobs
+    )
+    return dict(zip(keys, counts))
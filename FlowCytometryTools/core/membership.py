@@ -0,0 +1,157 @@
+"""
+Membership of the events of a measurement in many gates.
+
+The membership is a matrix of N events x G gates, in which each bit tells
+whether an event passes a gate. It is stored packed (see numpy.packbits) along
+the events, one row of N / 8 bytes per gate, so counts and Boolean combinations
+of gates are computed with bitwise operations and popcounts, without unpacking
+the matrix (intersections of all pairs of gates unpack it block by block).
+"""
+import numpy as np
+from pandas import DataFrame, Series
+
+from .gates import CompositeGate
+
+#: Number of set bits of each byte value.
+_popcount_table = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+#: Number of bytes of bits (per gate) unpacked together by Membership.intersections.
+_BLOCK_BYTES = 2**11
+
+
+def popcount(bits):
+    """Number of set bits in an array of uint8."""
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return int(np.bitwise_count(bits).sum(dtype=np.int64))
+    return int(_popcount_table[bits].sum(dtype=np.int64))
+
+
+def pack(mask):
+    """Pack a boolean mask of events into bits."""
+    return np.packbits(np.asarray(mask, dtype=bool))
+
+
+class Membership(object):
+    """
+    Matrix of N events x G gates, telling which events pass which gates (stored packed).
+
+    Gates are referred to by name, or by the gates themselves. Combinations of the
+    gates (e.g., gate1 & ~gate2) are evaluated from the bits of the gates.
+
+    Attributes
+    ----------
+    names : list of str
+        Names of the gates.
+    bits : ndarray of uint8
+        G x ceil(N / 8) array: the packed membership of the events in each gate.
+    num_events : int
+    """
+
+    def __init__(self, names, bits, num_events):
+        """
+        Parameters
+        ----------
+        names : list of str
+        bits : ndarray of uint8 (G x ceil(N / 8))
+        num_events : int
+        """
+        self.names = list(names)
+        self.bits = np.asarray(bits, dtype=np.uint8).reshape(len(self.names), -1)
+        self.num_events = int(num_events)
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("The names of the gates must be unique. Got {}.".format(self.names))
+        if self.bits.shape[1] != -(-self.num_events // 8):
+            raise ValueError(
+                "bits must hold {} bytes per gate. Got {}.".format(
+                    -(-self.num_events // 8), self.bits.shape[1]
+                )
+            )
+
+    @classmethod
+    def from_masks(cls, names, masks):
+        """Make a Membership from a boolean mask of the events for each gate."""
+        masks = [np.asarray(mask, dtype=bool) for mask in masks]
+        num_events = len(masks[0]) if masks else 0
+        bits = np.empty((len(masks), -(-num_events // 8)), dtype=np.uint8)
+        for row, mask in zip(bits, masks):
+            row[:] = pack(mask)
+        return cls(names, bits, num_events)
+
+    def __repr__(self):
+        return "<Membership {} events x {} gates ({} bytes)>".format(
+            self.num_events, len(self.names), self.nbytes
+        )
+
+    @property
+    def shape(self):
+        """(number of events, number of gates)."""
+        return self.num_events, len(self.names)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def _invert(self, bits):
+        bits = ~bits
+        if self.num_events % 8:
+            # Clear the padding bits of the last byte
+            bits[-1] &= (0xFF << (8 - self.num_events % 8)) & 0xFF
+        return bits
+
+    def packed(self, query):
+        """
+        Return the packed membership of the events in query.
+
+        Parameters
+        ----------
+        query : str | Gate | CompositeGate
+            The name of a gate, a gate, or a combination of gates
+            (with &, |, ^ and ~, see CompositeGate).
+        """
+        if isinstance(query, CompositeGate):
+            bits = [self.packed(gate) for gate in query.gates]
+            if query.how == "and":
+                return bits[0] & bits[1]
+            elif query.how == "or":
+                return bits[0] | bits[1]
+            elif query.how == "xor":
+                return bits[0] ^ bits[1]
+            elif query.how == "invert":
+                return self._invert(bits[0])
+            raise ValueError("Unsupported value for how: {!r}.".format(query.how))
+        name = getattr(query, "name", query)
+        try:
+            return self.bits[self.names.index(name)]
+        except ValueError:
+            raise KeyError("No gate named {!r}. Gates: {}.".format(name, self.names))
+
+    def mask(self, query):
+        """Return a boolean array which is True for the events in query (see packed)."""
+        return np.unpackbits(self.packed(query), count=self.num_events).astype(bool)
+
+    def count(self, query):
+        """Return the number of events in query (see packed)."""
+        return popcount(self.packed(query))
+
+    def counts(self):
+        """Return a Series with the number of events passing each gate."""
+        return Series([popcount(row) for row in self.bits], index=self.names, dtype=np.int64)
+
+    def intersections(self):
+        """
+        Return a G x G DataFrame with the number of events passing each pair of gates
+        (the diagonal holds the counts of the gates).
+        """
+        # Computed as the product of the unpacked matrix with its transpose, block by
+        # block of events (the counts of a block are exact in float32).
+        counts = np.zeros((len(self.names), len(self.names)), dtype=np.int64)
+        for start in range(0, self.bits.shape[1], _BLOCK_BYTES):
+            block = np.unpackbits(self.bits[:, start : start + _BLOCK_BYTES], axis=1)
+            block = block.astype(np.float32)
+            counts += np.dot(block, block.T).astype(np.int64)
+        return DataFrame(counts, index=self.names, columns=self.names)
+
+    def to_frame(self, index=None):
+        """Return the unpacked matrix as a boolean DataFrame (events x gates)."""
+        values = np.unpackbits(self.bits, axis=1, count=self.num_events).T.astype(bool)
+        return DataFrame(values, index=index, columns=self.names)
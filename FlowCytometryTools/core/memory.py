@@ -0,0 +1,196 @@
+"""
+Limiting the memory used by the event data of a collection.
+
+A MemoryBudget keeps track of the measurements of a collection that hold data
+in memory, in order of last use. When their total size exceeds the budget,
+the least recently used measurements are (optionally) compressed, and then
+those whose data can be re-read (from their datafile, replaying the actions
+that were applied to it) are evicted: their data is dropped, and is
+transparently read again the next time it is needed.
+"""
+import re
+import threading
+import weakref
+from collections import OrderedDict
+
+_units = {"": 1, "B": 1, "KB": 2**10, "MB": 2**20, "GB": 2**30, "TB": 2**40}
+
+
+def parse_size(size):
+    """
+    Return a number of bytes given an int or a string such as '512MB' or '2 GB'
+    (units are powers of 1024).
+    """
+    if isinstance(size, str):
+        match = re.match(r"^\s*([\d.]+)\s*([KMGT]?B?)\s*$", size.upper())
+        if match is None:
+            raise ValueError("Cannot parse size {!r}.".format(size))
+        return int(float(match.group(1)) * _units[match.group(2)])
+    return int(size)
+
+
+def frame_nbytes(frame):
+    """Number of bytes held by a DataFrame (its values and index)."""
+    if frame is None:
+        return 0
+    try:
+        return int(frame.memory_usage(index=True).sum())
+    except AttributeError:
+        return 0
+
+
+class MemoryBudget(object):
+    """
+    Tracks the memory used by the data of measurements, compressing (optionally)
+    and then evicting the least recently used ones when the total exceeds max_bytes.
+
+    The budget holds weak references only. It is shared by copies of the
+    collection it belongs to (and by the collections derived from it), and it
+    is not pickled (an unpickled collection gets a new, empty budget).
+    """
+
+    #: Names of the counters (see stats).
+    _counters = ("hits", "compressed_hits", "misses", "compressions", "evictions")
+
+    def __init__(self, max_bytes, compression=None, level=None):
+        """
+        Parameters
+        ----------
+        max_bytes : int | str
+            E.g., 2**30 or '1GB'.
+        compression : None | 'zlib' | 'lzma'
+            If given, the data of the least recently used measurements is first
+            held compressed (see core.compression), each channel being decompressed
+            on its own when accessed. Measurements are only evicted if the budget is
+            still exceeded once all but the most recently used one are compressed.
+            'zlib' is faster, 'lzma' compresses more.
+        level : int | None
+            Compression level of the codec. If None, the fastest level is used.
+        """
+        if compression is not None and compression not in ("zlib", "lzma"):
+            raise ValueError(
+                "compression must be None, 'zlib' or 'lzma'. Got {!r}.".format(compression)
+            )
+        self.max_bytes = parse_size(max_bytes)
+        self.compression = compression
+        self.level = level
+        self._usage = OrderedDict()  # id(measurement) -> (weakref, nbytes)
+        self._lock = threading.RLock()
+        self.reset_stats()
+
+    def __repr__(self):
+        return "MemoryBudget({} of {} bytes used)".format(self.used, self.max_bytes)
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (MemoryBudget, (self.max_bytes, self.compression, self.level))
+
+    @property
+    def used(self):
+        """Total number of bytes held by the tracked measurements."""
+        with self._lock:
+            return sum(nbytes for _, nbytes in self._usage.values())
+
+    def count(self, name):
+        """Increment the counter name (see stats)."""
+        with self._lock:
+            self._stats[name] += 1
+
+    def reset_stats(self):
+        """Set all the counters to 0."""
+        with self._lock:
+            self._stats = dict.fromkeys(self._counters, 0)
+
+    def stats(self):
+        """
+        Return a dict with the counters of data accesses:
+
+        - hits: data that was in memory.
+        - compressed_hits: data (or channels) that was decompressed.
+        - misses: data that was read again from the datafile.
+        - compressions, evictions: measurements that were compressed (evicted).
+
+        And with the number of bytes held by the tracked measurements:
+        used, compressed (the part held compressed), raw (the size of the compressed
+        data once decompressed) and compression_ratio (raw / compressed).
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            raw = compressed = 0
+            for ref, _ in self._usage.values():
+                measurement = ref()
+                frame = None if measurement is None else measurement._compressed
+                if frame is not None:
+                    raw += frame.raw_nbytes
+                    compressed += frame.nbytes
+            stats["used"] = self.used
+        stats["compressed"] = compressed
+        stats["raw"] = raw
+        stats["compression_ratio"] = raw / float(compressed) if compressed else None
+        return stats
+
+    def _forget(self, key):
+        with self._lock:
+            self._usage.pop(key, None)
+
+    def touch(self, measurement):
+        """
+        Record that the data of measurement was used (or set), and compress or
+        evict other measurements if the budget is exceeded.
+        """
+        key = id(measurement)
+        nbytes = measurement.memory_usage()
+        with self._lock:
+            self._usage.pop(key, None)
+            if nbytes:
+                ref = weakref.ref(measurement, lambda _, key=key: self._forget(key))
+                self._usage[key] = (ref, nbytes)
+            self.enforce(keep=measurement)
+
+    def _shrink(self, total, keep, reduce):
+        """
+        Apply reduce to the least recently used measurements (except keep)
+        until total <= max_bytes. Returns the new total.
+        """
+        for key, (ref, nbytes) in list(self._usage.items()):
+            if total <= self.max_bytes:
+                break
+            measurement = ref()
+            if measurement is None:
+                del self._usage[key]
+                total -= nbytes
+                continue
+            if measurement is keep or not reduce(measurement):
+                continue
+            remaining = measurement.memory_usage()
+            if remaining:
+                self._usage[key] = (ref, remaining)
+            else:
+                del self._usage[key]
+            total -= nbytes - remaining
+        return total
+
+    def _compress(self, measurement):
+        if measurement._compress(self.compression, self.level) is None:
+            return False
+        self._stats["compressions"] += 1
+        return True
+
+    def _evict(self, measurement):
+        # Data that cannot be re-read stays in memory (but memoized results are dropped)
+        if measurement._evict():
+            self._stats["evictions"] += 1
+        return True
+
+    def enforce(self, keep=None):
+        """
+        Compress (if compression is set), then evict, the least recently used
+        measurements until the budget is met.
+        """
+        with self._lock:
+            total = sum(nbytes for _, nbytes in self._usage.values())
+            if self.compression is not None:
+                total = self._shrink(total, keep, self._compress)
+            self._shrink(total, keep, self._evict)
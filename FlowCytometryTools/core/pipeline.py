@@ -0,0 +1,284 @@
+"""
+Fused execution of queued measurement actions.
+
+Queued actions (see bases.queueable) are normally replayed one by one,
+with every action copying the measurement and materializing a full
+intermediate DataFrame.
+
+Here, a queue of transform/gate/subsample actions is compiled into a list
+of steps that are executed in a single pass over blocks of events:
+
+    read block -> transform needed columns -> evaluate gate mask -> keep survivors
+
+The blocks are read from the datafile one at a time when possible (see
+FCMeasurement.iter_data), and the survivors of each block are written into a
+single output preallocated for all the events, so peak memory is roughly one
+block plus the output.
+
+Some steps need to see all of their input before they can run:
+
+* subsample (the number of events to keep depends on the total count)
+* transform with use_spln=True and no spline yet (the spline range is
+  determined from the data)
+
+Such steps act as barriers: the blocks processed so far are materialized,
+the step is prepared using the complete input, and fused execution resumes.
+"""
+from copy import deepcopy
+
+import numpy as np
+from pandas import DataFrame, Index
+
+from .bases import Measurement
+from .profiling import stage
+from .sampling import subsample_data
+from .utils import to_list
+
+#: Number of events in each block
+_BLOCK_SIZE = 2**16
+
+_fusable_actions = ("transform", "gate", "subsample")
+
+
+class _TransformStep(object):
+    def __init__(
+        self, measurement, transformer, channels, return_all, use_spln, dtype, n_jobs
+    ):
+        self.measurement = measurement
+        self.transformer = transformer
+        self.channels = channels
+        self.return_all = return_all
+        self.use_spln = use_spln
+        self.dtype = dtype
+        self.n_jobs = n_jobs
+
+    @property
+    def is_barrier(self):
+        return self.use_spln and self.transformer.spln is None
+
+    def prepare(self, frame):
+        """Fit the spline on the complete input of this step."""
+        x = frame[self.channels].values.astype(float)
+        # Copy so that the transformer held by the queue is not modified.
+        self.transformer = self.transformer.copy()
+        self.transformer.set_spline(x.min(), x.max())
+
+    @stage("transform")
+    def __call__(self, block):
+        if not self.return_all:
+            block = block.filter(self.channels)
+        # Channels of blocks that are views of the source are not modified in place.
+        self.measurement._transform_channels(
+            block, self.channels, self.transformer, self.use_spln, self.dtype, self.n_jobs
+        )
+        return block
+
+
+class _GateStep(object):
+    is_barrier = False
+
+    def __init__(self, gate):
+        self.gate = gate
+
+    @stage("gate")
+    def __call__(self, block):
+        return block[self.gate._identify(block)]
+
+
+class _SubsampleStep(object):
+    is_barrier = True
+
+    def __init__(self, params):
+        self.params = params
+
+    def prepare(self, frame):
+        pass
+
+    def run(self, frame):
+        return subsample_data(frame, **self.params)
+
+
+def _compile_step(measurement, name, params, columns):
+    """
+    Compile a queued action into a step.
+
+    Parameters
+    ----------
+    measurement : FCMeasurement
+        The measurement holding the queue.
+    name : str
+        Name of the queued method.
+    params : dict
+        Parameters of the queued call.
+    columns : list of str
+        The columns of the data entering the step.
+
+    Returns
+    -------
+    step : the compiled step
+    columns : list of str
+        The columns of the data leaving the step.
+    """
+    params = deepcopy(params)
+    if name == "transform":
+        channels = to_list(params.pop("channels"))
+        if channels is None:
+            channels = list(columns)
+        kwargs = {
+            k: v
+            for k, v in params.items()
+            if k
+            not in (
+                "transform",
+                "direction",
+                "return_all",
+                "auto_range",
+                "use_spln",
+                "get_transformer",
+                "ID",
+                "apply_now",
+                "args",
+                "dtype",
+                "inplace",
+                "n_jobs",
+            )
+        }
+        transformer = measurement._get_transformer(
+            params["transform"],
+            params["direction"],
+            channels,
+            params["auto_range"],
+            params["args"],
+            kwargs,
+        )
+        step = _TransformStep(
+            measurement,
+            transformer,
+            channels,
+            params["return_all"],
+            params["use_spln"],
+            params.get("dtype"),
+            params.get("n_jobs"),
+        )
+        if not params["return_all"]:
+            columns = [c for c in columns if c in channels]
+        return step, columns
+    elif name == "gate":
+        gate = params["gate"]
+        for c in getattr(gate, "channels", []):
+            if c not in columns:
+                raise ValueError(
+                    "Trying to filter based on channel {channel}, which is not present in the data.".format(
+                        channel=c
+                    )
+                )
+        return _GateStep(gate), columns
+    elif name == "subsample":
+        del params["apply_now"]
+        return _SubsampleStep(params), columns
+    else:
+        raise ValueError("Action {} cannot be fused.".format(name))
+
+
+def _frame_blocks(frame, block_size):
+    """Consecutive blocks of frame (at least one, possibly empty)."""
+    for start in range(0, max(frame.shape[0], 1), block_size):
+        yield frame.iloc[start : start + block_size]
+
+
+def _run_blocks(blocks, steps, num_events):
+    """
+    Run the (non-barrier) steps over the blocks, and return their results as a
+    single frame, written into an output preallocated for num_events events
+    (the number of events of the blocks).
+    """
+    values = None
+    size = 0
+    for block in blocks:
+        for step in steps:
+            block = step(block)
+        if values is None:
+            columns, dtypes = block.columns, block.dtypes
+            dtype = np.result_type(*dtypes) if len(dtypes) else np.float64
+            values = np.empty((num_events, len(columns)), dtype=dtype)
+            index = np.empty(num_events, dtype=block.index.dtype)
+        values[size : size + len(block)] = block.values
+        index[size : size + len(block)] = block.index
+        size += len(block)
+    if size < num_events:
+        # Shrink the output (the first rows are kept in place).
+        values.resize((size, len(columns)), refcheck=False)
+        index.resize(size, refcheck=False)
+    frame = DataFrame(values, index=Index(index, copy=False), columns=columns, copy=False)
+    if (dtypes != dtype).any():
+        frame = frame.astype(dict(dtypes))
+    return frame
+
+
+def can_fuse(queue):
+    """Return True if all the actions in the queue can be fused."""
+    return all(name in _fusable_actions for name, params in queue)
+
+
+def execute_queue(measurement, block_size=_BLOCK_SIZE):
+    """
+    Apply the actions queued on measurement in a single fused pass.
+
+    Falls back to replaying the queue action by action if it contains
+    actions that cannot be fused.
+
+    Parameters
+    ----------
+    measurement : FCMeasurement
+    block_size : int
+        Number of events processed together.
+
+    Returns
+    -------
+    FCMeasurement
+        New measurement with the queued actions applied.
+    """
+    queue = measurement.queue
+    if not can_fuse(queue):
+        return Measurement._execute_queue(measurement)
+
+    # frame holds the complete input of the next steps, if it is in memory.
+    frame = None
+    num_events = 0
+    if measurement._can_stream_source():
+        num_events = int(measurement.get_meta()["$TOT"])
+    if num_events:
+        blocks = measurement._stream_blocks(block_size)
+        columns = list(measurement.channel_names)
+    else:
+        frame = measurement._get_attr_from_file("data")
+        blocks, num_events = _frame_blocks(frame, block_size), frame.shape[0]
+        columns = list(frame.columns)
+    ID = measurement.ID
+
+    pending = []
+    for name, params in queue:
+        step, columns = _compile_step(measurement, name, params, columns)
+        if step.is_barrier:
+            if pending or frame is None:
+                frame = _run_blocks(blocks, pending, num_events)
+            pending = []
+            step.prepare(frame)
+            if isinstance(step, _SubsampleStep):
+                frame = step.run(frame)
+            blocks, num_events = _frame_blocks(frame, block_size), frame.shape[0]
+            if isinstance(step, _SubsampleStep):
+                continue
+        pending.append(step)
+        if name == "transform" and params.get("ID") is not None:
+            ID = params["ID"]
+    if pending or frame is None:
+        frame = _run_blocks(blocks, pending, num_events)
+
+    new = measurement._copy_without_data()
+    new.queue = []
+    new.history = new.history + deepcopy(queue)
+    new._data = frame
+    new._replay = measurement._derived_replay(deepcopy(queue))
+    new.ID = ID
+    return new
@@ -0,0 +1,311 @@
+"""
+Profiling of the stages of an analysis.
+
+Library functions that are worth attributing time to (reading files, copying
+measurements, transforming, gating, plotting, ...) are decorated with
+:func:`stage`. While a :class:`Profile` is active, each call of a stage is
+recorded with its wall time, the measurement it was working on, the number of
+bytes it read from disk and (optionally) its peak memory allocation,
+as measured by tracemalloc.
+
+When no profile is active, a stage costs a single check of a module variable.
+
+Times and memory are inclusive: a stage called by another stage (e.g., a copy
+made while gating) is counted in both. A stage called within the same stage
+(e.g., a gate applied by gating a measurement) is only counted once.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+from pandas import DataFrame
+
+#: The active profiles. Stages are recorded only when this is not empty.
+_active = []
+
+_local = threading.local()
+
+# tracemalloc.reset_peak is only available in python >= 3.9.
+_reset_peak = getattr(tracemalloc, "reset_peak", None)
+
+_null = contextlib.nullcontext()
+
+
+def _frames():
+    """The stack of the stages being run by the current thread."""
+    frames = getattr(_local, "frames", None)
+    if frames is None:
+        frames = _local.frames = []
+    return frames
+
+
+class _Frame(object):
+    __slots__ = ("name", "ID", "start", "nbytes", "memory_start", "memory_peak")
+
+    def __init__(self, name, ID):
+        self.name = name
+        self.ID = ID
+        self.nbytes = 0
+        self.memory_start = None
+        self.memory_peak = 0
+
+
+class _Record(object):
+    """Context manager recording a single call of a stage."""
+
+    def __init__(self, name, ID=None):
+        self.name = name
+        self.ID = ID
+
+    def __enter__(self):
+        frames = _frames()
+        ID = self.ID
+        if ID is None and frames:
+            ID = frames[-1].ID
+        frame = _Frame(self.name, ID)
+        if _reset_peak is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if frames:
+                frames[-1].memory_peak = max(frames[-1].memory_peak, peak)
+            _reset_peak()
+            frame.memory_start = current
+            frame.memory_peak = current
+        frames.append(frame)
+        frame.start = time.perf_counter_ns()
+        self.frame = frame
+        return frame
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        frames = _frames()
+        frame = frames.pop()
+        peak = None
+        if frame.memory_start is not None and tracemalloc.is_tracing():
+            frame.memory_peak = max(frame.memory_peak, tracemalloc.get_traced_memory()[1])
+            peak = frame.memory_peak - frame.memory_start
+            if frames:
+                frames[-1].memory_peak = max(frames[-1].memory_peak, frame.memory_peak)
+            _reset_peak()
+        event = (
+            frame.name,
+            frame.ID,
+            threading.get_ident(),
+            frame.start,
+            end - frame.start,
+            frame.nbytes,
+            peak,
+        )
+        for profile in list(_active):
+            profile._events.append(event)
+        return False
+
+
+def record(name, ID=None):
+    """
+    Return a context manager recording a call of the stage name.
+
+    Parameters
+    ----------
+    name : str
+        Name of the stage.
+    ID : hashable | None
+        ID of the measurement being processed. If None, the measurement of the
+        enclosing stage (if any) is used.
+    """
+    if not _active:
+        return _null
+    return _Record(name, ID)
+
+
+def add_bytes(nbytes):
+    """Attribute nbytes read from disk to the stage being run by the current thread."""
+    if _active:
+        frames = _frames()
+        if frames:
+            frames[-1].nbytes += int(nbytes)
+
+
+def stage(name, measurement=False):
+    """
+    Decorator recording the calls of a function as the stage name.
+
+    Parameters
+    ----------
+    name : str
+        Name of the stage.
+    measurement : bool
+        If True, the function is a method of a measurement, and its calls
+        are attributed to the ID of the measurement.
+        Otherwise, calls are attributed to the measurement of the enclosing stage.
+    """
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active:
+                return func(*args, **kwargs)
+            frames = _frames()
+            if frames and frames[-1].name == name:
+                return func(*args, **kwargs)
+            ID = getattr(args[0], "ID", None) if measurement else None
+            with _Record(name, ID):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+class Profile(object):
+    """
+    Records the stages run while it is active.
+
+    Use as a context manager or as a decorator:
+
+    >>> with FlowCytometryTools.profile() as prof:
+    ...     plate.transform('hlog').gate(gate).counts()
+    >>> prof.report()
+
+    >>> @FlowCytometryTools.profile()
+    ... def analysis(plate):
+    ...     ...
+
+    Attributes
+    ----------
+    events : DataFrame
+        One row per recorded call (see report).
+    """
+
+    def __init__(self, memory=True):
+        """
+        Parameters
+        ----------
+        memory : bool
+            If True, the peak memory allocated by each stage is measured with tracemalloc
+            (started if it isn't tracing already). This slows down allocations.
+            With several threads, memory is attributed approximately.
+        """
+        self.memory = memory
+        self._events = []
+        self._started_tracing = False
+
+    def __enter__(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        _active.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _active.remove(self)
+        if self._started_tracing and not _active:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def clear(self):
+        """Discard the recorded calls."""
+        self._events = []
+
+    @property
+    def events(self):
+        """
+        DataFrame with one row per recorded call: stage, ID, thread, start (ns),
+        time (s), bytes (read from disk) and peak_memory (bytes).
+        """
+        columns = ["stage", "ID", "thread", "start", "time", "bytes", "peak_memory"]
+        events = DataFrame(self._events, columns=columns)
+        events["time"] = events["time"] / 1e9
+        return events
+
+    def report(self, by=("stage", "ID")):
+        """
+        Summarize the recorded calls.
+
+        Parameters
+        ----------
+        by : str | list of str
+            Columns by which calls are grouped: 'stage' and/or 'ID'.
+
+        Returns
+        -------
+        DataFrame indexed by the by columns, with the number of calls, their total
+        and maximal time (s), the total bytes read, and the maximal peak memory (bytes).
+        Sorted by decreasing total time.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        grouped = self.events.groupby(by, dropna=False, sort=False)
+        report = grouped.agg(
+            calls=("time", "size"),
+            time=("time", "sum"),
+            max_time=("time", "max"),
+            bytes=("bytes", "sum"),
+            peak_memory=("peak_memory", "max"),
+        )
+        return report.sort_values("time", ascending=False)
+
+    def to_chrome_trace(self, path=None):
+        """
+        Export the recorded calls in the Chrome trace event format
+        (viewable in chrome://tracing or https://ui.perfetto.dev).
+
+        Parameters
+        ----------
+        path : str | None
+            If given, the trace is written to this file as JSON.
+
+        Returns
+        -------
+        dict
+        """
+        pid = os.getpid()
+        events = []
+        for name, ID, thread, start, duration, nbytes, peak in self._events:
+            args = {"ID": str(ID) if ID is not None else None, "bytes": nbytes}
+            if peak is not None:
+                args["peak_memory"] = peak
+            events.append(
+                {
+                    "name": name,
+                    "cat": "FlowCytometryTools",
+                    "ph": "X",
+                    "ts": start / 1e3,
+                    "dur": duration / 1e3,
+                    "pid": pid,
+                    "tid": thread,
+                    "args": args,
+                }
+            )
+        trace = {"traceEvents": events, "displayTimeUnit": "ms"}
+        if path is not None:
+            with open(path, "w") as f:
+                json.dump(trace, f)
+        return trace
+
+
+def profile(memory=True):
+    """
+    Profile the stages of an analysis (reading, copying, transforming, gating,
+    plotting, ...), per stage and per measurement.
+
+    Returns a Profile, to be used as a context manager or as a decorator.
+    See Profile.report and Profile.to_chrome_trace.
+
+    Parameters
+    ----------
+    memory : bool
+        If True, also measure the peak memory allocated by each stage (with tracemalloc).
+    """
+    return Profile(memory=memory)
@@ -0,0 +1,300 @@
+"""
+Routines for subsampling event data.
+
+These operate directly on DataFrames, and are used both by
+FCMeasurement.subsample and by the fused pipeline executor (see pipeline.py).
+"""
+import zlib
+
+import numpy as np
+import pandas
+
+from .utils import to_list
+
+
+def get_rng(seed=None, rng=None):
+    """
+    Return a numpy random Generator.
+
+    Parameters
+    ----------
+    seed : None | int | numpy.random.SeedSequence
+        Used to create a new Generator if rng is None.
+    rng : None | numpy.random.Generator
+        Returned as is if provided.
+    """
+    if rng is not None:
+        return rng
+    return np.random.default_rng(seed)
+
+
+def spawn_seeds(keys, seed=None, rng=None):
+    """
+    Create an independent, reproducible random seed for every key.
+
+    The seed of each key depends only on the seed and on the key itself
+    (not on the other keys), so the same well gets the same events
+    regardless of which other wells are subsampled with it.
+    The seeds are integers (rather than Generators) so that the subsamples
+    can be replayed from the datafiles (e.g., after their data is evicted).
+
+    Parameters
+    ----------
+    keys : iterable of hashable
+    seed : None | int
+    rng : None | numpy.random.Generator
+        If given, the seed is drawn from rng.
+
+    Returns
+    -------
+    dict of key:int
+    """
+    if rng is not None:
+        seed = int(rng.integers(2**63))
+    entropy = np.random.SeedSequence(seed).entropy
+    return {
+        k: int(
+            np.random.SeedSequence(entropy, spawn_key=(zlib.crc32(repr(k).encode()),))
+            .generate_state(1, np.uint64)[0]
+        )
+        for k in keys
+    }
+
+
+def resolve_key(key, num_events, auto_resize=False):
+    """
+    Convert a subsampling key into either a number of events (int) or a slice.
+    See FCMeasurement.subsample for a description of the parameters.
+    """
+    if isinstance(key, float):
+        if (key > 1.0) or (key < 0.0):
+            raise ValueError("If float, key must be between 0.0 and 1.0")
+        key = int(num_events * key)
+    elif isinstance(key, tuple):
+        all_float = all([isinstance(x, float) for x in key])
+        if (len(key) > 2) or (not all_float):
+            raise ValueError(
+                "Tuple must consist of two floats, each between 0.0 and 1.0"
+            )
+        start = int(num_events * key[0])
+        stop = int(num_events * key[1])
+        key = slice(start, stop)  # Convert to a slice
+
+    if isinstance(key, slice):
+        if auto_resize:
+            stop = key.stop if key.stop < num_events else num_events
+            start = key.start if key.start < num_events else num_events
+            key = slice(start, stop, key.step)  # Generate new slice
+    elif isinstance(key, int):
+        if auto_resize:
+            if key > num_events:
+                key = num_events
+    else:
+        raise TypeError("'key' must be of type int, float, tuple or slice.")
+    return key
+
+
+def _water_level(counts, size):
+    """
+    Find t such that sum(min(counts, t)) == size.
+
+    Used to cap the density of the densest bins, so that keeping each event
+    with probability proportional to 1 / max(density, t) yields `size` events
+    in expectation.
+    """
+    c = np.sort(counts)
+    m = len(c)
+    cum = np.concatenate(([0], np.cumsum(c)))
+    # Value of sum(min(counts, t)) at t = c[k]
+    level = cum[:-1] + (m - np.arange(m)) * c
+    k = np.searchsorted(level, size)
+    if k == m:
+        return float(c[-1])
+    return (size - cum[k]) / float(m - k)
+
+
+def density_weights(values, size, bins=32):
+    """
+    Compute weights for density dependent downsampling.
+
+    The local density of each event is estimated as the number of events
+    sharing its bin, on a grid with `bins` equal width bins per dimension.
+    The weight of an event is inversely related to its density, but
+    sparse regions (density below the level needed to reach `size` events)
+    all get the same, maximal, weight. Rare populations are therefore kept
+    whole while dense populations are thinned.
+
+    Parameters
+    ----------
+    values : ndarray (events x dimensions)
+    size : int
+        Target number of events.
+    bins : int
+        Number of bins per dimension.
+
+    Returns
+    -------
+    ndarray
+        Weight of each event (larger means more likely to be kept).
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+    if values.shape[0] == 0:
+        return np.ones(0)
+    lo = values.min(axis=0)
+    span = values.max(axis=0) - lo
+    span[span == 0] = 1
+    idx = ((values - lo) / span * bins).astype(np.intp)
+    np.clip(idx, 0, bins - 1, out=idx)
+
+    ndim = idx.shape[1]
+    if ndim * np.log2(bins) < 62:
+        # Number each occupied bin of the grid
+        flat = np.ravel_multi_index(idx.T, (bins,) * ndim)
+        _, cell, counts = np.unique(flat, return_inverse=True, return_counts=True)
+    else:
+        # Grid too large to enumerate; number the occupied bins directly
+        _, cell, counts = np.unique(idx, axis=0, return_inverse=True, return_counts=True)
+    cell = cell.ravel()
+    level = _water_level(counts, size)
+    return 1.0 / np.maximum(counts[cell], level)
+
+
+def weighted_positions(weights, size, rng):
+    """
+    Choose `size` positions without replacement, with probabilities
+    related to the weights (Efraimidis-Spirakis exponential keys).
+    """
+    num_events = len(weights)
+    if size > num_events:
+        raise ValueError("Cannot take a larger sample than population")
+    keys = rng.standard_exponential(num_events) / weights
+    if size == num_events:
+        return np.arange(num_events)
+    return np.argpartition(keys, size)[:size]
+
+
+def reservoir_sample(blocks, size, rng, keep_order=True):
+    """
+    Uniformly sample events from a stream of blocks (reservoir sampling).
+
+    Every event is assigned a random key, and the `size` events with the
+    smallest keys seen so far are kept. Only the reservoir and the current
+    block are held in memory.
+
+    Parameters
+    ----------
+    blocks : iterable of DataFrame
+        Consecutive blocks of events.
+    size : int
+        Number of events to keep.
+    rng : numpy.random.Generator
+    keep_order : bool
+        If True, the events are returned in acquisition order.
+        Otherwise they are returned in random order.
+
+    Returns
+    -------
+    DataFrame | None
+        The sampled events, or None if there were no blocks.
+    """
+    reservoir, reservoir_keys = None, None
+    num_events = 0
+    for block in blocks:
+        num_events += len(block)
+        keys = rng.random(len(block))
+        if reservoir is None:
+            candidates, candidate_keys = block, keys
+        else:
+            candidates = pandas.concat([reservoir, block])
+            candidate_keys = np.concatenate([reservoir_keys, keys])
+        if len(candidates) > size:
+            positions = np.argpartition(candidate_keys, size)[:size]
+            positions.sort()
+            candidates = candidates.take(positions)
+            candidate_keys = candidate_keys[positions]
+        reservoir, reservoir_keys = candidates, candidate_keys
+    if size > num_events:
+        raise ValueError("Cannot take a larger sample than population")
+    if reservoir is None:
+        return None
+    if not keep_order:
+        reservoir = reservoir.take(np.argsort(reservoir_keys))
+    return reservoir
+
+
+def _iter_blocks(data, chunksize=2**16):
+    for start in range(0, max(data.shape[0], 1), chunksize):
+        yield data.iloc[start : start + chunksize]
+
+
+def subsample_data(
+    data,
+    key,
+    order="random",
+    auto_resize=False,
+    seed=None,
+    rng=None,
+    keep_order=False,
+    density_channels=None,
+    density_bins=32,
+):
+    """
+    Subsample the rows of a DataFrame.
+
+    See FCMeasurement.subsample for a description of the parameters.
+
+    Returns
+    -------
+    DataFrame
+        The subsampled data.
+    """
+    num_events = data.shape[0]
+
+    try:
+        key = resolve_key(key, num_events, auto_resize)
+        if isinstance(key, slice):
+            # Copies: iloc returns views of data, which must not alias its rows
+            newdata = data.iloc[key].copy()
+        else:
+            if key < 1:
+                # EDGE CAES: Must return an empty sample
+                order = "start"
+            if order == "random":
+                positions = get_rng(seed, rng).choice(
+                    num_events, size=key, replace=False, shuffle=not keep_order
+                )
+                if keep_order:
+                    positions.sort()
+                newdata = data.take(positions)
+            elif order == "reservoir":
+                newdata = reservoir_sample(
+                    _iter_blocks(data), key, get_rng(seed, rng), keep_order
+                )
+            elif order == "density":
+                density_channels = to_list(density_channels)
+                if density_channels is None:
+                    density_channels = list(data.columns)
+                weights = density_weights(
+                    data[density_channels].values, key, density_bins
+                )
+                positions = weighted_positions(weights, key, get_rng(seed, rng))
+                if keep_order:
+                    positions.sort()
+                newdata = data.take(positions)
+            elif order == "start":
+                newdata = data.iloc[:key].copy()
+            elif order == "end":
+                newdata = data.iloc[-key:].copy()
+            else:
+                raise ValueError(
+                    "order must be in ('random', 'reservoir', 'density', 'start', 'end')"
+                )
+    except IndexError:
+        print(
+            "If you're encountering an out-of-bounds error, "
+            "try to setting 'auto_resize' to True."
+        )
+        raise
+    return newdata
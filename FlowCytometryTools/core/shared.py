@@ -0,0 +1,125 @@
+"""
+Event data held in shared memory.
+
+A DataFrame is copied once into a multiprocessing.shared_memory block, and
+is thereafter represented by a small, picklable SharedFrame handle.
+Any process can turn the handle back into a (read-only) DataFrame that is a
+view of the block, without copying the events.
+
+multiprocessing.shared_memory is only available from Python 3.8 on; it is
+imported when a block is first created or attached, so that the rest of the
+package can still be used with Python 3.7.
+"""
+import numpy as np
+from pandas import DataFrame, Index, RangeIndex
+
+#: Shared memory blocks used by this process (created or attached), by name.
+_blocks = {}
+
+
+def _shared_memory():
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        raise ImportError("Shared memory requires Python 3.8 or later.")
+    return shared_memory
+
+
+def _attach_block(name):
+    block = _blocks.get(name)
+    if block is None:
+        block = _shared_memory().SharedMemory(name=name)
+        _blocks[name] = block
+    return block
+
+
+class SharedFrame(object):
+    """
+    Handle to a DataFrame stored in a shared memory block.
+
+    The events are stored column by column (as pandas stores them), preceded by the
+    index when it isn't a RangeIndex.
+    """
+
+    def __init__(self, name, shape, dtype, columns, index):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+        self.columns = columns
+        #: ('range', start, step) or ('array', dtype)
+        self.index = index
+
+    def __repr__(self):
+        return "SharedFrame({!r}, shape={})".format(self.name, self.shape)
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Copy a DataFrame into a new shared memory block and return its handle."""
+        values = frame.values
+        if values.dtype == object:
+            raise TypeError("Only numeric data can be placed in shared memory.")
+        n, m = values.shape
+        if isinstance(frame.index, RangeIndex):
+            index = ("range", frame.index.start, frame.index.step)
+            index_bytes = 0
+        else:
+            index_values = np.asarray(frame.index)
+            index = ("array", index_values.dtype.str)
+            index_bytes = index_values.nbytes
+        offset = -(-index_bytes // 8) * 8  # Aligned start of the events
+        size = max(offset + values.nbytes, 1)
+
+        block = _shared_memory().SharedMemory(create=True, size=size)
+        _blocks[block.name] = block
+        new = cls(block.name, (n, m), values.dtype.str, list(frame.columns), index)
+        if index_bytes:
+            new._index_array(block)[:] = index_values
+        new._values_array(block)[:] = values
+        return new
+
+    def _index_array(self, block):
+        dtype = np.dtype(self.index[1])
+        return np.ndarray((self.shape[0],), dtype=dtype, buffer=block.buf)
+
+    def _values_array(self, block):
+        offset = 0
+        if self.index[0] == "array":
+            offset = -(-self.shape[0] * np.dtype(self.index[1]).itemsize // 8) * 8
+        return np.ndarray(
+            self.shape, dtype=np.dtype(self.dtype), buffer=block.buf, offset=offset, order="F"
+        )
+
+    def attach(self):
+        """Return a read-only DataFrame that is a view of the shared memory block."""
+        block = _attach_block(self.name)
+        values = self._values_array(block)
+        values.flags.writeable = False
+        if self.index[0] == "range":
+            _, start, step = self.index
+            index = RangeIndex(start, start + step * self.shape[0], step)
+        else:
+            index_values = self._index_array(block)
+            index_values.flags.writeable = False
+            index = Index(index_values, copy=False)
+        return DataFrame(values, index=index, columns=self.columns, copy=False)
+
+    def release(self):
+        """
+        Free the shared memory block.
+        DataFrames attached to the block must not be used afterwards.
+        """
+        block = _blocks.pop(self.name, None)
+        if block is None:
+            try:
+                block = _shared_memory().SharedMemory(name=self.name)
+            except FileNotFoundError:
+                return
+        try:
+            block.close()
+        except BufferError:
+            # Views of the block are still referenced; they keep the mapping alive.
+            pass
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,144 @@
+"""
+Summary statistics of flow cytometry data.
+
+All the requested statistics of all channels are computed together from an
+(events x channels) array. Quantiles are found with a single numpy.partition
+(rather than a full sort per statistic).
+"""
+import re
+import warnings
+
+import numpy as np
+
+#: Statistics that are computed by default.
+default_stats = ("count", "mean", "median", "geomean", "cv", "rCV", "p1", "p99")
+
+_named_stats = ("count", "mean", "std", "median", "geomean", "cv", "rCV", "min", "max")
+_percentile_pattern = re.compile(r"^p(\d+(\.\d*)?)$")
+
+
+def _percentile_of(stat):
+    """Return the percentile requested by a statistic (e.g., 'p99' -> 99.0), or None."""
+    match = _percentile_pattern.match(stat)
+    if match is None:
+        return None
+    q = float(match.group(1))
+    if q > 100:
+        raise ValueError("Percentile must be between 0 and 100. Got {}".format(stat))
+    return q
+
+
+def percentiles(values, qs):
+    """
+    Compute percentiles of each column of values (linear interpolation, as numpy.percentile).
+
+    Parameters
+    ----------
+    values : ndarray (events x channels)
+    qs : list of float
+        Percentiles, between 0 and 100.
+
+    Returns
+    -------
+    ndarray (len(qs) x channels)
+    """
+    values = np.asarray(values, dtype=float)
+    n, m = values.shape
+    qs = np.asarray(qs, dtype=float)
+    out = np.full((len(qs), m), np.nan)
+    if n == 0 or len(qs) == 0:
+        return out
+
+    nan_cols = np.isnan(values).any(axis=0)
+    if nan_cols.any():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            out[:, nan_cols] = np.nanpercentile(values[:, nan_cols], qs, axis=0)
+        values = values[:, ~nan_cols]
+        if values.shape[1] == 0:
+            return out
+
+    positions = qs / 100.0 * (n - 1)
+    lo = np.floor(positions).astype(np.intp)
+    hi = np.minimum(lo + 1, n - 1)
+    part = np.partition(values, np.unique(np.r_[lo, hi]), axis=0)
+    frac = (positions - lo)[:, np.newaxis]
+    out[:, ~nan_cols] = part[lo] + (part[hi] - part[lo]) * frac
+    return out
+
+
+def compute_stats(values, stats=default_stats):
+    """
+    Compute statistics of each column of values.
+
+    Parameters
+    ----------
+    values : ndarray (events x channels)
+    stats : iterable of str
+        Statistics to compute:
+
+        * 'count' : number of (non-NaN) events
+        * 'mean', 'std', 'min', 'max'
+        * 'median'
+        * 'geomean' : geometric mean of the positive values
+        * 'cv' : coefficient of variation, 100 * std / mean
+        * 'rCV' : robust coefficient of variation,
+          100 * 0.5 * (p84.13 - p15.87) / median
+        * 'p<q>' : the q-th percentile, e.g., 'p1', 'p99', 'p99.5'
+
+    Returns
+    -------
+    dict of stat:ndarray (one value per channel)
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+    stats = list(stats)
+
+    qs = []
+    for stat in stats:
+        q = _percentile_of(stat)
+        if q is not None:
+            qs.append(q)
+        elif stat not in _named_stats:
+            msg = "Unknown statistic {}. Must be one of {} or of the form 'p<percentile>'."
+            raise ValueError(msg.format(repr(stat), _named_stats))
+        elif stat == "median":
+            qs.append(50.0)
+        elif stat == "rCV":
+            qs.extend([15.87, 50.0, 84.13])
+    qs = sorted(set(qs))
+    quantiles = dict(zip(qs, percentiles(values, qs)))
+
+    result = {}
+    with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+        # Empty channels give NaNs
+        warnings.simplefilter("ignore", RuntimeWarning)
+        count = (~np.isnan(values)).sum(axis=0)
+        empty = np.full(values.shape[1], np.nan)
+        for stat in stats:
+            q = _percentile_of(stat)
+            if q is not None:
+                result[stat] = quantiles[q]
+            elif stat == "count":
+                result[stat] = count.astype(float)
+            elif stat == "mean":
+                result[stat] = np.nanmean(values, axis=0)
+            elif stat == "std":
+                result[stat] = np.nanstd(values, axis=0, ddof=1)
+            elif stat == "min":
+                result[stat] = np.nanmin(values, axis=0) if len(values) else empty
+            elif stat == "max":
+                result[stat] = np.nanmax(values, axis=0) if len(values) else empty
+            elif stat == "median":
+                result[stat] = quantiles[50.0]
+            elif stat == "geomean":
+                logs = np.log(np.where(values > 0, values, np.nan))
+                result[stat] = np.exp(np.nanmean(logs, axis=0))
+            elif stat == "cv":
+                std = np.nanstd(values, axis=0, ddof=1)
+                result[stat] = 100 * std / np.nanmean(values, axis=0)
+            elif stat == "rCV":
+                spread = quantiles[84.13] - quantiles[15.87]
+                result[stat] = 100 * 0.5 * spread / quantiles[50.0]
+    return result
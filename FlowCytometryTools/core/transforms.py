@@ -16,21 +16,227 @@ TODO:
 """
 from __future__ import division
 
+import os
+import threading
 import warnings
-from numpy import (log, log10, exp, where, sign, vectorize, min, max, linspace, logspace, r_, abs,
-                   asarray, )
-from numpy.lib.shape_base import apply_along_axis
-from scipy.interpolate import InterpolatedUnivariateSpline
-from scipy.optimize import brentq
+from concurrent.futures import ThreadPoolExecutor
 
-from .utils import to_list, BaseObject
+from numpy import (log, log10, exp, sqrt, sign, vectorize, min, max, maximum, linspace, logspace,
+                   r_, abs, asarray, empty, insert, multiply, divide, power, subtract, searchsorted, clip,
+                   dtype as np_dtype, float32, float64, result_type, errstate, isinf, isfinite, )
+
+from .cache import func_fingerprint
+from .profiling import stage
+from .utils import to_list, BaseObject, fingerprint, n_threads
 
 _machine_max = 2**18
 _l_mmax = log10(_machine_max)
 _display_max = 10**4
 
+#: Number of values transformed together by the transformation kernels,
+#: so that the temporaries of a block stay in the CPU cache.
+_BLOCK_SIZE = 2**14
+
+#: Number of points of the first spline of set_spline(tol=...),
+#: to which points are added until the tolerance is met.
+_initial_spline_points = 17
+
+
+def result_dtype(dtype, direction="forward"):
+    """
+    Return the type in which data of the given type is transformed:
+    the smallest floating point type that holds its values exactly.
+    float32 data (and 8 or 16 bit integer data) is transformed in float32,
+    anything else in float64.
+    Inverse transformations are exponential, so their values may exceed the
+    range of float32: they are always transformed in float64.
+    """
+    if direction == "inverse":
+        return np_dtype(float64)
+    return result_type(np_dtype(dtype), float32)
+
+
+def _store(out, result):
+    """
+    Write result into out (of a narrower type), warning if values overflow
+    (and become infinite) in the type of out.
+    """
+    with errstate(over="ignore"):
+        out[...] = result
+    overflow = isinf(out) & isfinite(result)
+    if overflow.any():
+        warnings.warn(
+            "{} transformed values exceed the range of {} and were stored as inf. "
+            "Pass dtype='float64'.".format(overflow.sum(), out.dtype)
+        )
+
+
+def _blockwise(kernel, x, out=None, dtype=None):
+    """
+    Evaluate kernel(x_block, out_block) over consecutive blocks of rows of x.
+
+    The kernels compute with ufuncs writing into out_block, so the only temporaries
+    they allocate are block-sized. out may be x itself (in-place evaluation).
+
+    Parameters
+    ----------
+    kernel : callable
+        Called with blocks of x and out of the same (floating point) type.
+    x : num | array
+    out : array | None
+        Array in which the result is written. If None, a new array is allocated
+        (of type result_dtype(x.dtype), or dtype if it is wider).
+    dtype : dtype | None
+        Type in which the values are computed. If None, the type of out.
+        Blocks of other types are converted (in block-sized temporaries);
+        a warning is issued if values overflow the type of out.
+
+    Returns
+    -------
+    out (a numpy scalar if x is a number and out is None)
+    """
+    x = asarray(x)
+    scalar = out is None and x.ndim == 0
+    if out is None:
+        out_dtype = result_dtype(x.dtype)
+        if dtype is not None:
+            out_dtype = result_type(out_dtype, dtype)
+        out = empty(x.shape, dtype=out_dtype)
+    elif out.shape != x.shape:
+        raise ValueError("out must have the shape of x {}. Got {}.".format(x.shape, out.shape))
+    dtype = out.dtype if dtype is None else np_dtype(dtype)
+    x_rows = x.reshape(1) if x.ndim == 0 else x
+    out_rows = out.reshape(1) if out.ndim == 0 else out
+    # Number of rows in a block (numpy's min and max shadow the builtins here)
+    row_size = x_rows[0].size if len(x_rows) else 0
+    step = (_BLOCK_SIZE // row_size if row_size else _BLOCK_SIZE) or 1
+    for start in range(0, len(x_rows), step):
+        x_block = x_rows[start : start + step]
+        out_block = out_rows[start : start + step]
+        if x_block.dtype != dtype:
+            x_block = x_block.astype(dtype)
+        if out_block.dtype != dtype:
+            result = empty(out_block.shape, dtype=dtype)
+            kernel(x_block, result)
+            _store(out_block, result)
+        else:
+            kernel(x_block, out_block)
+    return out[()] if scalar else out
+
+
+#: Shared pool of threads evaluating blocks of transformations (see _evaluate).
+_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+
 
-def linear(x, old_range, new_range):
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1, thread_name_prefix="transform"
+            )
+    return _executor
+
+
+def _run_chunk(kernel, x, out, dtype):
+    _local.worker = True
+    try:
+        _blockwise(kernel, x, out, dtype)
+    finally:
+        _local.worker = False
+
+
+def _evaluate(tasks, n_jobs=None):
+    """
+    Run _blockwise(kernel, x, out, dtype) for each of the tasks.
+
+    The rows of the tasks (e.g., events x channels) are split into chunks of whole
+    blocks that are evaluated concurrently by a shared pool of threads. numpy
+    releases the GIL in the ufuncs of the kernels, so the chunks run in parallel.
+
+    Parameters
+    ----------
+    tasks : list of (kernel, x, out, dtype)
+        out must be an array.
+    n_jobs : int | None
+        Number of chunks into which each task is split. If None, the number of CPUs.
+        Within a thread of the pool, tasks are evaluated by the calling thread.
+    """
+    n_jobs = n_threads(n_jobs)
+    chunks = []
+    if n_jobs > 1 and not getattr(_local, "worker", False):
+        for kernel, x, out, dtype in tasks:
+            if x.ndim == 0 or not len(x):
+                chunks.append((kernel, x, out, dtype))
+                continue
+            row_size = x[0].size or 1
+            block_rows = (_BLOCK_SIZE // row_size) or 1
+            num_blocks = -(-len(x) // block_rows)
+            rows = -(-num_blocks // n_jobs) * block_rows
+            for start in range(0, len(x), rows):
+                chunks.append((kernel, x[start : start + rows], out[start : start + rows], dtype))
+    if len(chunks) <= 1:
+        for task in tasks:
+            _blockwise(*task)
+        return
+    futures = [_pool().submit(_run_chunk, *chunk) for chunk in chunks]
+    for future in futures:
+        future.result()
+
+
+def _spline_tck(spln):
+    """
+    Return (t, c, k), the B-spline representation of spln, a scipy UnivariateSpline,
+    from its knots and coefficients (t holds the k + 1 repeated boundary knots).
+    """
+    knots = spln.get_knots()
+    c = spln.get_coeffs()
+    k = len(c) - len(knots) + 1
+    t = r_[[knots[0]] * k, knots, [knots[-1]] * k]
+    return t, c, k
+
+
+def _spline_kernel(spln):
+    """
+    Return a kernel (see _blockwise) evaluating spln, a scipy spline, in its
+    piecewise polynomial form with ufuncs. (scipy evaluates splines while holding
+    the GIL or a global lock, so threads would not evaluate blocks in parallel.)
+
+    Splines that are not a scipy UnivariateSpline are called on each block.
+    """
+    from scipy.interpolate import PPoly, UnivariateSpline
+
+    if not isinstance(spln, UnivariateSpline):
+
+        def kernel(x, out):
+            out[...] = spln(x)
+
+        return kernel
+
+    t, c, k = _spline_tck(spln)
+    # Polynomials of the intervals between the knots (excluding the repeated boundary knots)
+    coefficients = PPoly.from_spline((t, c, k)).c[:, k : len(t) - k - 1]
+    breaks = t[k : len(t) - k]
+    last = len(breaks) - 2
+
+    def kernel(x, out):
+        interval = searchsorted(breaks, x, "right")
+        interval -= 1
+        # Values outside of the knots are extrapolated by the boundary polynomials.
+        clip(interval, 0, last, out=interval)
+        dx = x - breaks[interval]
+        y = coefficients[0][interval]
+        for coefficient in coefficients[1:]:
+            y *= dx
+            y += coefficient[interval]
+        out[...] = y
+
+    return kernel
+
+
+def linear(x, old_range, new_range, out=None):
     """
     Rescale each channel to the new range as following:
     new = data/old_range*new_range
@@ -45,15 +251,23 @@ def linear(x, old_range, new_range):
         Maximal data value before rescaling
         (If old range is not given use the one specified in self.meta['_channels_']['$PnR'])
         Deprecated!!!
+    out : array | None
+        Array in which the result is written (may be x). See _blockwise.
     """
-    y = x / old_range * new_range
-    return y
+    old_range = asarray(old_range)
+    new_range = asarray(new_range)
+
+    def kernel(x, out):
+        divide(x, old_range, out=out)
+        out *= new_range
+
+    return _blockwise(kernel, x, out)
 
 
 rescale = linear
 
 
-def tlog(x, th=1, r=_display_max, d=_l_mmax):
+def tlog(x, th=1, r=_display_max, d=_l_mmax, out=None):
     """
     Truncated log10 transform.
 
@@ -69,6 +283,8 @@ def tlog(x, th=1, r=_display_max, d=_l_mmax):
     d : num (default = log10(2**18))
         log10 of maximal possible measured value.
         tlog(10**d) = r
+    out : array | None
+        Array in which the result is written (may be x). See _blockwise.
 
     Returns
     -------
@@ -76,10 +292,16 @@ def tlog(x, th=1, r=_display_max, d=_l_mmax):
     """
     if th <= 0:
         raise ValueError("Threshold value must be positive. %s given." % th)
-    return where(x <= th, log10(th) * 1.0 * r / d, log10(x) * 1.0 * r / d)
 
+    def kernel(x, out):
+        maximum(x, th, out=out)
+        log10(out, out=out)
+        out *= 1.0 * r / d
 
-def tlog_inv(y, th=1, r=_display_max, d=_l_mmax):
+    return _blockwise(kernel, x, out)
+
+
+def tlog_inv(y, th=1, r=_display_max, d=_l_mmax, out=None):
     """
     Inverse truncated log10 transform.
     Values
@@ -96,6 +318,8 @@ def tlog_inv(y, th=1, r=_display_max, d=_l_mmax):
     d : num (default = log10(2**18))
         log10 of maximal possible measured value.
         tlog_inv(r) = 10**d
+    out : array | None
+        Array in which the result is written (may be y). See _blockwise.
 
     Returns
     -------
@@ -103,37 +327,76 @@ def tlog_inv(y, th=1, r=_display_max, d=_l_mmax):
     """
     if th <= 0:
         raise ValueError("Threshold value must be positive. %s given." % th)
-    x = 10 ** (y * 1.0 * d / r)
-    try:
-        x[x < th] = th
-    except TypeError:
-        if x < th:
-            x = th
-    return x
 
+    def kernel(y, out):
+        multiply(y, 1.0 * d / r, out=out)
+        power(10.0, out, out=out)
+        maximum(out, th, out=out)
 
-def glog(x, l):
+    return _blockwise(kernel, y, out, float64)
+
+
+def glog(x, l, out=None):
     """
     Natural base generalized-log transform.
+
+    out : array | None
+        Array in which the result is written (may be x). See _blockwise.
+    """
+
+    def kernel(x, out):
+        aux = x * x
+        aux += l
+        sqrt(aux, out=aux)
+        aux += x
+        log(aux, out=out)
+
+    return _blockwise(kernel, x, out)
+
+
+def glog_inv(y, l, out=None):
+    """
+    Inverse of the generalized-log transform: (exp(y)**2 - l) / (2 * exp(y)).
+
+    out : array | None
+        Array in which the result is written (may be y). See _blockwise.
     """
-    return log(x + (x**2 + l) ** 0.5)
 
+    def kernel(y, out):
+        ey = exp(y)
+        divide(l, ey, out=out)
+        subtract(ey, out, out=out)
+        out *= 0.5
 
-def glog_inv(y, l):
-    ey = exp(y)
-    return (ey**2 - l) / (2 * ey)
+    return _blockwise(kernel, y, out, float64)
 
 
-def hlog_inv(y, b=500, r=_display_max, d=_l_mmax):
+def hlog_inv(y, b=500, r=_display_max, d=_l_mmax, out=None):
     """
     Inverse of base 10 hyperlog transform.
+
+    out : array | None
+        Array in which the result is written (may be y). See _blockwise.
     """
-    aux = 1.0 * d / r * y
-    s = sign(y)
-    if s.shape:  # to catch case where input is a single number
+
+    def kernel(y, out):
+        aux = multiply(y, 1.0 * d / r)
+        s = sign(y)
         s[s == 0] = 1
-    elif s == 0:
-        s = 1
+        t = s * aux
+        power(10.0, t, out=t)
+        t *= s
+        aux *= b
+        t += aux
+        subtract(t, s, out=out)
+
+    return _blockwise(kernel, y, out, float64)
+
+
+def _hlog_inv_scalar(y, b, r, d):
+    """hlog_inv of a single number (used by the numerical inversion in hlog)."""
+    aux = 1.0 * d / r * y
+    s = -1.0 if y < 0 else 1.0
     return s * 10 ** (s * aux) + b * aux - s
 
 
@@ -216,12 +479,14 @@ def _make_hlog_numeric(b, r, d):
     """
     Return a function that numerically computes the hlog transformation for given parameter values.
     """
-    hlog_obj = lambda y, x, b, r, d: hlog_inv(y, b, r, d) - x
+    hlog_obj = lambda y, x, b, r, d: _hlog_inv_scalar(y, b, r, d) - x
+    from scipy.optimize import brentq
+
     find_inv = vectorize(lambda x: brentq(hlog_obj, -2 * r, 2 * r, args=(x, b, r, d)))
     return find_inv
 
 
-def hlog(x, b=500, r=_display_max, d=_l_mmax):
+def hlog(x, b=500, r=_display_max, d=_l_mmax, out=None):
     """
     Base 10 hyperlog transform.
 
@@ -237,6 +502,9 @@ def hlog(x, b=500, r=_display_max, d=_l_mmax):
     d : num (default = log10(2**18))
         log10 of maximal possible measured value.
         hlog_inv(r) = 10**d
+    out : array | None
+        Array in which the result is written (may be x).
+        The values are found numerically; use a spline (see Transformation) for large arrays.
 
     Returns
     -------
@@ -248,9 +516,12 @@ def hlog(x, b=500, r=_display_max, d=_l_mmax):
     else:
         n = len(x)
         if not n:  # if transforming empty container
-            return x
+            return x if out is None else out
         else:
             y = hlog_fun(x)
+    if out is not None:
+        out[...] = y
+        return out
     return y
 
 
@@ -357,13 +628,17 @@ class Transformation(BaseObject):
         self.kwargs = kwargs
         self.name = name
         self.spln = spln
+        #: (spln, x, y, k): the spline fitted by set_spline or set_spline_table, and the
+        #: points and degree it was fitted with (see spline_table).
+        self._spline_fit = None
 
     __init__.__doc__ = __init__.__doc__.format(", ".join(name_transforms.keys()))
 
     def __repr__(self):
         return repr(self.name)
 
-    def transform(self, x, use_spln=False, **kwargs):
+    @stage("transform")
+    def transform(self, x, use_spln=False, dtype=None, out=None, n_jobs=1, **kwargs):
         """
         Apply transform to x
 
@@ -376,25 +651,87 @@ class Transformation(BaseObject):
             True - transform using the spline specified in self.slpn.
                     If self.spln is None, set the spline.
             False - transform using self.tfun
+        dtype : None | str | numpy dtype
+            Floating point type of the returned values.
+            If None, the type is determined by the type of x and the direction
+            (see result_dtype): float32 data stays float32 for forward transformations.
+            The named forward transformations are then computed in float32 (with a
+            relative error of about 1e-6), while splines are computed in float64 and
+            rounded to float32. Pass 'float64' where precision matters.
+            Inverse transformations (which are exponential) return float64.
+        out : array | None
+            Array in which the transformed values are written (its type is used
+            instead of dtype). It may be x itself: the named transformations and
+            splines are evaluated in place, over blocks of events, without allocating
+            full-size temporaries.
+        n_jobs : int | None
+            Number of threads evaluating blocks of x (for splines and named
+            transformations). If None, the number of CPUs is used.
+            The result doesn't depend on n_jobs.
         kwargs:
             Keyword arguments to be passed to self.set_spline.
             Only used if use_spln=True & self.spln=None.
 
         Returns
         -------
-        Array of transformed values.
+        Array of transformed values (out, if given).
         """
-        x = asarray(x, dtype=float)
+        x = asarray(x)
+        if out is not None:
+            dtype = out.dtype
+        else:
+            dtype = result_dtype(x.dtype, self.direction) if dtype is None else np_dtype(dtype)
+            out = empty(x.shape, dtype=dtype)
 
+        task = self._task(x, use_spln, out, **kwargs)
+        if task is None:
+            out[...] = self.tfun(x.astype(dtype, copy=False), *self.args, **self.kwargs)
+        else:
+            _evaluate([task], n_jobs)
+        return out
+
+    def _task(self, x, use_spln, out, **kwargs):
+        """
+        Return the task (kernel, x, out, dtype) evaluating the transformation of x
+        into out by blocks (see _evaluate), or None if the transformation is not a
+        named one (callables are applied to all of x at once).
+        """
         if use_spln:
             if self.spln is None:
                 self.set_spline(x.min(), x.max(), **kwargs)
-            return apply_along_axis(self.spln, 0, x)
-        else:
-            return self.tfun(x, *self.args, **self.kwargs)
+            return _spline_kernel(self.spln), x, out, float64
+        elif self.tname is not None:
+            # float32 overflows for the exponentials of moderately large values.
+            compute = out.dtype
+            if self.direction == "inverse":
+                compute = result_type(compute, float64)
+
+            def kernel(x, out):
+                self.tfun(x, *self.args, out=out, **self.kwargs)
+
+            return kernel, x, out, compute
+        return None
 
     __call__ = transform
 
+    def fingerprint(self, spline=True):
+        """
+        Return a digest of the transformation: its name (or the code of its function),
+        direction, args, kwargs and (if spline) the spline; None if it cannot be
+        fingerprinted (see core.cache.func_fingerprint).
+        """
+        tfun = self.tname if self.tname is not None else func_fingerprint(self.tfun)
+        if tfun is None:
+            return None
+        spln = None
+        if spline and self.spln is not None:
+            from scipy.interpolate import UnivariateSpline
+
+            spln = self.spln
+            if isinstance(spln, UnivariateSpline):
+                spln = _spline_tck(spln)
+        return fingerprint((tfun, self.direction, self.args, self.kwargs, spln))
+
     @property
     def inverse(self):
         if self.tname is None:
@@ -410,13 +747,110 @@ class Transformation(BaseObject):
             tinv.direction = direction
         return tinv
 
-    def set_spline(self, xmin, xmax, nx=1000, log_spacing=None, **kwargs):
+    def set_spline(self, xmin, xmax, nx=1000, log_spacing=None, tol=None, **kwargs):
+        """
+        Set self.spln, an interpolating spline of the transformation over [xmin, xmax].
+
+        Parameters
+        ----------
+        xmin, xmax : float
+            Range of the spline.
+        nx : int
+            Number of interpolated points if tol is None,
+            otherwise the maximal number of interpolated points.
+        log_spacing : bool | None
+            If True, points are spaced logarithmically (see _x_for_spln).
+            If None, True for the hlog, tlog and glog transformations.
+        tol : float | None
+            If given, points are added where the spline is inaccurate (bisecting
+            the intervals between points) until the absolute error of the spline
+            at the midpoints of all the intervals is at most tol. E.g., with
+            hlog, points are concentrated around its linear/log crossover.
+            A warning is issued if this needs more than nx points.
+        kwargs :
+            Passed to scipy.interpolate.InterpolatedUnivariateSpline (e.g., k).
+        """
         if log_spacing is None:
             if self.tname in ["hlog", "tlog", "glog"]:
                 log_spacing = True
             else:
                 log_spacing = False
-        x_spln = _x_for_spln([xmin, xmax], nx, log_spacing)
+        if tol is None:
+            x_spln = _x_for_spln([xmin, xmax], nx, log_spacing)
+            y_spln = self(x_spln)
+            self._fit_spline(x_spln, y_spln, **kwargs)
+            return
+        x_spln = _x_for_spln([xmin, xmax], int(min([nx, _initial_spline_points])), log_spacing)
         y_spln = self(x_spln)
-        spln = InterpolatedUnivariateSpline(x_spln, y_spln, **kwargs)
-        self.spln = spln
+        while True:
+            spln = self._fit_spline(x_spln, y_spln, **kwargs)
+            x_mid = (x_spln[:-1] + x_spln[1:]) / 2
+            y_mid = self(x_mid)
+            inaccurate = abs(spln(x_mid) - y_mid) > tol
+            num_added = inaccurate.sum()
+            if not num_added:
+                break
+            if len(x_spln) + num_added > nx:
+                warnings.warn(
+                    "The spline of {} did not reach the tolerance {} with {} points "
+                    "(see nx).".format(self.tname or self.tfun, tol, nx)
+                )
+                break
+            positions = inaccurate.nonzero()[0] + 1
+            x_spln = insert(x_spln, positions, x_mid[inaccurate])
+            y_spln = insert(y_spln, positions, y_mid[inaccurate])
+
+    def _fit_spline(self, x, y, k=3, **kwargs):
+        """Set self.spln to the spline of degree k interpolating the points (x, y)."""
+        from scipy.interpolate import InterpolatedUnivariateSpline
+
+        self.spln = InterpolatedUnivariateSpline(x, y, k=k, **kwargs)
+        self._spline_fit = (self.spln, x, y, k)
+        return self.spln
+
+    def spline_table(self):
+        """
+        Return the points interpolated by self.spln, with the parameters of the
+        transformation, as a dict of lists and numbers (e.g., to be saved as JSON).
+
+        The spline can be set again from the table with set_spline_table
+        (in another session or process) without evaluating the transformation.
+        """
+        if self.spln is None:
+            raise ValueError("The spline is not set (see set_spline).")
+        fit = getattr(self, "_spline_fit", None)  # Unset in transformations pickled before it
+        if fit is None or fit[0] is not self.spln:
+            raise ValueError("The spline was not set by set_spline or set_spline_table.")
+        _, x_spln, y_spln, k = fit
+        return {
+            "transform": self.tname,
+            "direction": self.direction,
+            "args": list(self.args),
+            "kwargs": dict(self.kwargs),
+            "k": int(k),
+            "x": asarray(x_spln, dtype=float64).tolist(),
+            "y": asarray(y_spln, dtype=float64).tolist(),
+        }
+
+    def set_spline_table(self, table):
+        """
+        Set self.spln from a table returned by spline_table.
+
+        Raises ValueError if the table is for another transformation (or other parameters).
+        """
+        parameters = (self.tname, self.direction, list(self.args), dict(self.kwargs))
+        table_parameters = (
+            table["transform"],
+            table["direction"],
+            list(table["args"]),
+            dict(table["kwargs"]),
+        )
+        if parameters != table_parameters:
+            raise ValueError(
+                "The spline table is for the transformation {} and not {}.".format(
+                    table_parameters, parameters
+                )
+            )
+        self._fit_spline(
+            asarray(table["x"], dtype=float64), asarray(table["y"], dtype=float64), k=table["k"]
+        )
@@ -1,9 +1,11 @@
 import re
 import glob
+import hashlib
 import os
 import fnmatch
 import pickle
 from collections import abc
+from concurrent.futures import ThreadPoolExecutor
 
 import six
 
@@ -133,6 +135,29 @@ def load(path):
         f.close()
 
 
+def fingerprint(obj):
+    """
+    Return a stable hex digest of a picklable object.
+
+    Used for keying caches on the contents of objects (e.g., a queue of actions).
+
+    Parameters
+    ----------
+    obj : any object
+
+    Returns
+    -------
+    str | None
+        The digest, or None if the object could not be pickled
+        (e.g., it contains a lambda).
+    """
+    try:
+        dump = pickle.dumps(obj, protocol=2)
+    except Exception:
+        return None
+    return hashlib.sha1(dump).hexdigest()
+
+
 def to_iter(obj):
     """Convert an object to a list if it is not already an iterable.
 
@@ -166,6 +191,36 @@ def to_list(obj):
         return list(obj)
 
 
+def n_threads(n_jobs=None):
+    """Number of threads to use for n_jobs: the number of CPUs if n_jobs is None, at least 1."""
+    if n_jobs is None:
+        return os.cpu_count() or 1
+    return max(int(n_jobs), 1)
+
+
+def parallel_map(func, items, n_jobs=None):
+    """
+    Apply func to each of the items using a pool of threads.
+
+    Parameters
+    ----------
+    func : callable
+    items : iterable
+    n_jobs : int | None
+        Number of threads to use. If None, the number of CPUs is used.
+
+    Returns
+    -------
+    list with the output of func for each item (in order).
+    """
+    items = list(items)
+    n_jobs = min(n_threads(n_jobs), len(items))
+    if n_jobs <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        return list(executor.map(func, items))
+
+
 class BaseObject(object):
     """
     Object providing common utility methods.
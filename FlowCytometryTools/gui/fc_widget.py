@@ -1,6 +1,7 @@
 import itertools
 import numpy
 import pylab as pl
+from matplotlib.patches import Ellipse
 from matplotlib.widgets import Cursor, AxesWidget
 
 from .. import FCMeasurement
@@ -373,6 +374,15 @@ class BaseGate(EventGenerator):
             if len(verts) == 1:
                 verts = verts[0]
 
+        parameters = ""
+        if self.gate_type is EllipseGate:
+            # The vertexes are the center and the ends of the axes
+            verts, axes, angle = ellipse_from_vertices(verts)
+            parameters = ", axes={}, angle={:.1f}".format(
+                apply_format(tuple(axes), "{:.3e}"), angle
+            )
+            verts = tuple(verts)
+
         # Format vertices to include less sigfigs
         verts = apply_format(verts, "{:.3e}")
 
@@ -381,7 +391,11 @@ class BaseGate(EventGenerator):
         gencode.setdefault("gate_type", self._gencode_gate_class)
         gencode.setdefault("verts", verts)
         gencode.setdefault("channels", channels)
-        format_string = "{name} = {gate_type}({verts}, ({channels}), region='{region}', name='{name}')"
+        gencode.setdefault("parameters", parameters)
+        format_string = (
+            "{name} = {gate_type}({verts}, ({channels}){parameters}, region='{region}', "
+            "name='{name}')"
+        )
         return format_string.format(**gencode)
 
     @property
@@ -491,6 +505,70 @@ class PolyGate(PlottableGate):
         self.poly.update(style)
 
 
+class RectangleGate(PlottableGate):
+    """A rectangle defined by two opposite corners."""
+
+    def create_artist(self):
+        self.rectangle = pl.Rectangle((0, 0), 0, 0, color="k", fill=False)
+        self.artist_list = to_list(self.rectangle)
+        self.ax.add_artist(self.rectangle)
+        self.update_position()
+
+    def update_position(self):
+        (x1, y1), (x2, y2) = self.coordinates
+        self.rectangle.set_bounds(min(x1, x2), min(y1, y2), abs(x2 - x1), abs(y2 - y1))
+
+    def update_looks(self):
+        """Updates the looks of the gate depending on state."""
+        if self.state == "active":
+            style = {"color": "red", "linestyle": "solid", "fill": False}
+        else:
+            style = {"color": "black", "fill": False}
+        self.rectangle.update(style)
+
+
+class EllipseGate(PlottableGate):
+    """An ellipse defined by its center, the end of an axis and a point on the other axis."""
+
+    def create_artist(self):
+        self.ellipse = Ellipse((0, 0), 0, 0, color="k", fill=False)
+        self.artist_list = to_list(self.ellipse)
+        self.ax.add_artist(self.ellipse)
+        self.update_position()
+
+    def update_position(self):
+        center, axes, angle = ellipse_from_vertices(self.coordinates)
+        self.ellipse.set_center(center)
+        self.ellipse.set_width(2 * axes[0])
+        self.ellipse.set_height(2 * axes[1])
+        self.ellipse.set_angle(angle)
+
+    def update_looks(self):
+        """Updates the looks of the gate depending on state."""
+        if self.state == "active":
+            style = {"color": "red", "linestyle": "solid", "fill": False}
+        else:
+            style = {"color": "black", "fill": False}
+        self.ellipse.update(style)
+
+
+def ellipse_from_vertices(vertices):
+    """
+    Return the (center, semi-axes, angle in degrees) of the ellipse given by
+    three vertices: its center, the end of its first axis, and a point whose
+    distance to the first axis is the length of the second semi-axis.
+    """
+    center, end, point = [numpy.asarray(v, dtype=float) for v in vertices]
+    first = end - center
+    a = numpy.hypot(*first)
+    second = point - center
+    if a == 0:
+        return center, (0.0, numpy.hypot(*second)), 0.0
+    b = abs(first[0] * second[1] - first[1] * second[0]) / a
+    angle = numpy.degrees(numpy.arctan2(first[1], first[0]))
+    return center, (a, b), angle
+
+
 class ThresholdGate(PlottableGate):
     def create_artist(self):
         trackx, tracky = self.trackxy
@@ -535,12 +613,16 @@ class PolyDrawer(AxesWidget):
     *oncreated* : function
         Whenever the Polygon is created, the `oncreated` function is called and
         passed the PolyDrawer instance.
+    *num_vertices* : int
+        If given, the shape is created as soon as this number of vertices is placed.
+        Otherwise, the last vertex is placed with a right click.
     """
 
-    def __init__(self, ax, oncreated=None, lineprops=None):
+    def __init__(self, ax, oncreated=None, lineprops=None, num_vertices=None):
         AxesWidget.__init__(self, ax)
 
         self.oncreated = oncreated
+        self.num_vertices = num_vertices
         self.verts = None
 
         if lineprops is None:
@@ -568,13 +650,20 @@ class PolyDrawer(AxesWidget):
                 self.verts.append((event.xdata, event.ydata))
             self.line.set_data(zip(*self.verts))
             self._update()
+            if self.num_vertices is not None and len(self.verts) == self.num_vertices:
+                self._finish()
         elif event.button == MOUSE.RIGHT_CLICK:
+            if self.num_vertices is not None:
+                return
             self.verts.append((event.xdata, event.ydata))
             self.line.set_data(zip(*self.verts))
-            self._clean()
-            self._update()
-            if self.oncreated is not None:
-                self.oncreated(self.verts, self)
+            self._finish()
+
+    def _finish(self):
+        self._clean()
+        self._update()
+        if self.oncreated is not None:
+            self.oncreated(self.verts, self)
 
     def onmove(self, event):
         if self.ignore(event):
@@ -677,6 +766,10 @@ class FCGateManager(EventGenerator):
 
             if kind == "poly":
                 gate_type = PolyGate
+            elif kind == "rectangle":
+                gate_type = RectangleGate
+            elif kind == "ellipse":
+                gate_type = EllipseGate
             elif "threshold" in kind or "quad" in kind:
                 gate_type = ThresholdGate
 
@@ -708,6 +801,14 @@ class FCGateManager(EventGenerator):
                     oncreated=create_gate,
                     lineprops=dict(color="k", marker="o"),
                 )
+            elif kind in ("rectangle", "ellipse"):
+                # Two opposite corners, or the center and the ends of the two axes
+                self._drawing_tool = PolyDrawer(
+                    self.ax,
+                    oncreated=create_gate,
+                    lineprops=dict(color="k", marker="o"),
+                    num_vertices=2 if kind == "rectangle" else 3,
+                )
             elif kind == "quad":
                 self._drawing_tool = Cursor(self.ax, vertOn=1, horizOn=1)
             elif kind == "horizontal threshold":
@@ -864,10 +965,14 @@ def key_press_handler(event, canvas, toolbar=None):
 
     if key in ["1"]:
         toolbar.create_gate_widget(kind="poly")
-    elif key in ["2", "3", "4"]:
-        kind = {"2": "quad", "3": "horizontal threshold", "4": "vertical threshold"}[
-            key
-        ]
+    elif key in ["2", "3", "4", "5", "6"]:
+        kind = {
+            "2": "quad",
+            "3": "horizontal threshold",
+            "4": "vertical threshold",
+            "5": "rectangle",
+            "6": "ellipse",
+        }[key]
         toolbar.create_gate_widget(kind=kind)
     elif key in ["9"]:
         toolbar.remove_active_gate()
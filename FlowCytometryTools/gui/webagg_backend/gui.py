@@ -131,6 +131,10 @@ class MyApplication(tornado.web.Application):
                         fc_manager.load_fcs(filename)
                 elif message['name'] == 'draw_poly_gate':
                     fc_manager.create_gate_widget('poly')
+                elif message['name'] == 'draw_rectangle_gate':
+                    fc_manager.create_gate_widget('rectangle')
+                elif message['name'] == 'draw_ellipse_gate':
+                    fc_manager.create_gate_widget('ellipse')
                 elif message['name'] == 'draw_horizontal_gate':
                     fc_manager.create_gate_widget('horizontal threshold')
                 elif message['name'] == 'draw_vertical_gate':
@@ -0,0 +1,468 @@
+"""
+Synthetic FCS files for tests and benchmarks.
+
+Writes valid FCS 2.0, 3.0 and 3.1 files (list mode) with events drawn from a
+mixture of Gaussian populations, optionally mixed by a spillover matrix, and
+whole plate directories whose file names follow the convention expected by
+parser='name' (e.g., 'Sample_Well_A3.fcs').
+
+Events are generated and written in blocks, so files much larger than the
+available memory can be written.
+
+Example
+-------
+>>> from FlowCytometryTools import FCPlate
+>>> from FlowCytometryTools.testing import write_plate
+>>> paths = write_plate('/tmp/plate', num_events=100000, datatype='I')
+>>> plate = FCPlate.from_dir('plate', '/tmp/plate')
+"""
+import os
+import string
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from pandas import DataFrame
+
+from .core.utils import n_threads, parallel_map
+
+#: Default names of the channels: two scatter channels followed by fluorescence channels.
+_scatter_channels = ["FSC-A", "SSC-A"]
+
+_versions = ("2.0", "3.0", "3.1")
+
+_byteorders = {"little": ("<", "1,2,3,4"), "big": (">", "4,3,2,1")}
+
+_bits = {"I": 32, "F": 32, "D": 64}
+
+# Largest offset that fits in the HEADER segment.
+_max_header_offset = 99999999
+
+_delimiter = "/"
+
+
+def _channel_names(channels):
+    """Return a list of channel names, given names or a number of channels."""
+    if isinstance(channels, int):
+        names = _scatter_channels[:channels]
+        names += ["FL{}-A".format(i + 1) for i in range(channels - len(names))]
+        return names
+    return list(channels)
+
+
+def _populations(populations, num_channels, rng):
+    """
+    Return (weights, means, stds) of the populations, with means and stds
+    of shape (populations x channels).
+    """
+    if isinstance(populations, int):
+        means = 10 ** rng.uniform(2, 4.5, size=(populations, num_channels))
+        stds = means * rng.uniform(0.1, 0.3, size=(populations, num_channels))
+        weights = rng.uniform(0.5, 1.5, size=populations)
+    else:
+        weights, means, stds = zip(*populations)
+        shape = (len(populations), num_channels)
+        means = np.broadcast_to(np.asarray(means, dtype=float), shape)
+        stds = np.broadcast_to(np.asarray(stds, dtype=float), shape)
+        weights = np.asarray(weights, dtype=float)
+    return weights / weights.sum(), means, stds
+
+
+def _spillover_matrix(spillover, num_channels):
+    spillover = np.asarray(spillover, dtype=float)
+    if spillover.shape != (num_channels, num_channels):
+        raise ValueError(
+            "The spillover matrix must be of shape {0}x{0}. Got {1}.".format(
+                num_channels, spillover.shape
+            )
+        )
+    return spillover
+
+
+def _spillover_keyword(spillover, channel_names):
+    """Value of the $SPILLOVER keyword: n, the n channel names, and the n*n matrix (by row)."""
+    values = [str(len(channel_names))] + list(channel_names)
+    values += ["{:g}".format(v) for v in spillover.ravel()]
+    return ",".join(values)
+
+
+def _seed_sequence(seed):
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+def _ordered_map(func, items, n_jobs=None):
+    """
+    Like map, but func is applied in a pool of threads, at most n_jobs items ahead
+    of the consumer (so that only a few results are held in memory).
+    """
+    n_jobs = n_threads(n_jobs)
+    if n_jobs <= 1:
+        for item in items:
+            yield func(item)
+        return
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) > n_jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_synthetic_events(
+    num_events,
+    channels=8,
+    populations=3,
+    spillover=None,
+    seed=None,
+    chunksize=2**20,
+    n_jobs=None,
+):
+    """
+    Generate synthetic events in blocks.
+
+    Parameters
+    ----------
+    num_events : int
+        Total number of events.
+    channels : int | list of str
+        Number of channels, or their names.
+        Default names are 'FSC-A', 'SSC-A', 'FL1-A', 'FL2-A', ...
+    populations : int | list of (weight, mean, std)
+        Populations of the mixture of Gaussians. If an int, that many populations
+        are drawn at random. Otherwise, the relative weight, mean and standard
+        deviation of each population; mean and std are scalars or one value per channel.
+    spillover : None | array-like (channels x channels)
+        spillover[i, j] is the fraction of the signal of channel i that is measured
+        in channel j. The events are the true signals multiplied by this matrix.
+    seed : None | int | numpy.random.SeedSequence
+        For a given seed, the events do not depend on n_jobs.
+    chunksize : int
+        Number of events in each block.
+    n_jobs : int | None
+        Number of threads generating blocks. If None, the number of CPUs is used.
+
+    Returns
+    -------
+    iterator of ndarray of float32 (events x channels)
+    """
+    seed = _seed_sequence(seed)
+    num_channels = len(_channel_names(channels))
+    weights, means, stds = _populations(populations, num_channels, np.random.default_rng(seed))
+    means = means.astype(np.float32)
+    stds = stds.astype(np.float32)
+    if spillover is not None:
+        spillover = _spillover_matrix(spillover, num_channels).astype(np.float32)
+
+    starts = range(0, num_events, chunksize)
+
+    def generate(item):
+        start, block_seed = item
+        rng = np.random.default_rng(block_seed)
+        n = min(chunksize, num_events - start)
+        labels = np.repeat(np.arange(len(weights)), rng.multinomial(n, weights))
+        rng.shuffle(labels)
+        block = rng.standard_normal((n, num_channels), dtype=np.float32)
+        block *= stds.take(labels, axis=0)
+        block += means.take(labels, axis=0)
+        if spillover is not None:
+            block = block @ spillover
+        return block
+
+    return _ordered_map(generate, zip(starts, seed.spawn(len(starts))), n_jobs)
+
+
+def synthetic_events(num_events, channels=8, populations=3, spillover=None, seed=None):
+    """
+    Return synthetic events as a DataFrame (float32).
+    See iter_synthetic_events for a description of the parameters.
+    """
+    blocks = list(iter_synthetic_events(num_events, channels, populations, spillover, seed))
+    values = np.concatenate(blocks) if blocks else np.empty((0, len(_channel_names(channels))))
+    return DataFrame(values.astype(np.float32, copy=False), columns=_channel_names(channels))
+
+
+def _text_segment(keywords):
+    d = _delimiter
+    pairs = []
+    for key, value in keywords.items():
+        value = str(value).replace(d, d + d)
+        if value == "":
+            value = " "
+        pairs += [key, value]
+    return (d + d.join(pairs) + d).encode("latin-1")
+
+
+def _header(version, text_start, text_end, data_start, data_end):
+    offsets = [text_start, text_end, data_start, data_end, 0, 0]
+    return ("FCS" + version + " " * 4 + "".join("{:>8}".format(o) for o in offsets)).encode(
+        "ascii"
+    )
+
+
+def _segments(version, keywords, data_bytes):
+    """
+    Return the HEADER and TEXT segments, setting the DATA offsets in both.
+
+    The TEXT segment holds the DATA offsets, so its length depends on them;
+    iterate until they agree.
+    """
+    text_start = 58
+    data_start = 0
+    while True:
+        data_end = data_start + data_bytes - 1 if data_bytes else data_start
+        if version != "2.0":
+            keywords["$BEGINDATA"] = data_start
+            keywords["$ENDDATA"] = data_end
+        text = _text_segment(keywords)
+        new_start = text_start + len(text)
+        if new_start == data_start:
+            break
+        data_start = new_start
+    text_end = text_start + len(text) - 1
+    if data_end > _max_header_offset:
+        if version == "2.0":
+            raise ValueError(
+                "FCS 2.0 files are limited to {} bytes. Use version 3.0 or 3.1.".format(
+                    _max_header_offset
+                )
+            )
+        # The offsets are given by $BEGINDATA and $ENDDATA only.
+        header = _header(version, text_start, text_end, 0, 0)
+    else:
+        header = _header(version, text_start, text_end, data_start, data_end)
+    return header, text
+
+
+def _write(
+    path,
+    blocks,
+    num_events,
+    channel_names,
+    version="3.1",
+    datatype="F",
+    byteorder="little",
+    ranges=None,
+    spillover=None,
+    text=None,
+):
+    if version not in _versions:
+        raise ValueError("version must be one of {}. Got {!r}.".format(_versions, version))
+    if datatype not in _bits:
+        raise ValueError("datatype must be one of 'I', 'F' or 'D'. Got {!r}.".format(datatype))
+    if byteorder not in _byteorders:
+        raise ValueError("byteorder must be 'little' or 'big'. Got {!r}.".format(byteorder))
+
+    num_channels = len(channel_names)
+    bits = _bits[datatype]
+    endian, byteord = _byteorders[byteorder]
+    file_dtype = np.dtype(endian + {"I": "u4", "F": "f4", "D": "f8"}[datatype])
+    if ranges is None:
+        ranges = 262144
+    ranges = np.broadcast_to(np.asarray(ranges), (num_channels,))
+
+    keywords = {
+        "$BEGINANALYSIS": 0,
+        "$ENDANALYSIS": 0,
+        "$BEGINSTEXT": 0,
+        "$ENDSTEXT": 0,
+        "$BYTEORD": byteord,
+        "$DATATYPE": datatype,
+        "$MODE": "L",
+        "$NEXTDATA": 0,
+        "$PAR": num_channels,
+        "$TOT": num_events,
+    }
+    if version == "2.0":
+        for key in ("$BEGINANALYSIS", "$ENDANALYSIS", "$BEGINSTEXT", "$ENDSTEXT"):
+            del keywords[key]
+    for i, name in enumerate(channel_names, 1):
+        keywords["$P{}N".format(i)] = name
+        keywords["$P{}B".format(i)] = bits
+        keywords["$P{}E".format(i)] = "0,0"
+        keywords["$P{}R".format(i)] = int(ranges[i - 1])
+    if spillover is not None:
+        key = "$SPILLOVER" if version == "3.1" else "SPILL"
+        keywords[key] = _spillover_keyword(spillover, channel_names)
+    if text:
+        keywords.update(text)
+
+    header, text_segment = _segments(version, keywords, num_events * num_channels * bits // 8)
+
+    if datatype == "I":
+        # Values are stored as unsigned integers in [0, range).
+        upper = (ranges - 1).astype(np.float32)
+    written = 0
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(text_segment)
+        for block in blocks:
+            block = np.asarray(block)
+            if datatype == "I":
+                block = np.clip(block, 0, upper)
+                np.rint(block, out=block)
+            f.write(np.ascontiguousarray(block, dtype=file_dtype).data)
+            written += block.shape[0]
+    if written != num_events:
+        raise ValueError("Expected {} events. Got {}.".format(num_events, written))
+    return path
+
+
+def write_fcs(
+    path,
+    data,
+    channel_names=None,
+    version="3.1",
+    datatype="F",
+    byteorder="little",
+    ranges=None,
+    text=None,
+):
+    """
+    Write events to an FCS file.
+
+    Parameters
+    ----------
+    path : str
+    data : DataFrame | ndarray (events x channels)
+    channel_names : None | list of str
+        If None, the columns of data are used.
+    version : '2.0' | '3.0' | '3.1'
+    datatype : 'I' | 'F' | 'D'
+        Storage type of the events: unsigned 32 bit integers, 32 bit floats or
+        64 bit floats. Integer values are rounded and clipped to [0, range).
+    byteorder : 'little' | 'big'
+    ranges : None | int | list of int
+        Value of the $PnR keyword of each channel (the same for all channels
+        if an int). Default is 262144.
+    text : None | dict
+        Additional keywords for the TEXT segment.
+
+    Returns
+    -------
+    path
+    """
+    if channel_names is None:
+        channel_names = list(data.columns)
+    values = np.asarray(data)
+    return _write(
+        path,
+        [values],
+        values.shape[0],
+        list(channel_names),
+        version=version,
+        datatype=datatype,
+        byteorder=byteorder,
+        ranges=ranges,
+        text=text,
+    )
+
+
+def write_synthetic_fcs(
+    path,
+    num_events=10000,
+    channels=8,
+    populations=3,
+    spillover=None,
+    seed=None,
+    chunksize=2**20,
+    n_jobs=None,
+    **kwargs
+):
+    """
+    Write an FCS file with synthetic events.
+
+    Events are generated and written in blocks of chunksize events, so the
+    number of events is not limited by the available memory.
+
+    Parameters
+    ----------
+    path : str
+    num_events : int
+    channels, populations, spillover, seed, chunksize, n_jobs :
+        See iter_synthetic_events.
+        The spillover matrix is also written to the TEXT segment
+        ($SPILLOVER in FCS 3.1, SPILL otherwise).
+    kwargs : dict
+        Passed to write_fcs (version, datatype, byteorder, ranges, text).
+
+    Returns
+    -------
+    path
+    """
+    channel_names = _channel_names(channels)
+    blocks = iter_synthetic_events(
+        num_events, channel_names, populations, spillover, seed, chunksize, n_jobs
+    )
+    if spillover is not None:
+        spillover = _spillover_matrix(spillover, len(channel_names))
+    return _write(path, blocks, num_events, channel_names, spillover=spillover, **kwargs)
+
+
+def well_ids(shape=(8, 12)):
+    """Return the IDs of the wells of a plate ('A1', 'A2', ..., in row major order)."""
+    rows, cols = shape
+    if rows > len(string.ascii_uppercase):
+        raise ValueError("Plates with more than 26 rows are not supported.")
+    return [
+        "{}{}".format(string.ascii_uppercase[i], j + 1) for i in range(rows) for j in range(cols)
+    ]
+
+
+def write_plate(
+    directory,
+    shape=(8, 12),
+    num_events=10000,
+    prefix="Sample",
+    seed=None,
+    n_jobs=None,
+    **kwargs
+):
+    """
+    Write a directory with an FCS file of synthetic events for each well of a plate.
+
+    Files are named '<prefix>_Well_<well>.fcs' (e.g., 'Sample_Well_A3.fcs'),
+    so the directory can be loaded with FCPlate.from_dir using the default parser ('name').
+
+    Parameters
+    ----------
+    directory : str
+        Created if it doesn't exist.
+    shape : (rows, columns)
+        Shape of the plate, e.g. (8, 12) or (16, 24).
+    num_events : int | dict of well:int
+        Number of events in each well.
+    prefix : str
+    seed : None | int
+        Seed of the events. The wells get different (but reproducible) events.
+    n_jobs : int | None
+        Number of files to write concurrently. If None, the number of CPUs is used.
+    kwargs : dict
+        Passed to write_synthetic_fcs (channels, populations, spillover, version,
+        datatype, byteorder, ...). The populations are the same in all wells.
+
+    Returns
+    -------
+    dict of well:path
+    """
+    os.makedirs(directory, exist_ok=True)
+    wells = well_ids(shape)
+    seeds = np.random.SeedSequence(seed).spawn(len(wells))
+    if isinstance(kwargs.get("populations", 3), int):
+        # Draw the populations once, so they are shared by the wells.
+        rng = np.random.default_rng(seed)
+        num_channels = len(_channel_names(kwargs.get("channels", 8)))
+        weights, means, stds = _populations(kwargs.get("populations", 3), num_channels, rng)
+        kwargs["populations"] = list(zip(weights, means, stds))
+
+    def write(item):
+        well, well_seed = item
+        count = num_events[well] if isinstance(num_events, dict) else num_events
+        path = os.path.join(directory, "{}_Well_{}.fcs".format(prefix, well))
+        write_synthetic_fcs(path, count, seed=well_seed, n_jobs=1, **kwargs)
+        return well, path
+
+    return dict(parallel_map(write, zip(wells, seeds), n_jobs))
@@ -0,0 +1,162 @@
+"""Tests for the queue and caching machinery of Measurement objects."""
+import os
+import pickle
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from numpy.testing import assert_allclose, assert_array_equal
+
+from FlowCytometryTools import FCMeasurement, FCPlate, ThresholdGate, test_data_dir, test_data_file
+from FlowCytometryTools.core.bases import Measurement
+from FlowCytometryTools.core.pipeline import execute_queue
+from FlowCytometryTools.testing import write_synthetic_fcs
+
+
+class TestQueuedCache(unittest.TestCase):
+    def setUp(self):
+        self.sample = FCMeasurement(ID="test", datafile=test_data_file)
+        self.gate = ThresholdGate(1000.0, "FSC-A", region="above")
+
+    def test_queue_is_replayed_once(self):
+        queued = self.sample.gate(self.gate, apply_now=False)
+        calls = []
+        execute_queue = queued._execute_queue
+
+        def counting_execute_queue():
+            calls.append(1)
+            return execute_queue()
+
+        queued._execute_queue = counting_execute_queue
+
+        first = queued.get_data()
+        second = queued.get_data()
+        self.assertEqual(queued.counts, len(first))
+        self.assertEqual(len(calls), 1)
+        self.assertIs(first, second)
+        assert_array_equal(first.values, self.sample.gate(self.gate).data.values)
+
+    def test_cache_invalidated_when_queue_changes(self):
+        queued = self.sample.gate(self.gate, apply_now=False)
+        n1 = queued.counts
+        queued.queue.append(
+            ("gate", {"gate": ThresholdGate(5000.0, "FSC-A", "above"), "apply_now": True})
+        )
+        n2 = queued.counts
+        self.assertLess(n2, n1)
+
+    def test_cache_not_copied(self):
+        queued = self.sample.gate(self.gate, apply_now=False)
+        queued.get_data()
+        self.assertIsNotNone(queued._queued_cache)
+        self.assertIsNone(queued.copy()._queued_cache)
+
+    def test_plate_counts_with_queue(self):
+        plate = FCPlate.from_dir("plate", test_data_dir).dropna()
+        gated = plate.gate(self.gate, apply_now=False)
+        counts = gated.counts()
+        expected = plate.gate(self.gate).counts()
+        assert_array_equal(counts.values, expected.values)
+        for well in gated.values():
+            self.assertIsNotNone(well._queued_cache)
+
+
+class TestFusedQueue(unittest.TestCase):
+    def setUp(self):
+        self.sample = FCMeasurement(ID="test", datafile=test_data_file)
+
+    def _check_fused(self, queued):
+        fused = queued.apply_queued()
+        sequential = Measurement._execute_queue(queued)
+        self.assertEqual(fused.queue, [])
+        self.assertEqual(len(fused.history), len(sequential.history))
+        self.assertListEqual(list(fused.data.columns), list(sequential.data.columns))
+        assert_array_equal(fused.data.index, sequential.data.index)
+        assert_allclose(fused.data.values, sequential.data.values)
+
+    def test_transform_and_gate(self):
+        gate = ThresholdGate(2000.0, "FSC-A", region="above")
+        queued = (
+            self.sample.transform("hlog", channels=["FSC-A", "SSC-A"], apply_now=False)
+            .gate(gate, apply_now=False)
+            .transform("tlog", channels="B1-A", use_spln=False, apply_now=False)
+        )
+        with patch("FlowCytometryTools.core.pipeline._BLOCK_SIZE", 1000):
+            self._check_fused(queued)
+
+    def test_spline_after_gate(self):
+        gate = ThresholdGate(1000.0, "FSC-A", region="above")
+        queued = self.sample.gate(gate, apply_now=False).transform(
+            "hlog", channels=["Y2-A"], return_all=False, apply_now=False
+        )
+        self._check_fused(queued)
+
+    def test_subsample(self):
+        gate = ThresholdGate(1000.0, "FSC-A", region="above")
+        queued = (
+            self.sample.gate(gate, apply_now=False)
+            .subsample(0.5, order="start", apply_now=False)
+            .transform("glog", l=1, use_spln=False, apply_now=False)
+        )
+        self._check_fused(queued)
+
+    def test_empty_result(self):
+        gate = ThresholdGate(1e9, "FSC-A", region="above")
+        queued = self.sample.gate(gate, apply_now=False).transform(
+            "tlog", channels="FSC-A", return_all=False, use_spln=False, apply_now=False
+        )
+        self.assertEqual(queued.data.shape, (0, 1))
+
+    def test_peak_memory(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = write_synthetic_fcs(os.path.join(directory, "sample.fcs"), 10**5, seed=0)
+            sample = FCMeasurement(ID="sample", datafile=path)
+            nbytes = sample.read_data().values.nbytes
+            gate = ThresholdGate(1000.0, "FSC-A", region="above")
+            queued = sample.transform(
+                "tlog", channels=["FSC-A", "SSC-A"], use_spln=False, apply_now=False
+            ).gate(gate, apply_now=False)
+            self._check_fused(queued)
+            tracemalloc.start()
+            try:
+                execute_queue(queued, block_size=1000)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            # The file is read block by block, and the results of the blocks are
+            # written into a single output (instead of being concatenated).
+            self.assertLess(peak, 1.5 * nbytes)
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestChannelSummary(unittest.TestCase):
+    def setUp(self):
+        self.sample = FCMeasurement(ID="test", datafile=test_data_file)
+
+    def test_summary(self):
+        summary = self.sample.channel_summary(["FSC-A", "SSC-A"])
+        data = self.sample.data[["FSC-A", "SSC-A"]]
+        assert_allclose(summary.loc["count"], len(data))
+        assert_allclose(summary.loc["min"], data.min())
+        assert_allclose(summary.loc["max"], data.max())
+        assert_allclose(summary.loc["p99"], np.percentile(data.values, 99, axis=0))
+
+    def test_summary_is_stored(self):
+        self.sample.channel_summary()
+        stored = self.sample._summary
+        self.assertIsNotNone(stored)
+        assert_array_equal(self.sample.copy()._summary[1].values, stored[1].values)
+        self.assertIsNotNone(pickle.loads(pickle.dumps(self.sample))._summary)
+
+        gated = self.sample.gate(ThresholdGate(1000.0, "FSC-A", "above"))
+        self.assertIsNone(gated._summary)
+        self.assertGreater(gated.channel_summary("FSC-A").loc["min", "FSC-A"], 1000.0)
+
+        queued = self.sample.gate(ThresholdGate(1000.0, "FSC-A", "above"), apply_now=False)
+        self.assertGreater(queued.channel_summary("FSC-A").loc["min", "FSC-A"], 1000.0)
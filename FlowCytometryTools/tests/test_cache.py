@@ -0,0 +1,160 @@
+import os
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from FlowCytometryTools import (
+    FCMeasurement,
+    FCPlate,
+    ResultCache,
+    ThresholdGate,
+    test_data_dir,
+    test_data_file,
+)
+from FlowCytometryTools.core.cache import TransformCache, func_fingerprint, transform_cache
+from FlowCytometryTools.core.transforms import Transformation
+from pandas import DataFrame
+
+calls = []
+
+
+def median_fsc(data):
+    calls.append(1)
+    return data["FSC-A"].median()
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.plate = FCPlate.from_dir("plate", test_data_dir).dropna()
+        del calls[:]
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_apply_is_memoized(self):
+        expected = self.plate.apply(median_fsc, applyto="data")
+        n = len(calls)
+        first = self.plate.apply(median_fsc, applyto="data", cache=self.path)
+        self.assertEqual(len(calls), 2 * n)
+        second = self.plate.apply(median_fsc, applyto="data", cache=ResultCache(self.path))
+        self.assertEqual(len(calls), 2 * n)
+        assert_array_equal(first.values, expected.values)
+        assert_array_equal(second.values, expected.values)
+
+        # Queued actions are part of the key
+        gated = self.plate.gate(ThresholdGate(1000.0, "FSC-A", "above"), apply_now=False)
+        gated.apply(median_fsc, applyto="data", cache=self.path)
+        self.assertEqual(len(calls), 3 * n)
+
+    def test_func_fingerprint(self):
+        make = lambda t: (lambda x: x > t)
+        self.assertEqual(func_fingerprint(make(1)), func_fingerprint(make(1)))
+        self.assertNotEqual(func_fingerprint(make(1)), func_fingerprint(make(2)))
+        self.assertNotEqual(func_fingerprint(lambda x: x + 1), func_fingerprint(lambda x: x + 2))
+
+    def test_eviction(self):
+        cache = ResultCache(self.path, max_size=2500)
+        for i in range(10):
+            cache.set("key{}".format(i), b"x" * 1000)
+        self.assertLessEqual(cache.size, 2500)
+        self.assertTrue(cache.get("key9")[0])
+        self.assertFalse(cache.get("key0")[0])
+        cache.clear()
+        self.assertEqual(os.listdir(self.path), [])
+
+
+class TestTransformCache(unittest.TestCase):
+    def setUp(self):
+        transform_cache.clear()
+        transform_cache.reset_stats()
+
+    def tearDown(self):
+        transform_cache.clear()
+
+    def test_measurement(self):
+        sample = FCMeasurement(ID="sample", datafile=test_data_file)
+        first = sample.transform("hlog", channels=["FSC-A", "SSC-A"])
+        self.assertEqual(transform_cache.stats()["misses"], 1)
+        second = sample.transform("hlog", channels=["FSC-A", "SSC-A"])
+        self.assertEqual(transform_cache.stats()["hits"], 1)
+        assert_array_equal(second.data.values, first.data.values)
+        # The spline fitted to the data is set on a hit.
+        transformer = Transformation("hlog")
+        sample.transform(transformer, channels=["FSC-A", "SSC-A"])
+        self.assertIsNotNone(transformer.spln)
+        transformer = Transformation("hlog")
+        sample.transform(transformer, channels=["FSC-A", "SSC-A"])
+        self.assertEqual(transform_cache.stats()["hits"], 2)
+        self.assertIsNotNone(transformer.spln)
+        self.assertGreater(len(transformer.spline_table()["x"]), 0)
+        # The cached channels are copied.
+        second.transform("hlog", channels=["FSC-A"], inplace=True)
+        third = sample.transform("hlog", channels=["FSC-A", "SSC-A"])
+        assert_array_equal(third.data.values, first.data.values)
+
+        # Other parameters, or new data, are not hits.
+        sample.transform("hlog", channels=["FSC-A", "SSC-A"], b=100)
+        sample.set_data()
+        sample.transform("hlog", channels=["FSC-A", "SSC-A"])
+        self.assertEqual(transform_cache.stats()["hits"], 3)
+
+    def test_channels_are_not_copied_when_not_cached(self):
+        rng = np.random.default_rng(0)
+        values = rng.uniform(1, 2**18, size=(2, 2**20)).astype(np.float32)
+        data = DataFrame({"FSC-A": values[0], "SSC-A": values[1]})
+        sample = FCMeasurement(ID="large", readmeta=False)
+        sample.set_data(data)
+        channel_bytes = data["FSC-A"].values.nbytes
+        max_bytes, transform_cache.max_bytes = transform_cache.max_bytes, channel_bytes
+        try:
+            tracemalloc.start()
+            try:
+                sample.transform(
+                    "tlog",
+                    channels=["FSC-A", "SSC-A"],
+                    auto_range=False,
+                    use_spln=False,
+                    inplace=True,
+                )
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            self.assertLess(peak, channel_bytes)
+            # Channels larger than the cache are not copied into it either.
+            sample.transform("tlog", channels=["FSC-A", "SSC-A"], auto_range=False, use_spln=False)
+            self.assertEqual(transform_cache.stats()["entries"], 0)
+        finally:
+            transform_cache.max_bytes = max_bytes
+
+    def test_collection(self):
+        plate = FCPlate.from_dir("plate", test_data_dir).dropna()
+        first = plate.transform("hlog", channels=["FSC-A"])
+        second = plate.transform("hlog", channels=["FSC-A"])
+        self.assertEqual(transform_cache.stats()["hits"], len(plate))
+        for key in plate:
+            assert_array_equal(second[key].data.values, first[key].data.values)
+
+    def test_fingerprint(self):
+        hlog = Transformation("hlog", b=100)
+        self.assertEqual(hlog.fingerprint(), Transformation("hlog", b=100).fingerprint())
+        self.assertNotEqual(hlog.fingerprint(), Transformation("hlog", b=10).fingerprint())
+        self.assertNotEqual(hlog.fingerprint(), hlog.inverse.fingerprint())
+        fingerprint = hlog.fingerprint()
+        hlog.set_spline(-100, 1000)
+        self.assertNotEqual(hlog.fingerprint(), fingerprint)
+        self.assertEqual(hlog.fingerprint(spline=False), fingerprint)
+
+    def test_eviction(self):
+        cache = TransformCache(max_bytes=2500)
+        for i in range(10):
+            cache.set(i, "value", 1000)
+        self.assertEqual(cache.get(9), "value")
+        self.assertIsNone(cache.get(0))
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["used"], stats["evictions"]), (2, 2000, 8))
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+from numpy.testing import assert_array_equal
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+from FlowCytometryTools import FCMeasurement, ThresholdGate, test_data_file
+from FlowCytometryTools.core.compression import CompressedFrame, can_compress
+
+
+class TestCompressedFrame(unittest.TestCase):
+    def setUp(self):
+        sample = FCMeasurement(ID="sample", datafile=test_data_file)
+        self.data = sample.data
+        self.gated = sample.gate(ThresholdGate(1000.0, "FSC-A", region="above")).data
+
+    def test_round_trip(self):
+        for codec in ("zlib", "lzma"):
+            for frame in (self.data, self.gated):
+                compressed = CompressedFrame(frame, codec=codec)
+                assert_frame_equal(compressed.to_frame(), frame)
+                self.assertLess(compressed.nbytes, compressed.raw_nbytes)
+                self.assertGreater(compressed.ratio, 1)
+
+    def test_columns(self):
+        compressed = CompressedFrame(self.gated)
+        assert_series_equal(compressed.column("SSC-A"), self.gated["SSC-A"])
+        columns = ["HDR-T", "FSC-A"]
+        assert_frame_equal(compressed.to_frame(columns), self.gated[columns])
+
+    def test_mixed_dtypes(self):
+        frame = DataFrame(
+            {
+                "a": np.arange(100, dtype=np.int16),
+                "b": np.linspace(0, 1, 100),
+                "c": np.arange(100) % 3 == 0,
+            },
+            index=np.arange(100) * 2.5,
+        )
+        assert_frame_equal(CompressedFrame(frame, level=9).to_frame(), frame)
+        self.assertFalse(can_compress(frame.assign(d="text")))
+        with self.assertRaises(ValueError):
+            CompressedFrame(frame, codec="gzip")
+
+    def test_measurement(self):
+        sample = FCMeasurement(ID="sample", datafile=test_data_file)
+        sample.set_data()
+        self.assertIsNotNone(sample._compress())
+        self.assertIsNone(sample._data)
+        self.assertLess(sample.memory_usage(), self.data.memory_usage().sum())
+        # Channels are decompressed without decompressing the data.
+        assert_array_equal(sample["FSC-A"].values, self.data["FSC-A"].values)
+        self.assertIn("FSC-A", sample)
+        self.assertIsNone(sample._data)
+        assert_frame_equal(sample.data, self.data)
+        self.assertIsNone(sample._compressed)
+
+
+if __name__ == "__main__":
+    unittest.main()
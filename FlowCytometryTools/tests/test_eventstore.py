@@ -0,0 +1,36 @@
+import unittest
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from FlowCytometryTools import FCPlate, ThresholdGate, test_data_dir
+
+
+class TestEventStore(unittest.TestCase):
+    def setUp(self):
+        self.plate = FCPlate.from_dir("plate", test_data_dir).dropna()
+
+    def test_concat(self):
+        events = self.plate.concat(["FSC-A", "SSC-A"], ids=["A3", "B3", "A4"])
+        self.assertTrue(events.values.flags.f_contiguous)
+        self.assertEqual(events.keys, ["A3", "B3", "A4"])
+        for key in events.keys:
+            assert_array_equal(events.get_data(key).values, self.plate[key].data[["FSC-A", "SSC-A"]].values)
+            self.assertTrue(np.shares_memory(events.get_data(key).values, events.values))
+        labels = events.labels
+        self.assertEqual(list(labels.categories), ["A3", "B3", "A4"])
+        self.assertEqual((labels == "B3").sum(), self.plate["B3"].counts)
+
+    def test_mask_maps_back(self):
+        gate = ThresholdGate(1000.0, "FSC-A", "above")
+        events = self.plate.concat()
+        mask = events.values[:, events.channels.index("FSC-A")] > 1000.0
+        self.assertEqual(set(events.split(mask)), set(events.keys))
+        gated = events.to_collection(mask)
+        expected = self.plate.gate(gate)
+        assert_array_equal(gated.counts().values, expected.counts().values)
+        assert_array_equal(gated["A3"].data.index, expected["A3"].data.index)
+        self.assertRaises(ValueError, events.split, mask[:-1])
+
+        views = events.to_collection()
+        self.assertTrue(np.shares_memory(views["A3"].data.values, events.values))
@@ -1,8 +1,10 @@
 import unittest
 
+import numpy as np
 import pandas as pd
+from numpy.testing import assert_array_almost_equal, assert_array_equal
 
-from FlowCytometryTools.core.gates import IntervalGate
+from FlowCytometryTools.core.gates import EllipseGate, IntervalGate, PolyGate, RectangleGate
 
 
 def _get_indexes_where_true(bool_series):
@@ -44,3 +46,45 @@ class TestGates(unittest.TestCase):
         empty_df = pd.DataFrame({'channel': []}, index=[])
         gate = IntervalGate((0, 1), ['channel'], 'in')
         self.assertEqual(_get_indexes_where_true(gate._identify(empty_df)), [])
+
+    def test_rectangle_gate(self):
+        test_df = pd.DataFrame({'x': [0.0, 1.0, 2.0, 1.0], 'y': [0.0, 1.0, 1.0, 3.0]})
+        gate = RectangleGate([(2.0, 2.0), (0.5, 0.5)], ('x', 'y'), 'in')
+        self.assertEqual(gate._identify(test_df).tolist(), [False, True, True, False])
+        gate = RectangleGate([(0.5, 0.5), (2.0, 2.0)], ('x', 'y'), 'out')
+        self.assertEqual(gate._identify(test_df).tolist(), [True, False, False, True])
+        # Same events as the equivalent polygon
+        poly = PolyGate([(0.5, 0.5), (2.5, 0.5), (2.5, 2.5), (0.5, 2.5)], ('x', 'y'), 'in')
+        rectangle = RectangleGate([(0.5, 0.5), (2.5, 2.5)], ('x', 'y'), 'in')
+        assert_array_equal(rectangle._identify(test_df), poly._identify(test_df))
+        with self.assertRaises(ValueError):
+            RectangleGate([(0.5, 0.5)], ('x', 'y'))
+
+    def test_ellipse_gate(self):
+        theta = np.linspace(0, 2 * np.pi, 200, endpoint=False)
+        test_df = pd.DataFrame({'x': np.r_[1.5 * np.cos(theta), 2.5 * np.cos(theta)],
+                                'y': np.r_[1.5 * np.sin(theta), 2.5 * np.sin(theta)]})
+        test_df += [1.0, 2.0]
+        # A circle of radius 2 around (1, 2)
+        gate = EllipseGate((1.0, 2.0), ('x', 'y'), covariance=[[4.0, 0.0], [0.0, 4.0]])
+        expected = [True] * 200 + [False] * 200
+        self.assertEqual(gate._identify(test_df).tolist(), expected)
+
+        rng = np.random.RandomState(0)
+        test_df = pd.DataFrame(rng.uniform(-5, 5, size=(1000, 2)), columns=['x', 'y'])
+        gate = EllipseGate((0.5, -0.5), ('x', 'y'), axes=(4.0, 1.0), angle=30.0)
+        # Same events as a polygon of many vertices along the ellipse
+        (a, b), angle = gate.axes_angle
+        self.assertAlmostEqual(angle, 30.0)
+        assert_array_almost_equal((a, b), (4.0, 1.0))
+        theta = np.linspace(0, 2 * np.pi, 10000, endpoint=False)
+        x, y = a * np.cos(theta), b * np.sin(theta)
+        c, s = np.cos(np.radians(angle)), np.sin(np.radians(angle))
+        poly = PolyGate(list(zip(c * x - s * y + 0.5, s * x + c * y - 0.5)), ('x', 'y'))
+        assert_array_equal(gate._identify(test_df), poly._identify(test_df))
+        assert_array_equal((~gate)._identify(test_df), ~poly._identify(test_df))
+
+        with self.assertRaises(ValueError):
+            EllipseGate((0.0, 0.0), ('x', 'y'))
+        with self.assertRaises(ValueError):
+            EllipseGate((0.0, 0.0), ('x', 'y'), covariance=[[1.0, 2.0], [2.0, 1.0]])
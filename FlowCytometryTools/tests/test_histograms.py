@@ -0,0 +1,106 @@
+import unittest
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+import pylab as pl
+from numpy.testing import assert_array_equal
+
+from FlowCytometryTools import FCMeasurement, FCPlate, ThresholdGate, test_data_dir, test_data_file
+from FlowCytometryTools.core import histograms
+
+
+class TestHistograms(unittest.TestCase):
+    def test_matches_numpy(self):
+        rng = np.random.default_rng(0)
+        values = rng.normal(size=(10000, 2))
+        edges = [np.linspace(-2, 2, 51), np.r_[-3, np.linspace(-1, 1, 20), 3]]
+        expected, _, _ = np.histogram2d(values[:, 0], values[:, 1], bins=edges)
+        assert_array_equal(histograms.histogram(values, edges), expected)
+        expected, _ = np.histogram(values[:, 0], bins=edges[0])
+        assert_array_equal(histograms.histogram(values[:, 0], edges[:1]), expected)
+
+    def test_bin_index_edge_values(self):
+        # Uniform bins, in which the scaled value just below hi rounds up to nbins.
+        edges = np.linspace(-9.9, 6.3, 41)
+        lo, hi = edges[0], edges[-1]
+        values = np.r_[lo, np.nextafter(lo, hi), np.nextafter(hi, lo), hi]
+        assert_array_equal(histograms.bin_index(values, edges), [0, 0, 39, 39])
+        values = np.r_[np.nextafter(lo, -np.inf), np.nextafter(hi, np.inf), np.nan]
+        assert_array_equal(histograms.bin_index(values, edges), [-1, -1, -1])
+
+    def test_measurement_histogram_is_cached(self):
+        sample = FCMeasurement(ID="test", datafile=test_data_file)
+        edges = [np.linspace(0, 10000, 101)]
+        counts = histograms.measurement_histogram(sample, ["FSC-A"], edges)
+        expected, _ = np.histogram(sample.data["FSC-A"], bins=edges[0])
+        assert_array_equal(counts, expected)
+        self.assertIs(histograms.measurement_histogram(sample, ["FSC-A"], edges), counts)
+
+    def test_pairwise_histograms(self):
+        sample = FCMeasurement(ID="test", datafile=test_data_file)
+        channels = ["FSC-A", "SSC-A", "V2-A"]
+        edges = [np.linspace(0, 5000, 31), np.linspace(0, 5000, 21), np.linspace(0, 1000, 11)]
+        counts = histograms.pairwise_histograms(sample, channels, edges, n_jobs=2)
+        values = sample.data[channels].values
+        for i in range(3):
+            assert_array_equal(counts[i], histograms.histogram(values[:, i], [edges[i]]))
+            for j in range(i + 1, 3):
+                expected = histograms.histogram(values[:, [i, j]], [edges[i], edges[j]])
+                assert_array_equal(counts[(i, j)], expected)
+        pl.figure()
+        sample.view(channels, bins=50, n_jobs=2)
+        pl.close("all")
+
+    def test_plate_plot(self):
+        plate = FCPlate.from_dir("plate", test_data_dir).dropna()
+        gate = ThresholdGate(1000.0, "FSC-A", "above")
+        pl.figure()
+        plate.plot("FSC-A", bins=50, gates=gate, n_jobs=2)
+        pl.close("all")
+        pl.figure()
+        plate.plot(["FSC-A", "SSC-A"], bins=[30, np.linspace(0, 10000, 40)], ids=["A3", "B3"])
+        pl.close("all")
+        counts = [well._histogram_cache for k, well in plate.items() if k in ("A3", "B3")]
+        self.assertTrue(all(len(c) == 2 for c in counts))
+
+    def test_shared_edges(self):
+        plate = FCPlate.from_dir("plate", test_data_dir).dropna()
+        channels = ["FSC-A", "SSC-A"]
+        edges = histograms.shared_edges(plate.values(), channels, 50)
+        for e, channel in zip(edges, channels):
+            values = np.concatenate([well.data[channel].values for well in plate.values()])
+            assert_array_equal(e, histograms.range_edges(values, 50))
+        # An array of edges is shared by both channels rather than split into scalars.
+        bins = np.linspace(0, 10000, 40)
+        sample = plate["A3"]
+        sample._histogram_cache = None
+        pl.figure()
+        plate.plot(channels, bins=bins, ids=["A3"])
+        pl.close("all")
+        self.assertEqual(list(sample._histogram_cache.values())[0].shape, (39, 39))
+
+    def test_density_scatter(self):
+        sample = FCMeasurement(ID="test", datafile=test_data_file)
+        pl.figure()
+        image = sample.plot(["FSC-A", "SSC-A"], kind="density_scatter", resolution=40)
+        counts = histograms.histogram(
+            sample.data[["FSC-A", "SSC-A"]].values,
+            [
+                histograms.range_edges(sample.data["FSC-A"], 40),
+                histograms.range_edges(sample.data["SSC-A"], 40),
+            ],
+        )
+        assert_array_equal(image.get_array().filled(0).T, counts)
+        data = sample.data[["FSC-A", "SSC-A"]] * 0 + [1.0, 1.0]
+        data.iloc[:10] = [2.0, 2.0]
+        data["V2-A"] = 1.0
+        data.iloc[:10, 2] = 5.0
+        sample.data = data
+        image = sample.plot(
+            ["FSC-A", "SSC-A"], kind="scatter", rasterize=True, color_by="V2-A", resolution=2
+        )
+        assert_array_equal(image.get_array().filled(0), [[1.0, 0.0], [0.0, 5.0]])
+        pl.close("all")
@@ -1,9 +1,40 @@
 """Shallow tests that at least attempt to import some code."""
+import os
+import subprocess
+import sys
 import unittest
 
+_import_check = """
+import sys, time
+import numpy, pandas, fcsparser
+start = time.time()
+import FlowCytometryTools
+from FlowCytometryTools import FCMeasurement, ThresholdGate, PolyGate
+from FlowCytometryTools.core import transforms
+print(time.time() - start)
+print(' '.join(m for m in ('matplotlib', 'pylab', 'scipy') if m in sys.modules))
+"""
+
 
 class TestImports(unittest.TestCase):
     def test_imports(self):
         from FlowCytometryTools.gui import dialogs, fc_widget  # noqa
         from FlowCytometryTools.core import (graph, gates, bases, containers, docstring,
                                              transforms)  # noqa
+
+    def test_import_is_lazy(self):
+        """Plotting and scipy are only imported when used, so importing the package is cheap."""
+        import FlowCytometryTools
+
+        root = os.path.dirname(os.path.dirname(os.path.abspath(FlowCytometryTools.__file__)))
+        output = subprocess.check_output([sys.executable, "-c", _import_check], cwd=root)
+        elapsed, heavy = output.decode().split("\n")[:2]
+        self.assertEqual(heavy, "")
+        self.assertLess(float(elapsed), 0.5)
+
+    def test_lazy_attributes(self):
+        import FlowCytometryTools
+        from FlowCytometryTools.core import graph
+
+        self.assertIs(FlowCytometryTools.graph, graph)
+        self.assertIs(FlowCytometryTools.plotFCM, graph.plotFCM)
@@ -0,0 +1,80 @@
+import pickle
+import unittest
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from FlowCytometryTools import (
+    EllipseGate,
+    FCMeasurement,
+    IntervalGate,
+    ThresholdGate,
+    test_data_file,
+)
+from FlowCytometryTools.core.membership import Membership, popcount
+
+calls = []
+
+
+class CountingGate(ThresholdGate):
+    def _identify(self, dataframe):
+        calls.append(1)
+        return super(CountingGate, self)._identify(dataframe)
+
+
+class TestMembership(unittest.TestCase):
+    def setUp(self):
+        self.sample = FCMeasurement(ID="sample", datafile=test_data_file)
+        del calls[:]
+        self.gates = [
+            CountingGate(1000.0, "FSC-A", region="above", name="fsc"),
+            IntervalGate((500.0, 3000.0), "SSC-A", region="in", name="ssc"),
+            EllipseGate((2000.0, 2000.0), ("FSC-A", "SSC-A"), axes=(2000.0, 800.0),
+                        angle=45.0, name="ellipse"),
+        ]
+
+    def test_queries(self):
+        membership = self.sample.membership(self.gates)
+        self.assertEqual(membership.shape, (self.sample.counts, 3))
+        self.assertEqual(membership.nbytes, 3 * -(-self.sample.counts // 8))
+        data = self.sample.data
+        masks = {gate.name: np.asarray(gate._identify(data)) for gate in self.gates}
+        fsc, ssc, ellipse = self.gates
+        self.assertEqual(membership.counts()["fsc"], self.sample.gate(fsc).counts)
+        for name, mask in masks.items():
+            self.assertEqual(membership.counts()[name], mask.sum())
+            assert_array_equal(membership.mask(name), mask)
+        queries = (
+            (fsc & ssc, masks["fsc"] & masks["ssc"]),
+            (fsc | ~ellipse, masks["fsc"] | ~masks["ellipse"]),
+            (~(fsc ^ ssc), ~(masks["fsc"] ^ masks["ssc"])),
+        )
+        for query, expected in queries:
+            self.assertEqual(membership.count(query), expected.sum())
+            assert_array_equal(membership.mask(query), expected)
+        intersections = membership.intersections()
+        self.assertEqual(intersections.loc["fsc", "ssc"], (masks["fsc"] & masks["ssc"]).sum())
+        assert_array_equal(np.diag(intersections), membership.counts())
+        assert_array_equal(membership.to_frame(index=data.index)["ellipse"], masks["ellipse"])
+        with self.assertRaises(KeyError):
+            membership.count("unknown")
+
+    def test_gates_are_evaluated_once(self):
+        self.sample.membership(self.gates)
+        self.sample.membership(self.gates[:1])
+        self.assertEqual(len(calls), 1)
+
+        # Kept when pickled, dropped with new data (e.g., gated data).
+        unpickled = pickle.loads(pickle.dumps(self.sample))
+        self.assertEqual(len(unpickled._membership[1]), 3)
+        gated = self.sample.gate(self.gates[1])
+        self.assertIsNone(gated._membership)
+        membership = gated.membership(self.gates)
+        self.assertEqual(membership.count("ssc"), gated.counts)
+
+    def test_padding(self):
+        membership = Membership.from_masks(["a", "b"], [[True] * 5 + [False] * 6, [True] * 11])
+        self.assertEqual(membership.bits.shape, (2, 2))
+        self.assertEqual(membership.count("a"), 5)
+        self.assertEqual(popcount(membership._invert(membership.packed("b"))), 0)
+        self.assertEqual(popcount(membership._invert(membership.packed("a"))), 6)
@@ -0,0 +1,105 @@
+import pickle
+import unittest
+
+from numpy.testing import assert_array_equal
+
+from FlowCytometryTools import FCPlate, ThresholdGate, test_data_dir
+from FlowCytometryTools.core.memory import MemoryBudget, parse_size
+
+
+class TestMemoryBudget(unittest.TestCase):
+    def setUp(self):
+        self.gate = ThresholdGate(1000.0, "FSC-A", region="above")
+        plate = FCPlate.from_dir("plate", test_data_dir)
+        plate.set_data()
+        self.well_size = plate["A3"].memory_usage()
+        self.expected = plate.transform("hlog", channels=["FSC-A", "SSC-A"]).gate(self.gate)
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("2GB"), 2**31)
+        self.assertEqual(parse_size("1.5 kb"), 1536)
+        self.assertEqual(parse_size(100), 100)
+        with self.assertRaises(ValueError):
+            parse_size("lots")
+
+    def test_eviction(self):
+        budget = 3 * self.well_size
+        plate = FCPlate.from_dir("plate", test_data_dir, memory_budget=budget)
+        plate.set_data()
+        self.assertLessEqual(plate.memory_usage().sum().sum(), budget)
+
+        gated = plate.transform("hlog", channels=["FSC-A", "SSC-A"]).gate(self.gate)
+        self.assertEqual(gated.memory_budget, budget)
+        self.assertLessEqual(plate._budget.used, budget)
+        evicted = [key for key in gated if gated[key]._evicted]
+        self.assertTrue(evicted)
+        # Evicted data is read again, replaying the transformation and the gate.
+        for key in gated:
+            assert_array_equal(gated[key].data.values, self.expected[key].data.values)
+            self.assertEqual(len(gated[key].history), len(self.expected[key].history))
+
+        # Pickles get a budget of the same size.
+        unpickled = pickle.loads(pickle.dumps(gated))
+        self.assertEqual(unpickled.memory_budget, budget)
+        assert_array_equal(unpickled[evicted[0]].data.values, self.expected[evicted[0]].data.values)
+
+    def test_compression(self):
+        budget = MemoryBudget(3 * self.well_size, compression="zlib")
+        plate = FCPlate.from_dir("plate", test_data_dir, memory_budget=budget)
+        gated = plate.transform("hlog", channels=["FSC-A", "SSC-A"]).gate(self.gate)
+        self.assertIs(gated._budget, budget)
+        compressed = [key for key in gated if gated[key]._compressed is not None]
+        self.assertTrue(compressed)
+        self.assertLessEqual(budget.used, budget.max_bytes)
+
+        stats = gated.memory_stats()
+        self.assertGreaterEqual(stats["compressions"], len(compressed))
+        self.assertGreater(stats["compression_ratio"], 1)
+        for key in gated:
+            assert_array_equal(gated[key]["SSC-A"].values, self.expected[key]["SSC-A"].values)
+            assert_array_equal(gated[key].data.values, self.expected[key].data.values)
+        stats = gated.memory_stats()
+        self.assertGreaterEqual(stats["compressed_hits"], 2 * len(compressed))
+        self.assertLessEqual(stats["misses"], stats["evictions"])
+
+        unpickled = pickle.loads(pickle.dumps(gated))
+        self.assertEqual(unpickled._budget.compression, "zlib")
+
+    def test_seeded_subsample_is_evicted(self):
+        expected = FCPlate.from_dir("plate", test_data_dir).subsample(100, seed=0)
+        plate = FCPlate.from_dir("plate", test_data_dir, memory_budget=1)
+        sampled = plate.subsample(100, seed=0)
+        for key in sampled:
+            sampled[key].data
+        evicted = [key for key in sampled if sampled[key]._evicted]
+        self.assertTrue(evicted)
+        # Evicted subsamples are read again, drawing the same events.
+        for key in sampled:
+            assert_array_equal(sampled[key].data.values, expected[key].data.values)
+
+    def test_data_that_cannot_be_read_again_is_kept(self):
+        plate = FCPlate.from_dir("plate", test_data_dir, memory_budget=1)
+        plate["A4"] = plate["A4"].subsample(100, seed=0)
+        sample = plate["A3"].subsample(100)  # random, without a seed
+        plate["A3"] = sample
+        # The most recently used measurement is kept even when over budget.
+        plate["A4"].data
+        self.assertEqual(plate["A3"].memory_usage(), sample.memory_usage())
+        self.assertGreater(plate["A4"].memory_usage(), 0)
+        plate["A3"].data
+        self.assertEqual(plate["A4"].memory_usage(), 0)
+        self.assertEqual(len(plate["A4"].data), 100)
+
+    def test_clear_measurement_data(self):
+        plate = FCPlate.from_dir("plate", test_data_dir)
+        gated = plate.gate(self.gate)
+        gated.clear_measurement_data(ids=["A3"])
+        usage = gated.memory_usage(output_format="dict")
+        self.assertEqual(usage["A3"], 0)
+        self.assertGreater(usage["A4"], 0)
+        # The gate is applied again to the data read from the datafile.
+        assert_array_equal(gated["A3"].data.values, plate["A3"].gate(self.gate).data.values)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from FlowCytometryTools import FCMeasurement, ThresholdGate, profile, test_data_file
+from FlowCytometryTools.core import profiling
+
+
+class TestProfile(unittest.TestCase):
+    def setUp(self):
+        self.gate = ThresholdGate(1000.0, "FSC-A", region="above")
+
+    def test_report(self):
+        with profile() as prof:
+            sample = FCMeasurement(ID="sample", datafile=test_data_file)
+            sample.transform("hlog", channels=["FSC-A"]).gate(self.gate)
+        report = prof.report()
+        for name in ("read", "read_meta", "transform", "gate", "copy"):
+            self.assertIn(name, report.index.get_level_values("stage"))
+        self.assertEqual(report.loc[("read", "sample"), "calls"], 1)
+        self.assertEqual(
+            report.loc[("read", "sample"), "bytes"], os.path.getsize(test_data_file)
+        )
+        # Gating applies the gate within the gate stage of the measurement: counted once.
+        self.assertEqual(report.loc[("gate", "sample"), "calls"], 1)
+        self.assertGreater(report.loc[("transform", "sample"), "peak_memory"], 0)
+        self.assertTrue((report["time"] >= 0).all())
+
+        by_stage = prof.report(by="stage")
+        self.assertEqual(by_stage["calls"].sum(), len(prof.events))
+
+    def test_disabled(self):
+        sample = FCMeasurement(ID="sample", datafile=test_data_file)
+        prof = profile(memory=False)
+        sample.gate(self.gate)
+        self.assertEqual(len(prof.events), 0)
+        self.assertEqual(profiling._active, [])
+
+    def test_decorator_and_streaming(self):
+        prof = profile(memory=False)
+
+        @prof
+        def read_blocks(sample):
+            return sum(len(block) for block in sample.iter_data(chunksize=1000))
+
+        sample = FCMeasurement(ID="sample", datafile=test_data_file)
+        num_events = read_blocks(sample)
+        report = prof.report()
+        self.assertEqual(report.loc[("read", "sample"), "calls"], -(-num_events // 1000) + 1)
+        self.assertGreater(report.loc[("read", "sample"), "bytes"], 0)
+        self.assertTrue(prof.events["peak_memory"].isnull().all())
+
+    def test_chrome_trace(self):
+        directory = tempfile.mkdtemp()
+        try:
+            sample = FCMeasurement(ID="sample", datafile=test_data_file)
+            with profile() as prof:
+                sample.gate(self.gate)
+            path = os.path.join(directory, "trace.json")
+            prof.to_chrome_trace(path)
+            with open(path) as f:
+                trace = json.load(f)
+        finally:
+            shutil.rmtree(directory)
+        events = trace["traceEvents"]
+        self.assertEqual(len(events), len(prof.events))
+        self.assertTrue(all(e["ph"] == "X" and e["dur"] >= 0 for e in events))
+        self.assertIn("sample", [e["args"]["ID"] for e in events])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+from numpy.testing import assert_array_equal
+
+from FlowCytometryTools import FCMeasurement, FCPlate, parse_fcs, test_data_dir, test_data_file
+from FlowCytometryTools.core.fcsio import iter_fcs_blocks
+from FlowCytometryTools.core.sampling import subsample_data
+from FlowCytometryTools.core.utils import get_files
+
+
+class TestSubsample(unittest.TestCase):
+    def setUp(self):
+        # Use a non-unique index to make sure that sampling is position based.
+        self.data = pd.DataFrame({"x": np.arange(1000)}, index=np.arange(1000) % 10)
+
+    def test_random_is_reproducible(self):
+        a = subsample_data(self.data, 100, seed=1)
+        b = subsample_data(self.data, 100, rng=np.random.default_rng(1))
+        c = subsample_data(self.data, 100, seed=2)
+        self.assertEqual(len(a), 100)
+        self.assertEqual(len(np.unique(a["x"])), 100)
+        assert_array_equal(a["x"], b["x"])
+        self.assertFalse(np.array_equal(a["x"], c["x"]))
+
+    def test_keep_order(self):
+        result = subsample_data(self.data, 0.2, seed=0, keep_order=True)
+        self.assertEqual(len(result), 200)
+        self.assertTrue(np.all(np.diff(result["x"].values) > 0))
+
+    def test_start_end(self):
+        assert_array_equal(subsample_data(self.data, 3, order="start")["x"], [0, 1, 2])
+        assert_array_equal(subsample_data(self.data, 2, order="end")["x"], [998, 999])
+        self.assertEqual(len(subsample_data(self.data, 0)), 0)
+        with self.assertRaises(ValueError):
+            subsample_data(self.data, 1, order="middle")
+
+    def test_subsamples_do_not_alias_data(self):
+        for key, order in ((3, "start"), (2, "end"), (slice(10, 20), "start")):
+            result = subsample_data(self.data, key, order=order)
+            result["x"].values[:] = -1
+            assert_array_equal(self.data["x"], np.arange(1000))
+
+    def test_collection_streams(self):
+        plate = FCPlate.from_dir("plate", test_data_dir).dropna()
+        a = plate.subsample(50, seed=3)
+        b = plate.subsample(50, seed=3)
+        small = plate.filter_by_key(["A3", "B3"]).subsample(50, seed=3)
+        for k in plate:
+            assert_array_equal(a[k].data.values, b[k].data.values)
+        # The stream of a well does not depend on the other wells.
+        assert_array_equal(a["A3"].data.values, small["A3"].data.values)
+        self.assertFalse(np.array_equal(a["A3"].data.values, a["B3"].data.values))
+
+
+class TestReservoirAndDensity(unittest.TestCase):
+    def test_reservoir_streams_from_file(self):
+        sample = FCMeasurement(ID="test", datafile=test_data_file)
+        data = sample.data
+        lazy = FCMeasurement(ID="test", datafile=test_data_file)
+        result = lazy.subsample(500, order="reservoir", seed=0, keep_order=True)
+        self.assertIsNone(lazy._data)
+        self.assertEqual(result.shape, (500, data.shape[1]))
+        # Every sampled event is an event of the original data.
+        assert_array_equal(result.data.values, data.values[result.data.index])
+        self.assertTrue(np.all(np.diff(result.data.index) > 0))
+        again = lazy.subsample(500, order="reservoir", seed=0, keep_order=True)
+        assert_array_equal(result.data.values, again.data.values)
+
+    def test_channel_naming_is_not_streamed(self):
+        sample = FCMeasurement(
+            ID="test", datafile=test_data_file, readdata_kwargs={"channel_naming": "$PnN"}
+        )
+        # The blocks are labeled from the meta, which may not follow channel_naming.
+        self.assertFalse(sample._can_stream())
+        blocks = list(sample.iter_data(chunksize=1000))
+        self.assertEqual(list(blocks[0].columns), list(sample.data.columns))
+
+    def test_reservoir_in_memory(self):
+        data = pd.DataFrame({"x": np.arange(10**5)})  # More than one block
+        result = subsample_data(data, 0.01, order="reservoir", seed=0)
+        self.assertEqual(len(result), 1000)
+        self.assertEqual(len(np.unique(result["x"])), 1000)
+        with self.assertRaises(ValueError):
+            subsample_data(data.iloc[:10], 11, order="reservoir")
+
+    def test_density_preserves_rare_population(self):
+        rng = np.random.default_rng(0)
+        common = rng.normal(0, 1, size=(100000, 2))
+        rare = rng.normal(10, 0.5, size=(100, 2))
+        data = pd.DataFrame(np.r_[common, rare], columns=["a", "b"])
+        result = subsample_data(data, 2000, order="density", seed=1, density_bins=20)
+        self.assertEqual(len(result), 2000)
+        num_rare = (result["a"] > 5).sum()
+        # Uniform sampling would keep ~2 rare events
+        self.assertGreater(num_rare, 50)
+
+    def test_fcs_blocks_match_parser(self):
+        for path in get_files(os.path.join(test_data_dir, ".."), "*.fcs"):
+            meta, data = parse_fcs(path)
+            names = parse_fcs(path, meta_data_only=True, reformat_meta=True)["_channel_names_"]
+            blocks = list(iter_fcs_blocks(path, names, 3000))
+            assert_array_equal(pd.concat(blocks).values, data.values)
@@ -0,0 +1,39 @@
+import pickle
+import unittest
+
+from numpy.testing import assert_array_equal
+
+from FlowCytometryTools import FCMeasurement, FCPlate, ThresholdGate, test_data_dir, test_data_file
+
+
+class TestSharedData(unittest.TestCase):
+    def test_measurement(self):
+        sample = FCMeasurement(ID="test", datafile=test_data_file)
+        gated = sample.gate(ThresholdGate(1000.0, "FSC-A", "above"))
+        shared = gated.share()
+        try:
+            self.assertEqual(len(shared.history), len(gated.history))
+            # Only a handle is pickled
+            self.assertLess(len(pickle.dumps(shared)), len(pickle.dumps(gated.data)) // 4)
+            restored = pickle.loads(pickle.dumps(shared))
+            assert_array_equal(restored.data.values, gated.data.values)
+            assert_array_equal(restored.data.index, gated.data.index)
+            self.assertFalse(restored.data.values.flags.writeable)
+
+            # Operations on shared data create private copies
+            transformed = shared.transform("hlog", channels=["FSC-A"])
+            self.assertIsNone(transformed._shared)
+            assert_array_equal(shared.data.values, gated.data.values)
+        finally:
+            shared.release()
+        self.assertIsNone(shared._shared)
+        assert_array_equal(shared.data.values, gated.data.values)
+
+    def test_collection(self):
+        plate = FCPlate.from_dir("plate", test_data_dir).dropna()
+        shared = plate.share()
+        try:
+            restored = pickle.loads(pickle.dumps(shared))
+            assert_array_equal(restored.counts().values, plate.counts().values)
+        finally:
+            shared.release()
@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+from FlowCytometryTools import FCPlate, ThresholdGate, test_data_dir
+from FlowCytometryTools.core.stats import compute_stats, percentiles
+
+
+class TestStats(unittest.TestCase):
+    def test_percentiles_match_numpy(self):
+        rng = np.random.default_rng(0)
+        values = rng.normal(size=(1001, 3))
+        values[::7, 2] = np.nan
+        qs = [0, 1, 15.87, 50, 99.5, 100]
+        expected = np.nanpercentile(values, qs, axis=0)
+        assert_allclose(percentiles(values, qs), expected)
+
+    def test_compute_stats(self):
+        rng = np.random.default_rng(1)
+        values = rng.lognormal(size=(5000, 2))
+        result = compute_stats(values, ["count", "mean", "median", "geomean", "cv", "rCV", "p99"])
+        assert_allclose(result["count"], 5000)
+        assert_allclose(result["median"], np.median(values, axis=0))
+        assert_allclose(result["geomean"], np.exp(np.log(values).mean(axis=0)))
+        assert_allclose(result["cv"], 100 * values.std(axis=0, ddof=1) / values.mean(axis=0))
+        p = np.percentile(values, [15.87, 50, 84.13], axis=0)
+        assert_allclose(result["rCV"], 50 * (p[2] - p[0]) / p[1])
+        self.assertRaises(ValueError, compute_stats, values, ["mode"])
+        empty = compute_stats(np.empty((0, 2)), ["count", "min", "median"])
+        assert_allclose(empty["count"], 0)
+        self.assertTrue(np.isnan(empty["min"]).all())
+
+    def test_plate_stats(self):
+        plate = FCPlate.from_dir("plate", test_data_dir).dropna()
+        gate = ThresholdGate(1000.0, "FSC-A", "above")
+        tidy = plate.stats(["FSC-A", "Y2-A"], stats=["count", "median"], gate=gate, n_jobs=2)
+        self.assertEqual(list(tidy.columns), ["key", "channel", "stat", "value"])
+        self.assertEqual(len(tidy), len(plate) * 4)
+
+        layouts = plate.stats("Y2-A", stats=["median"], gate=gate, output_format="layout")
+        expected = plate.gate(gate).apply(lambda x: x.data["Y2-A"].median())
+        assert_allclose(layouts["Y2-A", "median"].values, expected.values, rtol=1e-6)
+        medians = tidy[(tidy.channel == "Y2-A") & (tidy.stat == "median")]
+        for key, value in zip(medians.key, medians.value):
+            self.assertAlmostEqual(value, expected.loc[key[0], int(key[1:])], delta=1e-3)
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+
+from FlowCytometryTools import FCMeasurement, FCPlate, parse_fcs
+from FlowCytometryTools.core.fcsio import iter_fcs_blocks
+from FlowCytometryTools.testing import (
+    iter_synthetic_events,
+    synthetic_events,
+    write_fcs,
+    write_plate,
+    write_synthetic_fcs,
+)
+
+
+class TestSyntheticFCS(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "sample.fcs")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_roundtrip(self):
+        data = synthetic_events(500, channels=5, seed=0)
+        for version in ("2.0", "3.0", "3.1"):
+            for datatype in ("I", "F", "D"):
+                for byteorder in ("little", "big"):
+                    write_fcs(
+                        self.path, data, version=version, datatype=datatype, byteorder=byteorder
+                    )
+                    expected = data.values.astype(float)
+                    if datatype == "I":
+                        expected = np.rint(np.clip(expected, 0, 262143))
+                    meta, read = parse_fcs(self.path)
+                    self.assertEqual(meta["__header__"]["FCS format"], b"FCS" + version.encode())
+                    self.assertEqual(list(read.columns), list(data.columns))
+                    assert_allclose(read.values, expected, rtol=1e-6)
+                    # The DATA segment can also be memory mapped.
+                    meta = parse_fcs(self.path, meta_data_only=True)
+                    blocks = iter_fcs_blocks(self.path, data.columns, 128, meta=meta)
+                    assert_allclose(np.concatenate(list(blocks)), expected, rtol=1e-6)
+
+    def test_reproducible(self):
+        a = np.concatenate(list(iter_synthetic_events(1000, seed=1, chunksize=300, n_jobs=1)))
+        b = np.concatenate(list(iter_synthetic_events(1000, seed=1, chunksize=300, n_jobs=3)))
+        c = np.concatenate(list(iter_synthetic_events(1000, seed=2, chunksize=300, n_jobs=1)))
+        assert_array_equal(a, b)
+        self.assertFalse(np.array_equal(a, c))
+
+    def test_populations_and_spillover(self):
+        populations = [(1, [100.0, 1000.0], 1.0), (3, [5000.0, 10.0], 1.0)]
+        spillover = [[1.0, 0.5], [0.0, 1.0]]
+        data = synthetic_events(4000, ["x", "y"], populations, spillover, seed=0)
+        first = data["x"] < 1000
+        self.assertAlmostEqual(first.mean(), 0.25, delta=0.03)
+        assert_allclose(data[first].mean(), [100, 1050], rtol=0.01)
+        assert_allclose(data[~first].mean(), [5000, 2510], rtol=0.01)
+
+        write_synthetic_fcs(self.path, 100, ["x", "y"], populations, spillover)
+        meta = FCMeasurement("sample", datafile=self.path).meta
+        self.assertEqual(meta["$SPILLOVER"], "2,x,y,1,0.5,0,1")
+
+    def test_large_files(self):
+        num_events = 4 * 10**6  # More than 99999999 bytes of DATA
+        write_synthetic_fcs(self.path, num_events, channels=8, seed=0)
+        meta = parse_fcs(self.path, meta_data_only=True)
+        self.assertEqual(meta["__header__"]["data start"], 0)
+        self.assertEqual(int(meta["$ENDDATA"]) - int(meta["$BEGINDATA"]) + 1, num_events * 32)
+        self.assertEqual(os.path.getsize(self.path), int(meta["$ENDDATA"]) + 1)
+        with self.assertRaises(ValueError):
+            write_synthetic_fcs(self.path, num_events, channels=8, version="2.0")
+
+    def test_write_plate(self):
+        paths = write_plate(self.directory, shape=(2, 3), num_events=100, prefix="RFP", seed=0)
+        self.assertEqual(os.path.basename(paths["B3"]), "RFP_Well_B3.fcs")
+        plate = FCPlate.from_dir("plate", self.directory)
+        self.assertEqual(sorted(plate.keys()), sorted(paths))
+        counts = plate.counts().stack()
+        self.assertEqual(len(counts), 6)
+        self.assertTrue((counts == 100).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,21 @@
 """
 @author: jonathanfriedman
 """
+import json
 import os
+import shutil
+import tempfile
 import unittest
+import warnings
 
 import numpy as np
 from numpy.testing import assert_allclose, assert_equal, assert_almost_equal
 
-from FlowCytometryTools import FCMeasurement, FCPlate
+from FlowCytometryTools import FCMeasurement, FCPlate, ThresholdGate
 from FlowCytometryTools.core import transforms as trans
+from FlowCytometryTools.core.cache import transform_cache
 from FlowCytometryTools.core.transforms import Transformation
+from FlowCytometryTools.testing import write_synthetic_fcs
 
 base_path = os.path.dirname(os.path.realpath(__file__))
 
@@ -120,6 +126,42 @@ class TestTransforms(unittest.TestCase):
         d = (result1 - result2) / result1
         assert_almost_equal(d, np.zeros(len(d)), decimal=2)
 
+    def test_adaptive_spline(self):
+        x = np.r_[np.linspace(-1e3, 1e5, 2001), np.linspace(-100, 100, 201)]
+        for tol in (1e-1, 1e-4):
+            transformation = Transformation("hlog")
+            transformation.set_spline(-1e3, 1e5, tol=tol)
+            error = abs(transformation(x, use_spln=True) - transformation(x))
+            self.assertLessEqual(error.max(), tol)
+        self.assertLess(len(transformation.spline_table()["x"]), 1000)
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            Transformation("hlog").set_spline(-1e3, 1e5, nx=20, tol=1e-4)
+        self.assertEqual(len(w), 1)
+
+    def test_spline_table(self):
+        transformation = Transformation("hlog", b=100)
+        transformation.set_spline(-1e3, 1e5, tol=1e-3)
+        table = json.loads(json.dumps(transformation.spline_table()))
+        other = Transformation("hlog", b=100)
+        other.set_spline_table(table)
+        assert_equal(other(_xall, use_spln=True), transformation(_xall, use_spln=True))
+        with self.assertRaises(ValueError):
+            Transformation("hlog").set_spline_table(table)
+        self.assertEqual(other.copy().spline_table(), table)
+        # The points of a spline that was not fitted by the transformation are unknown.
+        other.spln = transformation.spln.derivative().antiderivative()
+        with self.assertRaises(ValueError):
+            other.spline_table()
+
+    def test_measurement_without_meta(self):
+        data = self.fc_measurement.data[["FSC-A", "SSC-A"]]
+        sample = FCMeasurement(ID="no meta", readmeta=False)
+        sample.set_data(data)
+        result = sample.transform("tlog", channels=["FSC-A"], auto_range=False)
+        assert_equal(result.data["SSC-A"].values, data["SSC-A"].values)
+        self.assertFalse(np.array_equal(result.data["FSC-A"].values, data["FSC-A"].values))
+
     def test_hlog_inv(self):
         expected = _xall
         result = trans.hlog_inv(trans.hlog(_xall))
@@ -166,3 +208,164 @@ class TestTransforms(unittest.TestCase):
         for transformation, channels, kwargs in test_cases:
             self.fc_measurement.transform(transformation, channels=channels, **kwargs)
             self.fc_plate.transform(transformation, channels=channels, **kwargs)
+
+
+class TestDtype(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "Sample_Well_A1.fcs")
+        write_synthetic_fcs(self.path, 2000, channels=3, seed=0, datatype="I", ranges=2**16)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_result_dtype(self):
+        transform = Transformation("tlog")
+        x = np.logspace(0, 5, 100)
+        self.assertEqual(transform(x.astype(np.float32)).dtype, np.float32)
+        self.assertEqual(transform(x.astype(np.uint16)).dtype, np.float32)
+        self.assertEqual(transform(x).dtype, np.float64)
+        y = transform(x.astype(np.float32), dtype="float64")
+        self.assertEqual(y.dtype, np.float64)
+        assert_allclose(transform(x.astype(np.float32)), transform(x), rtol=1e-6)
+        # Inverse transformations return float64: their values may exceed float32.
+        y = np.float32([9000.0, 2e5])
+        inverse = transform.inverse(y)
+        self.assertEqual(inverse.dtype, np.float64)
+        self.assertTrue(np.isfinite(inverse).all())
+        assert_allclose(inverse, transform.inverse(y.astype(np.float64)))
+        self.assertEqual(trans.tlog_inv(y).dtype, np.float64)
+        # Overflows in a narrower requested type are reported.
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            single = transform.inverse(y, dtype="float32")
+        self.assertTrue(np.isinf(single[1]))
+        self.assertEqual(len(w), 1)
+        self.assertIn("exceed the range of float32", str(w[0].message))
+
+    def test_storage_modes(self):
+        native = FCMeasurement(ID="native", datafile=self.path, dtype="native")
+        self.assertEqual(native.dtype, "native")
+        self.assertTrue((native.data.dtypes == np.uint32).all())
+        for block in native.iter_data(chunksize=500):
+            self.assertTrue((block.dtypes == np.uint32).all())
+        single = FCMeasurement(ID="float32", datafile=self.path)
+        double = FCMeasurement(ID="float64", datafile=self.path, dtype=np.float64)
+        self.assertTrue((double.data.dtypes == np.float64).all())
+        assert_equal(native.data.values, double.data.values)
+        with self.assertRaises(ValueError):
+            FCMeasurement(ID="int", datafile=self.path, dtype="int32")
+
+        gate = ThresholdGate(1000.0, "FSC-A", region="above")
+        for sample, dtype in ((native, np.float32), (single, np.float32), (double, np.float64)):
+            result = sample.gate(gate).subsample(100, seed=0)
+            result = result.transform("hlog", channels=["FSC-A"])
+            self.assertEqual(result.data["FSC-A"].dtype, dtype)
+            self.assertEqual(result.data["SSC-A"].dtype, sample.data["SSC-A"].dtype)
+            queued = sample.transform("tlog", channels=["FSC-A"], apply_now=False)
+            self.assertEqual(queued.gate(gate, apply_now=False).data["FSC-A"].dtype, dtype)
+        upcast = single.transform("hlog", channels=["FSC-A"], dtype="float64")
+        self.assertEqual(upcast.data["FSC-A"].dtype, np.float64)
+
+    def test_from_dir(self):
+        plate = FCPlate.from_dir("plate", self.directory, dtype="float64")
+        self.assertEqual(plate["A1"].dtype, "float64")
+        self.assertTrue((plate["A1"].data.dtypes == np.float64).all())
+
+
+class TestInplace(unittest.TestCase):
+    def test_out(self):
+        cases = (
+            (trans.linear, (_xall, 2.0, 3.0)),
+            (trans.tlog, (_xall,)),
+            (trans.tlog_inv, (_yall,)),
+            (trans.glog, (_xall, 10)),
+            (trans.glog_inv, (_yall / 1000, 10)),
+            (trans.hlog_inv, (_yall,)),
+        )
+        for tfun, (x, *args) in cases:
+            expected = tfun(x, *args)
+            for block_size in (7, 2**14):
+                trans._BLOCK_SIZE, default = block_size, trans._BLOCK_SIZE
+                try:
+                    out = np.empty_like(x)
+                    self.assertIs(tfun(x, *args, out=out), out)
+                    assert_equal(out, expected)
+                    values = np.c_[x, x]
+                    tfun(values, *args, out=values)
+                    assert_equal(values, np.c_[expected, expected])
+                finally:
+                    trans._BLOCK_SIZE = default
+            self.assertEqual(np.ndim(tfun(x[-1], *args)), 0)
+
+    def test_measurement(self):
+        sample = FCMeasurement(ID="test", datafile=test_path)
+        channels = ["FSC-A", "SSC-A"]
+        expected = sample.transform("hlog", channels=channels)
+        copy = sample.copy()
+        copy.set_data()
+        values = copy.data["FSC-A"].values
+        result = copy.transform("hlog", channels=channels, inplace=True)
+        self.assertIs(result, copy)
+        assert_equal(result.data.values, expected.data.values)
+        # The channel was overwritten.
+        assert_equal(values, expected.data["FSC-A"].values)
+        self.assertEqual(len(result.history), 1)
+        # The original measurement is not modified by transform.
+        self.assertFalse(np.array_equal(sample.data.values, expected.data.values))
+
+    def test_measurement_of_view(self):
+        sample = FCMeasurement(ID="test", datafile=test_path)
+        sample.set_data()
+        original = sample.data.copy()
+        subsample = sample.subsample(100, order="start")
+        subsample.transform("hlog", channels=["FSC-A"], inplace=True)
+        view = sample.copy()
+        view.set_data(data=sample.data.iloc[:100])
+        transform_cache.clear()  # Transform the data, instead of reading the cached result.
+        result = view.transform("hlog", channels=["FSC-A"], inplace=True)
+        assert_equal(result.data.values, subsample.data.values)
+        # The parent of the subsample and of the view are not modified.
+        assert_equal(sample.data.values, original.values)
+
+        queued = sample.gate(ThresholdGate(1000.0, "FSC-A", region="above"), apply_now=False)
+        with self.assertRaises(ValueError):
+            queued.transform("hlog", inplace=True)
+
+
+class TestThreads(unittest.TestCase):
+    def test_blocks(self):
+        x = np.linspace(-1e3, 1e5, 10001)
+        tr = Transformation("hlog")
+        expected = tr(x)
+        trans._BLOCK_SIZE, default = 64, trans._BLOCK_SIZE
+        try:
+            for n_jobs in (1, 4):
+                assert_equal(tr(x, n_jobs=n_jobs), expected)
+                out = np.empty_like(x)
+                self.assertIs(tr(x, n_jobs=n_jobs, out=out), out)
+                assert_equal(out, expected)
+        finally:
+            trans._BLOCK_SIZE = default
+
+    def test_spline_kernel(self):
+        tr = Transformation("hlog")
+        tr.set_spline(-1e3, 1e5)
+        x = np.linspace(-1e3, 1e5, 10001)
+        assert_allclose(tr(x, use_spln=True), tr.spln(x), rtol=1e-9)
+        assert_allclose(tr(x, use_spln=True, n_jobs=4), tr.spln(x), rtol=1e-9)
+
+    def test_measurement(self):
+        sample = FCMeasurement(ID="test", datafile=test_path)
+        queued = sample.gate(ThresholdGate(1000.0, "FSC-A", region="above"), apply_now=False)
+        expected = sample.transform("hlog", n_jobs=1)
+        expected_queued = queued.transform("hlog", n_jobs=1)
+        trans._BLOCK_SIZE, default = 1000, trans._BLOCK_SIZE
+        try:
+            result = sample.transform("hlog", n_jobs=4)
+            # Queued actions are applied when the data is accessed.
+            result_queued = queued.transform("hlog", n_jobs=4)
+            assert_equal(result_queued.data.values, expected_queued.data.values)
+        finally:
+            trans._BLOCK_SIZE = default
+        assert_equal(result.data.values, expected.data.values)
@@ -0,0 +1,11 @@
+"""
+Benchmarks for FlowCytometryTools (run with asv, see asv.conf.json).
+
+Run against the current environment, without network access:
+
+    asv run --python=same --quick
+    asv run --python=same -b gates   # only the gate benchmarks
+
+The time_* benchmarks measure run time, the peakmem_* benchmarks the peak
+memory of the process (so memory regressions are tracked per commit).
+"""
@@ -0,0 +1,41 @@
+"""Operations on all the wells of synthetic plates."""
+from FlowCytometryTools import ThresholdGate
+
+from .common import disable_transform_cache, enable_transform_cache, synthetic_plate
+
+gate = ThresholdGate(1000.0, "FSC-A", region="above")
+
+
+def median_fsc(data):
+    return data["FSC-A"].median()
+
+
+class Plate:
+    params = ([96, 384], [10**4, 10**5])
+    param_names = ["num_wells", "events_per_well"]
+    timeout = 300
+
+    def setup(self, num_wells, events_per_well):
+        disable_transform_cache()
+        self.plate = synthetic_plate(num_wells, events_per_well)
+
+    def teardown(self, num_wells, events_per_well):
+        enable_transform_cache()
+
+    def time_apply(self, num_wells, events_per_well):
+        self.plate.apply(median_fsc, applyto="data")
+
+    def time_gate(self, num_wells, events_per_well):
+        self.plate.gate(gate)
+
+    def time_queued_gate(self, num_wells, events_per_well):
+        self.plate.gate(gate, apply_now=False).counts()
+
+    def time_transform(self, num_wells, events_per_well):
+        self.plate.transform("hlog", channels=["FSC-A", "SSC-A"], auto_range=False)
+
+    def time_stats(self, num_wells, events_per_well):
+        self.plate.stats(["FSC-A", "SSC-A"])
+
+    def peakmem_gate(self, num_wells, events_per_well):
+        self.plate.gate(gate)
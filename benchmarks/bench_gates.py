@@ -0,0 +1,45 @@
+"""Gating measurements."""
+from FlowCytometryTools import (
+    EllipseGate,
+    IntervalGate,
+    PolyGate,
+    QuadGate,
+    RectangleGate,
+    ThresholdGate,
+)
+
+from .common import synthetic_measurement
+
+gates = {
+    "ThresholdGate": ThresholdGate(1000.0, "FSC-A", region="above"),
+    "IntervalGate": IntervalGate((1000.0, 3000.0), "FSC-A", region="in"),
+    "QuadGate": QuadGate((1000.0, 2000.0), ("FSC-A", "SSC-A"), region="top right"),
+    "PolyGate": PolyGate(
+        [(500.0, 500.0), (4000.0, 800.0), (3500.0, 4500.0), (800.0, 3000.0)],
+        ("FSC-A", "SSC-A"),
+        region="in",
+    ),
+    "RectangleGate": RectangleGate(
+        [(500.0, 800.0), (4000.0, 4500.0)], ("FSC-A", "SSC-A"), region="in"
+    ),
+    "EllipseGate": EllipseGate(
+        (2000.0, 2500.0), ("FSC-A", "SSC-A"), axes=(2000.0, 1000.0), angle=30.0
+    ),
+    "CompositeGate": ThresholdGate(1000.0, "FSC-A", region="above")
+    & ThresholdGate(2000.0, "SSC-A", region="below"),
+}
+
+
+class Gate:
+    params = (sorted(gates), [10**4, 10**5, 10**6, 10**7])
+    param_names = ["gate", "num_events"]
+
+    def setup(self, gate, num_events):
+        self.sample = synthetic_measurement(num_events)
+        self.gate = gates[gate]
+
+    def time_gate(self, gate, num_events):
+        self.sample.gate(self.gate)
+
+    def peakmem_gate(self, gate, num_events):
+        self.sample.gate(self.gate)
@@ -0,0 +1,65 @@
+"""Reading FCS files."""
+import os
+import tempfile
+
+from FlowCytometryTools import FCMeasurement, FCPlate
+from FlowCytometryTools.testing import write_plate, write_synthetic_fcs
+
+datatypes = ["I", "F", "D"]
+event_counts = [10**5, 10**6, 10**7]
+
+
+def _filename(directory, datatype, num_events):
+    return os.path.join(directory, "{}_{}.fcs".format(datatype, num_events))
+
+
+class ReadData:
+    params = (datatypes, event_counts)
+    param_names = ["datatype", "num_events"]
+    timeout = 300
+
+    def setup_cache(self):
+        directory = tempfile.mkdtemp(prefix="fct_bench_io_")
+        for datatype in datatypes:
+            for num_events in event_counts:
+                write_synthetic_fcs(
+                    _filename(directory, datatype, num_events),
+                    num_events,
+                    datatype=datatype,
+                    seed=0,
+                )
+        return directory
+
+    def setup(self, directory, datatype, num_events):
+        self.sample = FCMeasurement(ID="sample", datafile=_filename(directory, datatype, num_events))
+
+    def time_read_data(self, directory, datatype, num_events):
+        self.sample.read_data()
+
+    def time_read_meta(self, directory, datatype, num_events):
+        self.sample.read_meta()
+
+    def time_iter_data(self, directory, datatype, num_events):
+        for block in self.sample.iter_data(chunksize=2**16):
+            pass
+
+    def peakmem_read_data(self, directory, datatype, num_events):
+        self.sample.read_data()
+
+
+class ReadPlate:
+    params = [10**4, 10**5]
+    param_names = ["events_per_well"]
+    timeout = 300
+
+    def setup_cache(self):
+        directory = tempfile.mkdtemp(prefix="fct_bench_plate_")
+        for num_events in self.params:
+            write_plate(os.path.join(directory, str(num_events)), num_events=num_events, seed=0)
+        return directory
+
+    def time_from_dir(self, directory, events_per_well):
+        FCPlate.from_dir("plate", os.path.join(directory, str(events_per_well)))
+
+    def time_read_all_wells(self, directory, events_per_well):
+        FCPlate.from_dir("plate", os.path.join(directory, str(events_per_well))).counts()
@@ -0,0 +1,52 @@
+"""Plotting plates (with the non-interactive Agg backend)."""
+import matplotlib
+
+matplotlib.use("Agg")
+
+import pylab as pl
+
+from FlowCytometryTools import ThresholdGate
+
+from .common import synthetic_measurement, synthetic_plate
+
+
+class PlatePlot:
+    params = (["histogram1d", "histogram2d", "scatter", "density_scatter"], [96, 384])
+    param_names = ["kind", "num_wells"]
+    timeout = 300
+
+    def setup(self, kind, num_wells):
+        self.plate = synthetic_plate(num_wells, 10000)
+        self.gate = ThresholdGate(1000.0, "FSC-A", region="above")
+
+    def teardown(self, kind, num_wells):
+        pl.close("all")
+
+    def _plot(self, kind):
+        pl.figure()
+        if kind == "histogram1d":
+            self.plate.plot("FSC-A", bins=100, gates=self.gate)
+        elif kind == "histogram2d":
+            self.plate.plot(["FSC-A", "SSC-A"], bins=100)
+        else:
+            self.plate.plot(["FSC-A", "SSC-A"], kind=kind)
+        pl.gcf().canvas.draw()
+
+    def time_plot(self, kind, num_wells):
+        self._plot(kind)
+
+    def peakmem_plot(self, kind, num_wells):
+        self._plot(kind)
+
+
+class View:
+    def setup(self):
+        self.sample = synthetic_measurement(10**5)
+
+    def teardown(self):
+        pl.close("all")
+
+    def time_view(self):
+        pl.figure()
+        self.sample.view()
+        pl.gcf().canvas.draw()
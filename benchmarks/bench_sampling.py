@@ -0,0 +1,19 @@
+"""Subsampling measurements."""
+from .common import synthetic_measurement
+
+
+class Subsample:
+    params = (["random", "reservoir", "density", "start"], [10**5, 10**6])
+    param_names = ["order", "num_events"]
+
+    def setup(self, order, num_events):
+        self.sample = synthetic_measurement(num_events)
+
+    def time_subsample(self, order, num_events):
+        self.sample.subsample(10000, order=order, seed=0)
+
+    def time_subsample_fraction(self, order, num_events):
+        self.sample.subsample(0.1, order=order, seed=0)
+
+    def peakmem_subsample(self, order, num_events):
+        self.sample.subsample(10000, order=order, seed=0)
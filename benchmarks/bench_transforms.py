@@ -0,0 +1,71 @@
+"""Named transformations of measurement data."""
+from .common import disable_transform_cache, enable_transform_cache, synthetic_measurement
+
+#: Parameters needed by some of the named transformations.
+transform_kwargs = {
+    "linear": {"old_range": 2**18, "new_range": 10**4},
+    "hlog": {},
+    "glog": {"l": 100},
+    "tlog": {},
+}
+
+
+class Transform:
+    params = (sorted(transform_kwargs), [False, True], [10**4, 10**5, 10**6])
+    param_names = ["transform", "use_spln", "num_events"]
+
+    def setup(self, transform, use_spln, num_events):
+        if transform == "hlog" and not use_spln and num_events > 10**4:
+            # Without a spline, hlog is computed by root finding for each event.
+            raise NotImplementedError
+        disable_transform_cache()
+        self.sample = synthetic_measurement(num_events)
+        self.kwargs = transform_kwargs[transform]
+
+    def teardown(self, transform, use_spln, num_events):
+        enable_transform_cache()
+
+    def time_transform(self, transform, use_spln, num_events):
+        self.sample.transform(
+            transform, channels=["FSC-A", "SSC-A"], use_spln=use_spln, auto_range=False, **self.kwargs
+        )
+
+    def peakmem_transform(self, transform, use_spln, num_events):
+        self.sample.transform(
+            transform, channels=["FSC-A", "SSC-A"], use_spln=use_spln, auto_range=False, **self.kwargs
+        )
+
+
+class TransformInplace:
+    params = (sorted(transform_kwargs), [10**5, 10**6])
+    param_names = ["transform", "num_events"]
+
+    def setup(self, transform, num_events):
+        disable_transform_cache()
+        self.sample = synthetic_measurement(num_events)
+        self.kwargs = transform_kwargs[transform]
+
+    def teardown(self, transform, num_events):
+        enable_transform_cache()
+
+    def peakmem_transform_inplace(self, transform, num_events):
+        self.sample.transform(
+            transform, channels=["FSC-A", "SSC-A"], auto_range=False, inplace=True, **self.kwargs
+        )
+
+
+class TransformCached:
+    """Transformations whose result is already in the transform cache."""
+
+    params = (sorted(transform_kwargs), [10**5, 10**6])
+    param_names = ["transform", "num_events"]
+
+    def setup(self, transform, num_events):
+        self.sample = synthetic_measurement(num_events)
+        self.kwargs = transform_kwargs[transform]
+        self.time_transform_cached(transform, num_events)
+
+    def time_transform_cached(self, transform, num_events):
+        self.sample.transform(
+            transform, channels=["FSC-A", "SSC-A"], auto_range=False, **self.kwargs
+        )
@@ -0,0 +1,57 @@
+"""Synthetic data shared by the benchmarks."""
+from pandas import DataFrame
+
+from FlowCytometryTools import FCMeasurement, FCOrderedCollection, transform_cache
+from FlowCytometryTools.testing import synthetic_events
+
+channel_names = ["FSC-A", "SSC-A", "B1-A", "V2-A", "Y2-A", "R1-A", "FSC-H", "SSC-H"]
+
+plate_shapes = {96: (8, 12), 384: (16, 24)}
+
+#: Budget of the transform cache, restored by enable_transform_cache.
+_transform_cache_bytes = transform_cache.max_bytes
+
+
+def synthetic_data(num_events, seed=0):
+    """Events from two populations, in the typical range of the channels."""
+    return synthetic_events(num_events, channel_names, populations=2, seed=seed)
+
+
+def synthetic_measurement(num_events, ID="synthetic", seed=0):
+    """An FCMeasurement holding synthetic data in memory."""
+    num_channels = len(channel_names)
+    channels = DataFrame(
+        {"$PnN": channel_names, "$PnB": ["32"] * num_channels, "$PnR": ["262144"] * num_channels},
+        index=range(1, num_channels + 1),
+    )
+    measurement = FCMeasurement(ID=ID, readmeta=False)
+    measurement.set_meta(
+        {
+            "_channels_": channels,
+            "_channel_names_": tuple(channel_names),
+            "$TOT": str(num_events),
+        }
+    )
+    measurement.set_data(synthetic_data(num_events, seed))
+    return measurement
+
+
+def synthetic_plate(num_wells=96, events_per_well=10000):
+    """An FCOrderedCollection of wells holding synthetic data in memory."""
+    rows, cols = plate_shapes[num_wells]
+    wells = []
+    for i in range(rows):
+        for j in range(cols):
+            ID = "{}{}".format(chr(ord("A") + i), j + 1)
+            wells.append(synthetic_measurement(events_per_well, ID=ID, seed=i * cols + j))
+    return FCOrderedCollection("plate", wells, "name", shape=(rows, cols))
+
+
+def disable_transform_cache():
+    """Empty the transform cache and keep it empty, so that every repeat transforms the data."""
+    transform_cache.clear()
+    transform_cache.max_bytes = 0
+
+
+def enable_transform_cache():
+    transform_cache.max_bytes = _transform_cache_bytes